@@ -1,7 +1,8 @@
-from flask import Flask
+from flask import Flask, flash, redirect, request, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
+from sqlalchemy.orm.exc import StaleDataError
 from config import config
 
 db = SQLAlchemy()
@@ -17,6 +18,10 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # One JSON encoder for jsonify() and the async API (app.asgi)
+    from app.services.projection import JSONProvider
+    app.json = JSONProvider(app)
+    
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
@@ -39,8 +44,32 @@ def create_app(config_name='default'):
     app.register_blueprint(maintenance_bp, url_prefix='/maintenance')
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    # Optimistic locking conflicts in the HTML views (the API answers 409)
+    @app.errorhandler(StaleDataError)
+    def handle_conflict(error):
+        from app.services.versioning import CONFLICT_MESSAGE
+        db.session.rollback()
+        flash(CONFLICT_MESSAGE, 'warning')
+        return redirect(request.referrer or url_for('main.dashboard'))
+    
+    # Per-request SQL instrumentation, aggregated for /api/_metrics
+    from app.services import metrics
+    with app.app_context():
+        metrics.instrument_engine(db.engine)
+    app.before_request(metrics.start_request)
+    app.after_request(metrics.finish_request)
+    app.teardown_request(metrics.teardown_request)
+    
+    # Session hooks that keep stored costs and caches in step with writes,
+    # and the DDL hook that partitions the inventory ledger
+    from app.services import costs, dashboard, kpis, ledger, principals, reference  # noqa: F401
+    
     # Create tables
     with app.app_context():
         db.create_all()
     
+    if app.config.get('PREVENTIVE_GENERATOR_INTERVAL'):
+        from app.services.preventive import start_preventive_scheduler
+        start_preventive_scheduler(app, app.config['PREVENTIVE_GENERATOR_INTERVAL'])
+    
     return app
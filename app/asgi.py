@@ -0,0 +1,170 @@
+import asyncio
+import time
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import parse_qs
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app import db
+from app.models import CacheVersion, User
+from app.routes.api_async import ROUTES
+
+
+# ============================================
+# ASGI entry point
+#
+# The polled read-only API endpoints (app.routes.api_async) run on an
+# asyncio event loop against an async engine, so each waiting client costs
+# a coroutine rather than a worker thread. Every other request, and any
+# polled request the async handlers leave alone, goes to the Flask app,
+# which runs unchanged in a thread pool in the same process. Both halves
+# share the models, the Flask login session and the per-process caches.
+# ============================================
+
+def async_database_url(uri):
+    """(asyncpg URL, connect_args) for the app's PostgreSQL URI."""
+    url = make_url(uri)
+    if url.get_backend_name() != 'postgresql':
+        raise RuntimeError('The async API needs PostgreSQL')
+    connect_args = {}
+    # asyncpg takes sslmode as its ssl argument, not as a URL parameter
+    if 'sslmode' in url.query:
+        connect_args['ssl'] = url.query['sslmode']
+        url = url.difference_update_query(['sslmode'])
+    return url.set(drivername='postgresql+asyncpg'), connect_args
+
+
+class AsyncRequest:
+    def __init__(self, api, scope):
+        self.api = api
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'')
+        # First value per name, blanks kept, like request.args.get()
+        self.args = {name: values[0] for name, values in
+                     parse_qs(self.query_string.decode('latin-1'), keep_blank_values=True).items()}
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope['headers']}
+        self.user_id = None
+
+
+class AsyncApi:
+    def __init__(self, flask_app):
+        config = flask_app.config
+        self.config = config
+        url, connect_args = async_database_url(config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = create_async_engine(
+            url, connect_args=connect_args,
+            pool_size=config.get('ASYNC_DB_POOL_SIZE', 10),
+            max_overflow=config.get('ASYNC_DB_MAX_OVERFLOW', 20),
+            pool_pre_ping=True, pool_recycle=300
+        )
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.flask = WSGIMiddleware(flask_app, workers=config.get('ASYNC_FLASK_THREADS', 8))
+    
+        self._cookie_name = config.get('SESSION_COOKIE_NAME', 'session')
+        self._session_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        self._serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self._check_interval = config.get('REFERENCE_CACHE_CHECK_INTERVAL', 5)
+        self._active = {}  # user_id -> (checked_at, is_active)
+        self._versions = (float('-inf'), {})  # (checked_at, kind -> version)
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+    
+        handler = None
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            handler = ROUTES.get(scope['path'])
+        if handler is not None:
+            request = AsyncRequest(self, scope)
+            request.user_id = await self._authenticate(request)
+            # Anonymous requests get Flask-Login's redirect (or remember-me login) from Flask
+            if request.user_id is not None:
+                response = await handler(request)
+                if response is not None:
+                    return await self._send(receive, send, *response)
+    
+        await self.flask(scope, receive, send)
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def _send(self, receive, send, status, headers, body):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        if isinstance(body, bytes):
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        
+        # A streamed body (server-sent events) runs until it ends or the client leaves
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            async for chunk in body:
+                if disconnected.done():
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            else:
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await body.aclose()
+    
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+    
+    def _session_user_id(self, request):
+        # Flask's signed session cookie, checked with the same key and lifetime
+        if self._serializer is None:
+            return None
+        try:
+            cookie = SimpleCookie(request.headers.get('cookie', ''))
+        except CookieError:
+            return None
+        morsel = cookie.get(self._cookie_name)
+        if morsel is None:
+            return None
+        try:
+            session = self._serializer.loads(morsel.value, max_age=self._session_age)
+            return int(session['_user_id'])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+    
+    async def _authenticate(self, request):
+        """The logged-in, active user id of request, or None."""
+        user_id = self._session_user_id(request)
+        if user_id is None:
+            return None
+        # Deactivations apply within the reference check interval, as in Flask
+        entry = self._active.get(user_id)
+        if entry is None or time.monotonic() - entry[0] >= self._check_interval:
+            async with self.sessions() as session:
+                active = await session.scalar(db.select(User.is_active).where(User.user_id == user_id))
+            entry = self._active[user_id] = (time.monotonic(), bool(active))
+        return user_id if entry[1] else None
+    
+    async def reference_versions(self, session, kinds):
+        """Shared reference cache versions, re-read at most every check interval."""
+        checked_at, versions = self._versions
+        if time.monotonic() - checked_at >= self._check_interval:
+            versions = dict((await session.execute(
+                db.select(CacheVersion.name, CacheVersion.version)
+            )).all())
+            self._versions = (time.monotonic(), versions)
+        return tuple(versions.get(kind, 0) for kind in kinds)
+
+
+def create_asgi_app(flask_app):
+    return AsyncApi(flask_app)
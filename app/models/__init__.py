@@ -1,11 +1,15 @@
 from app.models.models import (
     User, Location, EquipmentCategory, Equipment,
     MaintenanceSchedule, Vendor, Part, PartsInventory,
-    WorkOrder, WorkOrderPart, InventoryTransaction
+    WorkOrder, WorkOrderPart, InventoryTransaction, CacheVersion,
+    UsageReading, UsageRollup, MaintenanceKpi, InventorySnapshot,
+    LedgerArchive, ReorderForecast, WORK_ORDER_LIST_ORDER
 )
 
 __all__ = [
     'User', 'Location', 'EquipmentCategory', 'Equipment',
     'MaintenanceSchedule', 'Vendor', 'Part', 'PartsInventory',
-    'WorkOrder', 'WorkOrderPart', 'InventoryTransaction'
+    'WorkOrder', 'WorkOrderPart', 'InventoryTransaction', 'CacheVersion',
+    'UsageReading', 'UsageRollup', 'MaintenanceKpi', 'InventorySnapshot',
+    'LedgerArchive', 'ReorderForecast', 'WORK_ORDER_LIST_ORDER'
 ]
@@ -1,11 +1,72 @@
-from datetime import datetime
+from datetime import date, datetime
 from flask_login import UserMixin
+from sqlalchemy import event
 from app import db, login_manager, bcrypt
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    from app.services.principals import load_principal
+    return load_principal(int(user_id))
+
+
+# Per-day work order numbers (WO-YYYYMMDD-0001), assigned by the database at
+# insert time so bulk inserts need no follow-up UPDATE
+WORK_ORDER_NUMBER_FUNCTION = """
+CREATE OR REPLACE FUNCTION next_work_order_number() RETURNS varchar AS $$
+DECLARE
+    today date := (now() AT TIME ZONE 'utc')::date;
+    seq integer;
+BEGIN
+    INSERT INTO work_order_counters (day, last_value) VALUES (today, 1)
+    ON CONFLICT (day) DO UPDATE SET last_value = work_order_counters.last_value + 1
+    RETURNING last_value INTO seq;
+    RETURN 'WO-' || to_char(today, 'YYYYMMDD') || '-' || lpad(seq::text, greatest(4, length(seq::text)), '0');
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Numbers issued before the counters existed were WO-YYYYMMDD-<id>, so each
+# day's counter starts after the highest of them
+SEED_WORK_ORDER_COUNTERS = """
+INSERT INTO work_order_counters (day, last_value)
+SELECT to_date(substr(work_order_number, 4, 8), 'YYYYMMDD'), max(substr(work_order_number, 13)::integer)
+FROM work_orders
+WHERE work_order_number ~ '^WO-[0-9]{8}-[0-9]{1,9}$'
+GROUP BY 1
+ON CONFLICT (day) DO UPDATE SET last_value = greatest(work_order_counters.last_value, excluded.last_value)
+"""
+
+
+@event.listens_for(db.metadata, 'before_create')
+def create_database_objects(target, connection, **kw):
+    if connection.dialect.name != 'postgresql':
+        return
+    # pg_trgm backs the substring search indexes below
+    connection.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    counters_exist, work_orders_exist = connection.execute(db.text(
+        "SELECT to_regclass('work_order_counters') IS NOT NULL, to_regclass('work_orders') IS NOT NULL"
+    )).one()
+    connection.execute(db.text(
+        'CREATE TABLE IF NOT EXISTS work_order_counters '
+        '(day date PRIMARY KEY, last_value integer NOT NULL)'
+    ))
+    if work_orders_exist and not counters_exist:
+        connection.execute(db.text(SEED_WORK_ORDER_COUNTERS))
+    connection.execute(db.text(WORK_ORDER_NUMBER_FUNCTION))
+
+
+def set_work_order_number_default(target, connection, **kw):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(db.text(
+            'ALTER TABLE work_orders ALTER COLUMN work_order_number SET DEFAULT next_work_order_number()'
+        ))
+
+
+def trigram_index(table, column):
+    # GIN trigram index, usable by ILIKE '%term%' and similarity() on PostgreSQL
+    return db.Index(f'ix_{table}_{column}_trgm', column,
+                    postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
 
 
 class Location(db.Model):
@@ -137,6 +198,17 @@ class Equipment(db.Model):
     maintenance_schedules = db.relationship('MaintenanceSchedule', backref='equipment', lazy='dynamic', cascade='all, delete-orphan')
     work_orders = db.relationship('WorkOrder', backref='equipment', lazy='dynamic')
     
+    __table_args__ = (
+        trigram_index('equipment', 'name'),
+        trigram_index('equipment', 'serial_number'),
+        trigram_index('equipment', 'manufacturer'),
+        db.Index('ix_equipment_status', 'status'),
+        db.Index('ix_equipment_category_id', 'category_id'),
+        db.Index('ix_equipment_location_id_status', 'location_id', 'status'),
+        db.Index('ix_equipment_name', 'name'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+    
     @property
     def under_warranty(self):
         if self.warranty_expiration:
@@ -178,13 +250,23 @@ class MaintenanceSchedule(db.Model):
     priority = db.Column(db.String(20), default='medium')
     is_active = db.Column(db.Boolean, default=True)
     last_performed = db.Column(db.DateTime)
+    # Equipment usage_hours when the task was last performed (or scheduled)
+    last_usage_hours = db.Column(db.Numeric(10, 2), default=0)
     next_due = db.Column(db.DateTime)
+    # Set by usage ingestion when frequency_hours has been run since last_usage_hours
+    usage_due_at = db.Column(db.DateTime)
     version = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     work_orders = db.relationship('WorkOrder', backref='schedule', lazy='dynamic')
     
+    __table_args__ = (
+        db.Index('ix_maintenance_schedules_is_active_next_due', 'is_active', 'next_due'),
+        db.Index('ix_maintenance_schedules_equipment_id', 'equipment_id'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+    
     @property
     def is_overdue(self):
         if self.next_due:
@@ -205,6 +287,7 @@ class MaintenanceSchedule(db.Model):
             'is_active': self.is_active,
             'last_performed': self.last_performed.isoformat() if self.last_performed else None,
             'next_due': self.next_due.isoformat() if self.next_due else None,
+            'usage_due_at': self.usage_due_at.isoformat() if self.usage_due_at else None,
             'is_overdue': self.is_overdue
         }
 
@@ -257,6 +340,13 @@ class Part(db.Model):
     
     inventory = db.relationship('PartsInventory', backref='part', lazy='dynamic')
     
+    __table_args__ = (
+        trigram_index('parts', 'name'),
+        trigram_index('parts', 'part_number'),
+        trigram_index('parts', 'category'),
+        db.Index('ix_parts_name', 'name'),
+    )
+    
     def to_dict(self):
         return {
             'part_id': self.part_id,
@@ -284,7 +374,14 @@ class PartsInventory(db.Model):
     version = db.Column(db.Integer, default=1)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    __table_args__ = (db.UniqueConstraint('part_id', 'location_id'),)
+    __table_args__ = (
+        db.UniqueConstraint('part_id', 'location_id'),
+        db.Index('ix_parts_inventory_location_id', 'location_id'),
+        # Low-stock rows only; serves the low-stock views and dashboard counter
+        db.Index('ix_parts_inventory_low_stock', 'location_id', 'part_id',
+                 postgresql_where=quantity_on_hand <= reorder_point),
+    )
+    __mapper_args__ = {'version_id_col': version}
     
     @property
     def available(self):
@@ -312,13 +409,32 @@ class PartsInventory(db.Model):
         }
 
 
+class ReorderForecast(db.Model):
+    __tablename__ = 'reorder_forecasts'
+    
+    # Written in bulk by app.services.forecast from recent issue history
+    inventory_id = db.Column(db.Integer, db.ForeignKey('parts_inventory.inventory_id', ondelete='CASCADE'), primary_key=True)
+    computed_at = db.Column(db.DateTime, nullable=False)
+    window_days = db.Column(db.Integer, nullable=False)
+    issued = db.Column(db.Integer, nullable=False, default=0)
+    daily_rate = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+    daily_stddev = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+    days_until_stockout = db.Column(db.Numeric(10, 1))
+    recommended_reorder_point = db.Column(db.Integer, nullable=False, default=0)
+    recommended_reorder_quantity = db.Column(db.Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        db.Index('ix_reorder_forecasts_days_until_stockout', 'days_until_stockout'),
+    )
+
+
 class WorkOrder(db.Model):
     __tablename__ = 'work_orders'
     
     work_order_id = db.Column(db.Integer, primary_key=True)
     equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.equipment_id'), nullable=False)
     schedule_id = db.Column(db.Integer, db.ForeignKey('maintenance_schedules.schedule_id'))
-    work_order_number = db.Column(db.String(20), unique=True)
+    work_order_number = db.Column(db.String(20), unique=True, server_default=db.FetchedValue())
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     type = db.Column(db.String(20), nullable=False)
@@ -331,6 +447,9 @@ class WorkOrder(db.Model):
     completed_at = db.Column(db.DateTime)
     labor_hours = db.Column(db.Numeric(6, 2))
     labor_cost = db.Column(db.Numeric(10, 2))
+    # Maintained from work_order_parts and labor_cost by app.services.costs
+    parts_cost = db.Column(db.Numeric(12, 2), default=0, server_default='0', nullable=False)
+    total_cost = db.Column(db.Numeric(12, 2), default=0, server_default='0', nullable=False)
     notes = db.Column(db.Text)
     version = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -338,20 +457,16 @@ class WorkOrder(db.Model):
     
     parts_used = db.relationship('WorkOrderPart', backref='work_order', lazy='dynamic', cascade='all, delete-orphan')
     
-    def generate_number(self):
-        if not self.work_order_number:
-            date_str = datetime.utcnow().strftime('%Y%m%d')
-            self.work_order_number = f"WO-{date_str}-{self.work_order_id:04d}"
-    
-    @property
-    def parts_cost(self):
-        total = sum(wp.quantity_used * float(wp.unit_cost or 0) for wp in self.parts_used)
-        return total
-    
-    @property
-    def total_cost(self):
-        labor = float(self.labor_cost or 0)
-        return labor + self.parts_cost
+    __table_args__ = (
+        db.Index('ix_work_orders_status_completed_at', 'status', 'completed_at'),
+        db.Index('ix_work_orders_assigned_to_status', 'assigned_to', 'status'),
+        db.Index('ix_work_orders_created_at', 'created_at', 'work_order_id'),
+        db.Index('ix_work_orders_equipment_id', 'equipment_id'),
+        db.Index('ix_work_orders_schedule_id_created_at', 'schedule_id', 'created_at'),
+        db.Index('ix_work_orders_total_cost', 'total_cost'),
+    )
+    # eager_defaults fetches the database-assigned number in the INSERT itself
+    __mapper_args__ = {'version_id_col': version, 'eager_defaults': True}
     
     def to_dict(self):
         return {
@@ -375,13 +490,31 @@ class WorkOrder(db.Model):
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'labor_hours': float(self.labor_hours) if self.labor_hours else None,
             'labor_cost': float(self.labor_cost) if self.labor_cost else None,
-            'parts_cost': self.parts_cost,
-            'total_cost': self.total_cost,
+            'parts_cost': float(self.parts_cost or 0),
+            'total_cost': float(self.total_cost or 0),
             'notes': self.notes,
             'version': self.version
         }
 
 
+event.listen(WorkOrder.__table__, 'after_create', set_work_order_number_default)
+
+# Default work order list order: priority, then scheduled date with undated
+# orders last. The matching expression index lets each keyset page read just
+# its rows in order instead of sorting the whole filtered set.
+WORK_ORDER_LIST_ORDER = (
+    db.case(
+        (WorkOrder.priority == 'critical', 1),
+        (WorkOrder.priority == 'high', 2),
+        (WorkOrder.priority == 'medium', 3),
+        else_=4
+    ),
+    db.func.coalesce(WorkOrder.scheduled_date, date.max),
+    WorkOrder.work_order_id,
+)
+db.Index('ix_work_orders_list_order', *WORK_ORDER_LIST_ORDER)
+
+
 class WorkOrderPart(db.Model):
     __tablename__ = 'work_order_parts'
     
@@ -403,10 +536,88 @@ class WorkOrderPart(db.Model):
         }
 
 
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    
+    # Change counter per cached reference data set, shared by all workers
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class UsageReading(db.Model):
+    __tablename__ = 'usage_readings'
+    
+    # Raw hour-meter readings reported by connected equipment; the key also
+    # drops readings a machine resends
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.equipment_id', ondelete='CASCADE'), primary_key=True)
+    read_at = db.Column(db.DateTime, primary_key=True)
+    meter_hours = db.Column(db.Numeric(10, 2), nullable=False)
+
+
+class UsageRollup(db.Model):
+    __tablename__ = 'usage_rollups'
+    
+    # Hourly and daily meter ranges per machine, maintained on ingestion
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipment.equipment_id', ondelete='CASCADE'), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True)  # 'hour' or 'day'
+    period_start = db.Column(db.DateTime, primary_key=True)
+    readings = db.Column(db.Integer, nullable=False, default=0)
+    min_hours = db.Column(db.Numeric(10, 2), nullable=False)
+    max_hours = db.Column(db.Numeric(10, 2), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'period_start': self.period_start.isoformat(),
+            'readings': self.readings,
+            'min_hours': float(self.min_hours),
+            'max_hours': float(self.max_hours),
+            'hours_used': float(self.max_hours - self.min_hours)
+        }
+
+
+class MaintenanceKpi(db.Model):
+    __tablename__ = 'maintenance_kpis'
+    
+    # Daily maintenance totals per equipment, category, location and model,
+    # maintained by app.services.kpis as work orders complete and meters report
+    scope = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    scope_key = db.Column(db.String(100), primary_key=True)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    repair_hours = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    downtime_hours = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    labor_hours = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    usage_hours = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+
+class InventorySnapshot(db.Model):
+    __tablename__ = 'inventory_snapshots'
+    
+    # quantity_on_hand of a PartsInventory row as of taken_at; balances for
+    # other dates replay only the transactions between them and a snapshot
+    inventory_id = db.Column(db.Integer, db.ForeignKey('parts_inventory.inventory_id', ondelete='CASCADE'), primary_key=True)
+    taken_at = db.Column(db.DateTime, primary_key=True)
+    quantity_on_hand = db.Column(db.Integer, nullable=False)
+
+
+class LedgerArchive(db.Model):
+    __tablename__ = 'ledger_archives'
+    
+    # Months of inventory_transactions detached from the ledger for archival;
+    # balances before the end of the latest one can no longer be computed
+    month = db.Column(db.Date, primary_key=True)
+    table_name = db.Column(db.String(63), nullable=False)
+    detached_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
 class InventoryTransaction(db.Model):
     __tablename__ = 'inventory_transactions'
     
-    transaction_id = db.Column(db.Integer, primary_key=True)
+    # Range-partitioned by month on PostgreSQL (see app.services.ledger), so
+    # the partition key is part of the primary key
+    transaction_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    created_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
     inventory_id = db.Column(db.Integer, db.ForeignKey('parts_inventory.inventory_id'), nullable=False)
     work_order_id = db.Column(db.Integer, db.ForeignKey('work_orders.work_order_id'))
     transaction_type = db.Column(db.String(20), nullable=False)
@@ -415,12 +626,18 @@ class InventoryTransaction(db.Model):
     reference_number = db.Column(db.String(50))
     notes = db.Column(db.Text)
     performed_by = db.Column(db.Integer, db.ForeignKey('users.user_id'))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     inventory = db.relationship('PartsInventory', backref='transactions')
     user = db.relationship('User')
     work_order = db.relationship('WorkOrder')
     
+    __table_args__ = (
+        db.Index('ix_inventory_transactions_created_at', 'created_at', 'transaction_id'),
+        db.Index('ix_inventory_transactions_inventory_id', 'inventory_id', 'created_at'),
+        db.Index('ix_inventory_transactions_work_order_id', 'work_order_id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    
     def to_dict(self):
         return {
             'transaction_id': self.transaction_id,
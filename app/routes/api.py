@@ -1,12 +1,140 @@
-from flask import Blueprint, jsonify, request
+from datetime import datetime, timezone
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy.orm.exc import StaleDataError
 from app import db
-from app.models import (Equipment, WorkOrder, MaintenanceSchedule, 
-                        PartsInventory, Part, Location, EquipmentCategory, User)
+from app.models import Equipment, WorkOrder, WorkOrderPart, PartsInventory
+from app.services import (conditional, dashboard, events, exporter, forecast, importer, kpis,
+                          ledger, metrics, projection, reference, usage)
+from app.services.inventory import MAX_BATCH_SIZE, adjust_batch
+from app.services.pagination import InvalidCursor, keyset_paginate
+from app.services.preventive import record_completion
+from app.services.projection import InvalidFields
+from app.services.serializers import (serialize_equipment, serialize_inventory,
+                                      serialize_work_orders)
+from app.services.versioning import expect_version
 
 api_bp = Blueprint('api', __name__)
 
 
+@api_bp.errorhandler(StaleDataError)
+def handle_conflict(error):
+    db.session.rollback()
+    return jsonify({'error': 'Concurrent modification detected'}), 409
+
+
+@api_bp.errorhandler(InvalidFields)
+def handle_invalid_fields(error):
+    return jsonify({'error': str(error)}), 400
+
+
+def _fields(resource, extra=()):
+    # ?fields=a,b selects just those columns; None means the full to_dict() payload
+    value = request.args.get('fields')
+    return resource.parse(value, extra) if value is not None else None
+
+
+def _respond(payload, selection):
+    if selection is None:
+        return jsonify(payload)
+    return projection.json_response(payload)
+
+
+def _split(rows, width, projected, signature):
+    # With a signature, each row ends with its signature columns
+    if signature is None:
+        return rows, None
+    items = [row[:width] if projected else row[0] for row in rows]
+    return items, [row[width:] for row in rows]
+
+
+def _page_response(query, page, per_page, serialize, selection=None, signature=None):
+    extra = signature.columns if signature is not None else []
+    width = 1
+    if selection is not None:
+        query = selection.join(query).with_entities(*selection.columns)
+        serialize, width = selection.encode, len(selection.columns)
+    result = query.add_columns(*extra).paginate(page=page, per_page=per_page)
+    items, rows = _split(result.items, width, selection is not None, signature)
+    
+    response = _respond({
+        'items': serialize(items),
+        'total': result.total,
+        'page': page,
+        'pages': result.pages
+    }, selection)
+    return _with_list_validators(response, signature, rows, result.total)
+
+
+def _keyset_total():
+    # ?total=exact|estimate adds a count to cursor pages
+    total = request.args.get('total') or None
+    if total not in (None, 'exact', 'estimate'):
+        raise InvalidCursor('Invalid total')
+    return total
+
+
+def _keyset_response(query, keys, per_page, serialize, selection=None, signature=None):
+    # Cursor mode: ?cursor= starts at the first page
+    extra = signature.columns if signature is not None else []
+    columns, width = None, 1
+    if selection is not None:
+        query, serialize = selection.join(query), selection.encode
+        columns, width = selection.columns + extra, len(selection.columns)
+    elif extra:
+        columns = [query.column_descriptions[0]['entity'], *extra]
+    
+    try:
+        total = _keyset_total()
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        page = keyset_paginate(query, keys, per_page,
+                               cursor=request.args.get('cursor') or None,
+                               total=total, columns=columns)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    items, rows = _split(page.items, width, selection is not None, signature)
+    
+    response = _respond({
+        'items': serialize(items),
+        'next_cursor': page.next_cursor,
+        'per_page': per_page,
+        'total': page.total
+    }, selection)
+    return _with_list_validators(response, signature, rows, page.total)
+
+
+def _list_not_modified(query, keys, page, per_page, signature):
+    """A 304 for a conditional list request whose page is unchanged, else None.
+    
+    query must be ordered as the offset page is; the probe reads just the
+    signature columns of the same page.
+    """
+    if not conditional.has_validators():
+        return None
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(query, keys, per_page,
+                                     cursor=request.args.get('cursor') or None,
+                                     total=_keyset_total(), columns=signature.columns)
+        except InvalidCursor:
+            # The full request reports the error
+            return None
+    else:
+        result = query.with_entities(*signature.columns).paginate(page=page, per_page=per_page)
+    validators = conditional.page_validators(result.items, result.total, signature.kinds)
+    return conditional.not_modified(*validators, weak=True)
+
+
+def _with_list_validators(response, signature, rows, total):
+    # Error responses (e.g. an invalid cursor) come back as (body, status) tuples
+    if signature is None or isinstance(response, tuple):
+        return response
+    validators = conditional.page_validators(rows, total, signature.kinds)
+    return conditional.with_validators(response, *validators, weak=True)
+
+
 # ============================================
 # Equipment API
 # ============================================
@@ -27,21 +155,41 @@ def get_equipment():
     if location_id:
         query = query.filter_by(location_id=location_id)
     
-    equipment = query.paginate(page=page, per_page=per_page)
+    selection = _fields(projection.EQUIPMENT)
+    keys = [(Equipment.equipment_id, False)]
+    # A stable order lets a conditional request re-read the same page
+    ordered = query.order_by(Equipment.equipment_id)
+    cached = _list_not_modified(ordered, keys, page, per_page, conditional.EQUIPMENT_LIST)
+    if cached is not None:
+        return cached
     
-    return jsonify({
-        'items': [e.to_dict() for e in equipment.items],
-        'total': equipment.total,
-        'page': page,
-        'pages': equipment.pages
-    })
+    if 'cursor' in request.args:
+        return _keyset_response(query, keys, per_page, serialize_equipment, selection,
+                                conditional.EQUIPMENT_LIST)
+    return _page_response(ordered, page, per_page, serialize_equipment, selection,
+                          conditional.EQUIPMENT_LIST)
 
 
 @api_bp.route('/equipment/<int:equipment_id>', methods=['GET'])
 @login_required
 def get_equipment_detail(equipment_id):
+    selection = _fields(projection.EQUIPMENT)
+    # Answer conditional requests from a version probe, before loading anything
+    validators = conditional.equipment_validators(equipment_id)
+    if validators is None:
+        abort(404)
+    cached = conditional.not_modified(*validators)
+    if cached is not None:
+        return cached
+    
+    if selection is not None:
+        data = selection.first(Equipment.query.filter(Equipment.equipment_id == equipment_id))
+        if data is None:
+            abort(404)
+        return conditional.with_validators(projection.json_response(data), *validators)
+    
     equipment = Equipment.query.get_or_404(equipment_id)
-    return jsonify(equipment.to_dict())
+    return conditional.with_validators(jsonify(equipment.to_dict()), *validators)
 
 
 @api_bp.route('/equipment', methods=['POST'])
@@ -74,15 +222,13 @@ def update_equipment(equipment_id):
     equipment = Equipment.query.get_or_404(equipment_id)
     data = request.get_json()
     
-    # Optimistic locking
-    if data.get('version') and data['version'] != equipment.version:
-        return jsonify({'error': 'Concurrent modification detected'}), 409
+    # Optimistic locking: a stale version makes the UPDATE match no row (409)
+    expect_version(equipment, data.get('version'))
     
     for field in ['name', 'model', 'serial_number', 'manufacturer', 'status', 'notes']:
         if field in data:
             setattr(equipment, field, data[field])
     
-    equipment.version += 1
     db.session.commit()
     
     return jsonify(equipment.to_dict())
@@ -108,23 +254,45 @@ def get_work_orders():
     if assigned_to:
         query = query.filter_by(assigned_to=assigned_to)
     
-    work_orders = query.order_by(WorkOrder.created_at.desc()).paginate(page=page, per_page=per_page)
+    selection = _fields(projection.WORK_ORDERS)
+    keys = [(WorkOrder.created_at, True), (WorkOrder.work_order_id, True)]
+    ordered = query.order_by(WorkOrder.created_at.desc())
+    cached = _list_not_modified(ordered, keys, page, per_page, conditional.WORK_ORDER_LIST)
+    if cached is not None:
+        return cached
     
-    return jsonify({
-        'items': [wo.to_dict() for wo in work_orders.items],
-        'total': work_orders.total,
-        'page': page,
-        'pages': work_orders.pages
-    })
+    if 'cursor' in request.args:
+        return _keyset_response(query, keys, per_page, serialize_work_orders, selection,
+                                conditional.WORK_ORDER_LIST)
+    return _page_response(ordered, page, per_page, serialize_work_orders, selection,
+                          conditional.WORK_ORDER_LIST)
 
 
 @api_bp.route('/work-orders/<int:work_order_id>', methods=['GET'])
 @login_required
 def get_work_order_detail(work_order_id):
+    selection = _fields(projection.WORK_ORDERS, extra=('parts_used',))
+    validators = conditional.work_order_validators(work_order_id)
+    if validators is None:
+        abort(404)
+    cached = conditional.not_modified(*validators)
+    if cached is not None:
+        return cached
+    
+    if selection is not None:
+        data = selection.first(WorkOrder.query.filter(WorkOrder.work_order_id == work_order_id))
+        if data is None:
+            abort(404)
+        if 'parts_used' in selection.names:
+            data['parts_used'] = projection.WORK_ORDER_PARTS.all().rows(
+                WorkOrderPart.query.filter(WorkOrderPart.work_order_id == work_order_id)
+            )
+        return conditional.with_validators(projection.json_response(data), *validators)
+    
     work_order = WorkOrder.query.get_or_404(work_order_id)
     data = work_order.to_dict()
     data['parts_used'] = [p.to_dict() for p in work_order.parts_used]
-    return jsonify(data)
+    return conditional.with_validators(jsonify(data), *validators)
 
 
 @api_bp.route('/work-orders', methods=['POST'])
@@ -143,8 +311,6 @@ def create_work_order():
     )
     
     db.session.add(work_order)
-    db.session.flush()
-    work_order.generate_number()
     db.session.commit()
     
     return jsonify(work_order.to_dict()), 201
@@ -161,12 +327,11 @@ def update_work_order_status(work_order_id):
         return jsonify({'error': 'Invalid status'}), 400
     
     work_order.status = new_status
-    work_order.version += 1
     
     if new_status == 'completed':
-        from datetime import datetime
         work_order.completed_at = datetime.utcnow()
         work_order.labor_hours = data.get('labor_hours')
+        record_completion(work_order, work_order.completed_at)
     
     db.session.commit()
     return jsonify(work_order.to_dict())
@@ -189,37 +354,216 @@ def get_inventory():
     if low_stock:
         query = query.filter(PartsInventory.quantity_on_hand <= PartsInventory.reorder_point)
     
+    selection = _fields(projection.INVENTORY)
+    if selection is not None:
+        return projection.json_response(selection.rows(query))
+    
     inventory = query.all()
-    return jsonify([i.to_dict() for i in inventory])
+    return jsonify(serialize_inventory(inventory))
 
 
 @api_bp.route('/inventory/<int:inventory_id>/adjust', methods=['POST'])
 @login_required
 def adjust_inventory(inventory_id):
-    inventory = PartsInventory.query.get_or_404(inventory_id)
-    data = request.get_json()
+    data = request.get_json() or {}
+    line = dict(data, inventory_id=inventory_id, quantity=data.get('quantity', 0))
     
-    quantity = data.get('quantity', 0)
-    transaction_type = data.get('type', 'adjustment')
+    result = adjust_batch([line], current_user.user_id)[0]
+    if result['status'] != 'ok':
+        status_code = 404 if result['error'] == 'Inventory not found' else 400
+        return jsonify({'error': result['error']}), status_code
     
-    if transaction_type == 'issue' and inventory.available < abs(quantity):
-        return jsonify({'error': 'Insufficient inventory'}), 400
+    return jsonify(PartsInventory.query.get(inventory_id).to_dict())
+
+
+@api_bp.route('/inventory/<int:inventory_id>/balance', methods=['GET'])
+@login_required
+def get_inventory_balance(inventory_id):
+    try:
+        as_of = datetime.fromisoformat(request.args['as_of'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'as_of must be an ISO 8601 date or timestamp'}), 400
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    try:
+        balance = ledger.balance_as_of(inventory_id, as_of)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 410
+    if balance is None:
+        return jsonify({'error': 'Inventory not found'}), 404
+    return jsonify(balance)
+
+
+@api_bp.route('/inventory/forecast', methods=['GET'])
+@login_required
+def get_reorder_forecast():
+    return jsonify(forecast.list_forecasts(
+        location_id=request.args.get('location_id', type=int),
+        within_days=request.args.get('within_days', type=float),
+        limit=min(request.args.get('limit', 200, type=int), 5000)
+    ))
+
+
+@api_bp.route('/inventory/forecast', methods=['POST'])
+@login_required
+def run_reorder_forecast():
+    if not current_user.is_manager():
+        return jsonify({'error': 'Unauthorized'}), 403
+    data = request.get_json(silent=True) or {}
+    return jsonify(forecast.run_forecast(apply=bool(data.get('apply'))))
+
+
+@api_bp.route('/inventory/adjust-batch', methods=['POST'])
+@login_required
+def adjust_inventory_batch():
+    data = request.get_json(silent=True) or {}
+    lines = data.get('adjustments')
+    
+    if not isinstance(lines, list) or not lines:
+        return jsonify({'error': 'adjustments must be a non-empty list'}), 400
+    if len(lines) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} adjustments per batch'}), 400
+    
+    results = adjust_batch(lines, current_user.user_id)
+    applied = sum(1 for r in results if r['status'] == 'ok')
+    
+    return jsonify({
+        'results': results,
+        'applied': applied,
+        'failed': len(results) - applied
+    })
+
+
+# ============================================
+# Bulk Import API
+# ============================================
+
+@api_bp.route('/import', methods=['POST'])
+@login_required
+def bulk_import():
+    if not current_user.is_manager():
+        return jsonify({'error': 'Unauthorized'}), 403
     
-    inventory.quantity_on_hand += quantity
-    inventory.version += 1
+    entity = request.args.get('entity')
+    fmt = request.args.get('format', 'csv')
+    if entity not in importer.ENTITIES:
+        return jsonify({'error': f'entity must be one of {", ".join(importer.ENTITIES)}'}), 400
+    if fmt not in importer.FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(importer.FORMATS)}'}), 400
     
-    from app.models import InventoryTransaction
-    transaction = InventoryTransaction(
-        inventory_id=inventory_id,
-        transaction_type=transaction_type,
-        quantity=quantity,
-        notes=data.get('notes'),
-        performed_by=current_user.user_id
+    # The body is read as a stream, never buffered whole
+    report = importer.import_records(entity, importer.iter_records(request.stream, fmt))
+    return jsonify(report.to_dict())
+
+
+# ============================================
+# History Export API
+# ============================================
+
+@api_bp.route('/export/<dataset>', methods=['GET'])
+@login_required
+def export_history(dataset):
+    if not current_user.is_manager():
+        return jsonify({'error': 'Unauthorized'}), 403
+    if dataset not in exporter.DATASETS:
+        return jsonify({'error': 'Unknown dataset'}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in exporter.FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(exporter.FORMATS)}'}), 400
+    try:
+        start = _parse_date(request.args.get('start'))
+        end = _parse_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates (YYYY-MM-DD)'}), 400
+    
+    columns, rows = exporter.export_rows(dataset, start, end, request.args.get('location_id', type=int))
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(exporter.encode(columns, rows, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'}
     )
-    db.session.add(transaction)
-    db.session.commit()
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+# ============================================
+# Usage Readings API
+# ============================================
+
+@api_bp.route('/usage/readings', methods=['POST'])
+@login_required
+def ingest_usage_readings():
+    data = request.get_json(silent=True) or {}
+    readings = data.get('readings')
+    
+    if not isinstance(readings, list) or not readings:
+        return jsonify({'error': 'readings must be a non-empty list'}), 400
+    if len(readings) > usage.MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {usage.MAX_BATCH_SIZE} readings per batch'}), 400
     
-    return jsonify(inventory.to_dict())
+    return jsonify(usage.ingest_readings(readings))
+
+
+@api_bp.route('/equipment/<int:equipment_id>/usage', methods=['GET'])
+@login_required
+def get_equipment_usage(equipment_id):
+    Equipment.query.get_or_404(equipment_id)
+    period = request.args.get('period', 'day')
+    if period not in usage.PERIODS:
+        return jsonify({'error': f'period must be one of {", ".join(usage.PERIODS)}'}), 400
+    try:
+        start = _parse_date(request.args.get('start'))
+        end = _parse_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates (YYYY-MM-DD)'}), 400
+    
+    rollups = usage.usage_rollups(equipment_id, period, start, end)
+    return jsonify({
+        'equipment_id': equipment_id,
+        'period': period,
+        'rollups': [r.to_dict() for r in rollups]
+    })
+
+
+# ============================================
+# Analytics API
+# ============================================
+
+def _kpi_args():
+    scope = request.args.get('by', 'location')
+    if scope not in kpis.SCOPES:
+        raise ValueError(f'by must be one of {", ".join(kpis.SCOPES)}')
+    try:
+        start = _parse_date(request.args.get('start'))
+        end = _parse_date(request.args.get('end'))
+    except ValueError:
+        raise ValueError('start and end must be dates (YYYY-MM-DD)')
+    return scope, start and start.date(), end and end.date()
+
+
+@api_bp.route('/analytics/summary', methods=['GET'])
+@login_required
+def get_kpi_summary():
+    try:
+        scope, start, end = _kpi_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(kpis.kpi_summary(scope, start, end))
+
+
+@api_bp.route('/analytics/daily', methods=['GET'])
+@login_required
+def get_kpi_daily():
+    try:
+        scope, start, end = _kpi_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(kpis.kpi_daily(scope, request.args.get('key'), start, end))
 
 
 # ============================================
@@ -229,28 +573,49 @@ def adjust_inventory(inventory_id):
 @api_bp.route('/locations', methods=['GET'])
 @login_required
 def get_locations():
-    locations = Location.query.filter_by(is_active=True).all()
-    return jsonify([l.to_dict() for l in locations])
+    selection = _fields(projection.LOCATIONS)
+    locations = reference.locations()
+    return _respond(selection.pick(locations) if selection else locations, selection)
 
 
 @api_bp.route('/categories', methods=['GET'])
 @login_required
 def get_categories():
-    categories = EquipmentCategory.query.all()
-    return jsonify([c.to_dict() for c in categories])
+    selection = _fields(projection.CATEGORIES)
+    categories = reference.categories()
+    return _respond(selection.pick(categories) if selection else categories, selection)
 
 
 @api_bp.route('/users', methods=['GET'])
 @login_required
 def get_users():
-    role = request.args.get('role')
-    query = User.query.filter_by(is_active=True)
-    
-    if role:
-        query = query.filter_by(role=role)
+    selection = _fields(projection.USERS)
+    users = reference.users(role=request.args.get('role'))
+    return _respond(selection.pick(users) if selection else users, selection)
+
+
+@api_bp.route('/cache/stats', methods=['GET'])
+@login_required
+def get_cache_stats():
+    if not current_user.is_admin():
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(reference.cache_stats())
+
+
+@api_bp.route('/_metrics', methods=['GET'])
+@login_required
+def get_metrics():
+    if not current_user.is_admin():
+        return jsonify({'error': 'Unauthorized'}), 403
     
-    users = query.all()
-    return jsonify([u.to_dict() for u in users])
+    hits = metrics.Metric('app_reference_cache_hits_total', 'Reference cache hits by kind.',
+                          'counter', ('kind',))
+    misses = metrics.Metric('app_reference_cache_misses_total', 'Reference cache reloads by kind.',
+                            'counter', ('kind',))
+    for kind, counts in reference.cache_stats().items():
+        hits.values[(kind,)] = counts['hits']
+        misses.values[(kind,)] = counts['misses']
+    return Response(metrics.render([hits, misses]), mimetype='text/plain; version=0.0.4')
 
 
 # ============================================
@@ -260,33 +625,48 @@ def get_users():
 @api_bp.route('/dashboard/stats', methods=['GET'])
 @login_required
 def get_dashboard_stats():
-    from datetime import datetime
-    
-    stats = {
-        'equipment': {
-            'total': Equipment.query.count(),
-            'active': Equipment.query.filter_by(status='active').count(),
-            'under_repair': Equipment.query.filter_by(status='under_repair').count()
-        },
-        'work_orders': {
-            'open': WorkOrder.query.filter_by(status='open').count(),
-            'in_progress': WorkOrder.query.filter_by(status='in_progress').count(),
-            'completed_today': WorkOrder.query.filter(
-                WorkOrder.status == 'completed',
-                db.func.date(WorkOrder.completed_at) == datetime.utcnow().date()
-            ).count()
-        },
-        'maintenance': {
-            'overdue': MaintenanceSchedule.query.filter(
-                MaintenanceSchedule.is_active == True,
-                MaintenanceSchedule.next_due < datetime.utcnow()
-            ).count()
-        },
-        'inventory': {
-            'low_stock': PartsInventory.query.filter(
-                PartsInventory.quantity_on_hand <= PartsInventory.reorder_point
-            ).count()
-        }
-    }
-    
-    return jsonify(stats)
+    stats = dashboard.get_dashboard_stats(current_user.user_id)
+    return jsonify(dashboard.stats_payload(stats))
+
+
+# ============================================
+# Event Stream API
+# ============================================
+
+@api_bp.route('/stream', methods=['GET'])
+@login_required
+def stream_events():
+    config = current_app.config
+    # Each stream holds a request thread until it ends, so only a few may
+    # run per process; many screens belong on the ASGI entry point
+    if not events.claim_thread_stream(config.get('STREAM_THREAD_LIMIT', 1)):
+        response = jsonify({'error': 'Too many open streams; poll /api/dashboard/stats instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(config.get('STREAM_MAX_SECONDS', 300))
+        return response
+    
+    try:
+        user_id = current_user.user_id
+        events.start_bridge(db.engine.url)
+        
+        def dashboard_payload():
+            payload = dashboard.stats_payload(dashboard.get_dashboard_stats(user_id))
+            # Hand the connection back to the pool between updates of a long-lived stream
+            db.session.close()
+            return payload
+        
+        db.session.close()
+        response = Response(
+            stream_with_context(events.stream(
+                dashboard_payload, config.get('STREAM_HEARTBEAT_SECONDS', 15),
+                config.get('STREAM_DASHBOARD_INTERVAL', 5), config.get('STREAM_MAX_SECONDS', 300)
+            )),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    except Exception:
+        events.release_thread_stream()
+        raise
+    # The server closes the response when the stream ends or the client leaves
+    response.call_on_close(events.release_thread_stream)
+    return response
@@ -0,0 +1,122 @@
+import math
+from sqlalchemy.engine import make_url
+from werkzeug.http import parse_date, parse_etags
+from app import db
+from app.models import WorkOrder
+from app.services import conditional, dashboard, events, projection
+
+
+# ============================================
+# Async API reads
+#
+# Coroutine versions of the GET endpoints that dashboards and kiosks poll,
+# served by app.asgi on the async engine. They answer exactly like the
+# Flask views in app/routes/api.py. A handler returns (status, headers,
+# body), where body is bytes or an async iterator of str (a stream), or
+# None to pass the request on to the Flask view unchanged (e.g. cursor
+# pagination, or an out-of-range page that Flask answers with 404).
+# ============================================
+
+def _int_arg(args, name, default=None):
+    # Same as request.args.get(name, default, type=int)
+    try:
+        return int(args[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _json(payload, status=200, headers=()):
+    return status, [('Content-Type', 'application/json'), *headers], projection.dumps(payload)
+
+
+def _is_fresh(request, etag, last_modified):
+    return conditional.is_fresh(parse_etags(request.headers.get('if-none-match')),
+                                parse_date(request.headers.get('if-modified-since')),
+                                etag, last_modified)
+
+
+async def get_dashboard_stats(request):
+    stats = await dashboard.get_dashboard_stats_async(
+        request.api.sessions, request.api.config.get('DASHBOARD_STATS_TTL', 30), request.user_id
+    )
+    return _json(dashboard.stats_payload(stats))
+
+
+async def get_work_orders(request):
+    args = request.args
+    page = _int_arg(args, 'page', 1)
+    per_page = _int_arg(args, 'per_page', 20)
+    if 'cursor' in args or page < 1 or per_page < 1:
+        return None
+    
+    try:
+        selection = (projection.WORK_ORDERS.parse(args['fields']) if 'fields' in args
+                     else projection.WORK_ORDERS.all())
+    except projection.InvalidFields as e:
+        return _json({'error': str(e)}, 400)
+    
+    filters = []
+    if args.get('status'):
+        filters.append(WorkOrder.status == args['status'])
+    assigned_to = _int_arg(args, 'assigned_to')
+    if assigned_to:
+        filters.append(WorkOrder.assigned_to == assigned_to)
+    
+    signature = conditional.WORK_ORDER_LIST
+    
+    def page_of(*columns):
+        return (db.select(*columns).select_from(WorkOrder).where(*filters)
+                .order_by(WorkOrder.created_at.desc())
+                .limit(per_page).offset((page - 1) * per_page))
+    
+    async with request.api.sessions() as session:
+        total = (await session.execute(
+            db.select(db.func.count()).select_from(WorkOrder).where(*filters)
+        )).scalar()
+        if page > 1 and (page - 1) * per_page >= total:
+            return None
+        versions = await request.api.reference_versions(session, signature.kinds)
+        
+        # Like the Flask view, only a conditional request pays for a probe of the page
+        if 'if-none-match' in request.headers or 'if-modified-since' in request.headers:
+            rows = (await session.execute(page_of(*signature.columns))).all()
+            etag, last_modified = conditional.list_etag(request.query_string, total, rows, versions)
+            if _is_fresh(request, etag, last_modified):
+                return 304, conditional.validator_headers(etag, last_modified, weak=True), b''
+        
+        width = len(selection.columns)
+        rows = (await session.execute(
+            selection.join(page_of(*selection.columns, *signature.columns))
+        )).all()
+    
+    etag, last_modified = conditional.list_etag(request.query_string, total,
+                                                [row[width:] for row in rows], versions)
+    return _json({
+        'items': selection.encode([row[:width] for row in rows]),
+        'total': total,
+        'page': page,
+        'pages': math.ceil(total / per_page)
+    }, headers=conditional.validator_headers(etag, last_modified, weak=True))
+
+
+async def get_stream(request):
+    config = request.api.config
+    events.start_bridge(make_url(config['SQLALCHEMY_DATABASE_URI']))
+    
+    async def dashboard_payload():
+        stats = await dashboard.get_dashboard_stats_async(
+            request.api.sessions, config.get('DASHBOARD_STATS_TTL', 30), request.user_id
+        )
+        return dashboard.stats_payload(stats)
+    
+    body = events.stream_async(dashboard_payload, config.get('STREAM_HEARTBEAT_SECONDS', 15),
+                               config.get('STREAM_DASHBOARD_INTERVAL', 5))
+    return 200, [('Content-Type', 'text/event-stream'), ('Cache-Control', 'no-cache'),
+                 ('X-Accel-Buffering', 'no')], body
+
+
+ROUTES = {
+    '/api/dashboard/stats': get_dashboard_stats,
+    '/api/work-orders': get_work_orders,
+    '/api/stream': get_stream,
+}
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import User
+from app.services.passwords import PasswordCheckBusy, hash_password, verify_password
+from app.services.principals import invalidate_principal
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -19,7 +21,13 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and verify_password(user, password)
+        except PasswordCheckBusy:
+            flash('The server is busy signing people in. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html'), 503
+        
+        if valid:
             if not user.is_active:
                 flash('Your account has been deactivated. Contact an administrator.', 'danger')
                 return redirect(url_for('auth.login'))
@@ -48,25 +56,29 @@ def logout():
 @auth_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
+    # current_user is a cached principal; edits go through the User row
+    user = User.query.get_or_404(current_user.user_id)
+    
     if request.method == 'POST':
-        current_user.first_name = request.form.get('first_name')
-        current_user.last_name = request.form.get('last_name')
-        current_user.email = request.form.get('email')
-        current_user.phone = request.form.get('phone')
+        user.first_name = request.form.get('first_name')
+        user.last_name = request.form.get('last_name')
+        user.email = request.form.get('email')
+        user.phone = request.form.get('phone')
         
         # Change password if provided
         new_password = request.form.get('new_password')
         if new_password:
             current_password = request.form.get('current_password')
-            if current_user.check_password(current_password):
-                current_user.set_password(new_password)
+            if verify_password(user, current_password):
+                user.password_hash = hash_password(new_password)
                 flash('Password updated successfully.', 'success')
             else:
                 flash('Current password is incorrect.', 'danger')
                 return redirect(url_for('auth.profile'))
         
         db.session.commit()
+        invalidate_principal(user.user_id)
         flash('Profile updated successfully.', 'success')
         return redirect(url_for('auth.profile'))
     
-    return render_template('auth/profile.html')
+    return render_template('auth/profile.html', user=user)
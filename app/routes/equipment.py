@@ -1,7 +1,10 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app import db
-from app.models import Equipment, EquipmentCategory, Location
+from app.models import Equipment
+from app.services import reference
+from app.services.search import apply_search
+from app.services.versioning import expect_version
 from sqlalchemy.exc import IntegrityError
 
 equipment_bp = Blueprint('equipment', __name__)
@@ -25,17 +28,11 @@ def list_equipment():
     if location_id:
         query = query.filter_by(location_id=location_id)
     if search:
-        query = query.filter(
-            db.or_(
-                Equipment.name.ilike(f'%{search}%'),
-                Equipment.serial_number.ilike(f'%{search}%'),
-                Equipment.manufacturer.ilike(f'%{search}%')
-            )
-        )
+        query = apply_search(query, [Equipment.name, Equipment.serial_number, Equipment.manufacturer], search)
     
     equipment = query.order_by(Equipment.name).paginate(page=page, per_page=20)
-    categories = EquipmentCategory.query.order_by(EquipmentCategory.name).all()
-    locations = Location.query.filter_by(is_active=True).order_by(Location.name).all()
+    categories = reference.categories()
+    locations = reference.locations()
     
     return render_template('equipment/list.html', 
                           equipment=equipment, 
@@ -70,8 +67,8 @@ def create():
             db.session.rollback()
             flash('Serial number already exists.', 'danger')
     
-    categories = EquipmentCategory.query.order_by(EquipmentCategory.name).all()
-    locations = Location.query.filter_by(is_active=True).order_by(Location.name).all()
+    categories = reference.categories()
+    locations = reference.locations()
     
     return render_template('equipment/form.html', 
                           categories=categories, 
@@ -92,11 +89,8 @@ def edit(equipment_id):
     equipment = Equipment.query.get_or_404(equipment_id)
     
     if request.method == 'POST':
-        # Check version for optimistic locking
-        submitted_version = int(request.form.get('version', 0))
-        if submitted_version != equipment.version:
-            flash('This record was modified by another user. Please review and try again.', 'warning')
-            return redirect(url_for('equipment.edit', equipment_id=equipment_id))
+        # Optimistic locking: the UPDATE only applies to the version the form was built from
+        expect_version(equipment, request.form.get('version', 0, type=int))
         
         equipment.name = request.form.get('name')
         equipment.model = request.form.get('model')
@@ -110,7 +104,6 @@ def edit(equipment_id):
         equipment.status = request.form.get('status')
         equipment.usage_hours = request.form.get('usage_hours') or 0
         equipment.notes = request.form.get('notes')
-        equipment.version += 1
         
         try:
             db.session.commit()
@@ -120,8 +113,8 @@ def edit(equipment_id):
             db.session.rollback()
             flash('Serial number already exists.', 'danger')
     
-    categories = EquipmentCategory.query.order_by(EquipmentCategory.name).all()
-    locations = Location.query.filter_by(is_active=True).order_by(Location.name).all()
+    categories = reference.categories()
+    locations = reference.locations()
     
     return render_template('equipment/form.html', 
                           equipment=equipment,
@@ -1,7 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
 from app import db
-from app.models import Part, PartsInventory, Location, InventoryTransaction
+from app.models import Part, PartsInventory, InventoryTransaction
+from app.services import reference
+from app.services.inventory import adjust_stock
+from app.services.pagination import InvalidCursor, keyset_paginate
+from app.services.search import apply_search
 from sqlalchemy.exc import IntegrityError
 
 inventory_bp = Blueprint('inventory', __name__)
@@ -22,15 +26,10 @@ def list_inventory():
     if low_stock:
         query = query.filter(PartsInventory.quantity_on_hand <= PartsInventory.reorder_point)
     if search:
-        query = query.filter(
-            db.or_(
-                Part.name.ilike(f'%{search}%'),
-                Part.part_number.ilike(f'%{search}%')
-            )
-        )
+        query = apply_search(query, [Part.name, Part.part_number], search)
     
     inventory = query.order_by(Part.name).paginate(page=page, per_page=20)
-    locations = Location.query.filter_by(is_active=True).order_by(Location.name).all()
+    locations = reference.locations()
     
     return render_template('inventory/list.html', 
                           inventory=inventory,
@@ -46,13 +45,7 @@ def list_parts():
     query = Part.query
     
     if search:
-        query = query.filter(
-            db.or_(
-                Part.name.ilike(f'%{search}%'),
-                Part.part_number.ilike(f'%{search}%'),
-                Part.category.ilike(f'%{search}%')
-            )
-        )
+        query = apply_search(query, [Part.name, Part.part_number, Part.category], search)
     
     parts = query.order_by(Part.name).paginate(page=page, per_page=20)
     return render_template('inventory/parts.html', parts=parts)
@@ -130,9 +123,8 @@ def receive_parts():
             db.session.add(inventory)
             db.session.flush()
         
-        # Update quantity
-        inventory.quantity_on_hand += quantity
-        inventory.version += 1
+        # Update quantity atomically
+        adjust_stock(inventory.inventory_id, quantity)
         
         # Log transaction
         transaction = InventoryTransaction(
@@ -149,8 +141,8 @@ def receive_parts():
         flash(f'Received {quantity} units into inventory.', 'success')
         return redirect(url_for('inventory.list_inventory'))
     
-    parts = Part.query.filter_by(is_active=True).order_by(Part.name).all()
-    locations = Location.query.filter_by(is_active=True).order_by(Location.name).all()
+    parts = reference.active_parts()
+    locations = reference.locations()
     
     return render_template('inventory/receive.html', parts=parts, locations=locations)
 
@@ -164,24 +156,24 @@ def issue_parts():
         work_order_id = request.form.get('work_order_id', type=int) or None
         notes = request.form.get('notes')
         
-        inventory = PartsInventory.query.get_or_404(inventory_id)
-        
-        # Check available quantity
-        if inventory.available < quantity:
-            flash(f'Insufficient inventory. Available: {inventory.available}', 'danger')
+        # Check and decrement available quantity in one statement
+        row = adjust_stock(inventory_id, -quantity, check_available=True)
+        if row is None:
+            # Read the stock left in this transaction before rolling it back
+            inventory = db.session.get(PartsInventory, inventory_id)
+            message = (f'Insufficient inventory. Available: {inventory.available}' if inventory
+                       else 'Inventory record not found.')
+            db.session.rollback()
+            flash(message, 'danger')
             return redirect(url_for('inventory.issue_parts'))
         
-        # Update quantity
-        inventory.quantity_on_hand -= quantity
-        inventory.version += 1
-        
         # Log transaction
         transaction = InventoryTransaction(
             inventory_id=inventory_id,
             work_order_id=work_order_id,
             transaction_type='issue',
             quantity=-quantity,
-            unit_cost=inventory.part.unit_cost,
+            unit_cost=db.select(Part.unit_cost).where(Part.part_id == row.part_id).scalar_subquery(),
             notes=notes,
             performed_by=current_user.user_id
         )
@@ -201,11 +193,16 @@ def issue_parts():
 @inventory_bp.route('/transactions')
 @login_required
 def transactions():
-    page = request.args.get('page', 1, type=int)
-    
-    transactions = InventoryTransaction.query.order_by(
-        InventoryTransaction.created_at.desc()
-    ).paginate(page=page, per_page=50)
+    # Keyset pagination: the ledger is append-only and deep OFFSETs get slow
+    try:
+        transactions = keyset_paginate(
+            InventoryTransaction.query,
+            [(InventoryTransaction.created_at, True), (InventoryTransaction.transaction_id, True)],
+            per_page=50,
+            cursor=request.args.get('cursor')
+        )
+    except InvalidCursor:
+        abort(400)
     
     return render_template('inventory/transactions.html', transactions=transactions)
 
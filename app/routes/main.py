@@ -1,8 +1,8 @@
 from flask import Blueprint, render_template
 from flask_login import login_required, current_user
-from app.models import Equipment, WorkOrder, MaintenanceSchedule, PartsInventory
+from app.models import WorkOrder, MaintenanceSchedule
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from app.services.dashboard import get_dashboard_stats
 
 main_bp = Blueprint('main', __name__)
 
@@ -19,25 +19,8 @@ from flask import redirect, url_for
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Equipment stats
-    total_equipment = Equipment.query.count()
-    active_equipment = Equipment.query.filter_by(status='active').count()
-    under_repair = Equipment.query.filter_by(status='under_repair').count()
-    
-    # Work order stats
-    open_work_orders = WorkOrder.query.filter(WorkOrder.status.in_(['open', 'in_progress'])).count()
-    my_work_orders = WorkOrder.query.filter_by(assigned_to=current_user.user_id, status='open').count()
-    
-    # Overdue maintenance
-    overdue_maintenance = MaintenanceSchedule.query.filter(
-        MaintenanceSchedule.is_active == True,
-        MaintenanceSchedule.next_due < datetime.utcnow()
-    ).count()
-    
-    # Low stock items
-    low_stock = PartsInventory.query.filter(
-        PartsInventory.quantity_on_hand <= PartsInventory.reorder_point
-    ).count()
+    # Shared counters, cached across requests and refreshed on writes
+    stats = get_dashboard_stats(current_user.user_id)
     
     # Recent work orders
     recent_work_orders = WorkOrder.query.order_by(WorkOrder.created_at.desc()).limit(5).all()
@@ -48,16 +31,6 @@ def dashboard():
         MaintenanceSchedule.next_due <= datetime.utcnow() + timedelta(days=7)
     ).order_by(MaintenanceSchedule.next_due).limit(5).all()
     
-    stats = {
-        'total_equipment': total_equipment,
-        'active_equipment': active_equipment,
-        'under_repair': under_repair,
-        'open_work_orders': open_work_orders,
-        'my_work_orders': my_work_orders,
-        'overdue_maintenance': overdue_maintenance,
-        'low_stock': low_stock
-    }
-    
     return render_template('main/dashboard.html', 
                           stats=stats, 
                           recent_work_orders=recent_work_orders,
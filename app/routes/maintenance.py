@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app import db
 from app.models import MaintenanceSchedule, Equipment, WorkOrder
+from app.services.versioning import expect_version
 from datetime import datetime, timedelta
 
 maintenance_bp = Blueprint('maintenance', __name__)
@@ -43,7 +44,12 @@ def create():
         
         # Calculate next due
         if schedule.frequency_days:
-            schedule.next_due = datetime.utcnow() + timedelta(days=schedule.frequency_days)
+            schedule.next_due = datetime.utcnow() + timedelta(days=int(schedule.frequency_days))
+        
+        # Usage-based tasks count hours from the equipment's current reading
+        equipment = Equipment.query.get(schedule.equipment_id)
+        if equipment:
+            schedule.last_usage_hours = equipment.usage_hours or 0
         
         db.session.add(schedule)
         db.session.commit()
@@ -74,6 +80,9 @@ def edit(schedule_id):
     schedule = MaintenanceSchedule.query.get_or_404(schedule_id)
     
     if request.method == 'POST':
+        # Optimistic locking: the UPDATE only applies to the version the form was built from
+        expect_version(schedule, request.form.get('version', type=int))
+        
         schedule.task_name = request.form.get('task_name')
         schedule.description = request.form.get('description')
         schedule.frequency_days = request.form.get('frequency_days') or None
@@ -81,7 +90,6 @@ def edit(schedule_id):
         schedule.estimated_duration_min = request.form.get('estimated_duration_min') or None
         schedule.priority = request.form.get('priority')
         schedule.is_active = request.form.get('is_active') == 'on'
-        schedule.version += 1
         
         db.session.commit()
         flash('Maintenance schedule updated.', 'success')
@@ -108,8 +116,6 @@ def create_work_order(schedule_id):
     )
     
     db.session.add(work_order)
-    db.session.flush()
-    work_order.generate_number()
     db.session.commit()
     
     flash(f'Work order {work_order.work_order_number} created from maintenance schedule.', 'success')
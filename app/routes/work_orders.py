@@ -1,7 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
 from app import db
-from app.models import WorkOrder, Equipment, User, Location
+from app.models import WORK_ORDER_LIST_ORDER, WorkOrder, Equipment
+from app.services import reference
+from app.services.pagination import InvalidCursor, keyset_paginate
+from app.services.preventive import record_completion
+from app.services.versioning import expect_version
 from datetime import datetime
 
 work_orders_bp = Blueprint('work_orders', __name__)
@@ -10,7 +14,6 @@ work_orders_bp = Blueprint('work_orders', __name__)
 @work_orders_bp.route('/')
 @login_required
 def list_work_orders():
-    page = request.args.get('page', 1, type=int)
     status = request.args.get('status')
     priority = request.args.get('priority')
     wo_type = request.args.get('type')
@@ -30,23 +33,25 @@ def list_work_orders():
     if my_orders:
         query = query.filter_by(assigned_to=current_user.user_id)
     
-    # Default sort: priority then date
-    query = query.order_by(
-        db.case(
-            (WorkOrder.priority == 'critical', 1),
-            (WorkOrder.priority == 'high', 2),
-            (WorkOrder.priority == 'medium', 3),
-            else_=4
-        ),
-        WorkOrder.scheduled_date.asc().nullslast()
-    )
+    # Default sort: priority then date (undated last), keyset-paginated
+    # along ix_work_orders_list_order
+    keys = [(expr, False) for expr in WORK_ORDER_LIST_ORDER]
     
-    work_orders = query.paginate(page=page, per_page=20)
-    technicians = User.query.filter(User.role.in_(['technician', 'manager'])).order_by(User.first_name).all()
+    try:
+        work_orders = keyset_paginate(query, keys, per_page=20,
+                                      cursor=request.args.get('cursor'),
+                                      total='estimate')
+    except InvalidCursor:
+        abort(400)
+    
+    technicians = reference.technicians(active_only=False)
+    
+    filters = {k: v for k, v in request.args.items() if k not in ('cursor', 'page')}
     
     return render_template('work_orders/list.html', 
                           work_orders=work_orders,
-                          technicians=technicians)
+                          technicians=technicians,
+                          filters=filters)
 
 
 @work_orders_bp.route('/create', methods=['GET', 'POST'])
@@ -65,15 +70,13 @@ def create():
         )
         
         db.session.add(work_order)
-        db.session.flush()  # Get the ID
-        work_order.generate_number()
         db.session.commit()
         
         flash(f'Work order {work_order.work_order_number} created successfully.', 'success')
         return redirect(url_for('work_orders.view', work_order_id=work_order.work_order_id))
     
     equipment = Equipment.query.filter(Equipment.status != 'retired').order_by(Equipment.name).all()
-    technicians = User.query.filter(User.role.in_(['technician', 'manager']), User.is_active == True).order_by(User.first_name).all()
+    technicians = reference.technicians()
     
     # Pre-select equipment if passed in URL
     selected_equipment = request.args.get('equipment_id', type=int)
@@ -98,11 +101,8 @@ def edit(work_order_id):
     work_order = WorkOrder.query.get_or_404(work_order_id)
     
     if request.method == 'POST':
-        # Optimistic locking check
-        submitted_version = int(request.form.get('version', 0))
-        if submitted_version != work_order.version:
-            flash('This work order was modified by another user. Please review and try again.', 'warning')
-            return redirect(url_for('work_orders.edit', work_order_id=work_order_id))
+        # Optimistic locking: the UPDATE only applies to the version the form was built from
+        expect_version(work_order, request.form.get('version', 0, type=int))
         
         work_order.title = request.form.get('title')
         work_order.description = request.form.get('description')
@@ -111,14 +111,13 @@ def edit(work_order_id):
         work_order.assigned_to = request.form.get('assigned_to') or None
         work_order.scheduled_date = request.form.get('scheduled_date') or None
         work_order.notes = request.form.get('notes')
-        work_order.version += 1
         
         db.session.commit()
         flash('Work order updated successfully.', 'success')
         return redirect(url_for('work_orders.view', work_order_id=work_order_id))
     
     equipment = Equipment.query.filter(Equipment.status != 'retired').order_by(Equipment.name).all()
-    technicians = User.query.filter(User.role.in_(['technician', 'manager']), User.is_active == True).order_by(User.first_name).all()
+    technicians = reference.technicians()
     
     return render_template('work_orders/form.html',
                           work_order=work_order,
@@ -138,7 +137,6 @@ def start(work_order_id):
     
     work_order.status = 'in_progress'
     work_order.started_at = datetime.utcnow()
-    work_order.version += 1
     
     # Set equipment to under_repair if it's a corrective/emergency order
     if work_order.type in ['corrective', 'emergency']:
@@ -164,15 +162,13 @@ def complete(work_order_id):
         work_order.labor_hours = request.form.get('labor_hours') or None
         work_order.labor_cost = request.form.get('labor_cost') or None
         work_order.notes = request.form.get('notes')
-        work_order.version += 1
         
         # Set equipment back to active
         if work_order.equipment.status == 'under_repair':
             work_order.equipment.status = 'active'
         
         # Update maintenance schedule if linked
-        if work_order.schedule:
-            work_order.schedule.last_performed = datetime.utcnow()
+        record_completion(work_order, work_order.completed_at)
         
         db.session.commit()
         flash(f'Work order {work_order.work_order_number} completed!', 'success')
@@ -193,7 +189,6 @@ def cancel(work_order_id):
     reason = request.form.get('reason', 'No reason provided')
     work_order.status = 'cancelled'
     work_order.notes = (work_order.notes or '') + f'\n\nCancelled: {reason}'
-    work_order.version += 1
     
     db.session.commit()
     flash('Work order cancelled.', 'info')
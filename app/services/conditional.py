@@ -0,0 +1,145 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import make_response, request
+from werkzeug.http import http_date, quote_etag
+from app import db
+from app.models import Equipment, WorkOrder
+from app.services import reference
+
+
+# ============================================
+# Conditional GET
+#
+# Detail endpoints answer from a one-row probe of the columns their JSON
+# depends on: the row's version and updated_at, the updated_at of joined
+# rows whose fields appear in the payload, and the reference cache versions
+# for the names it embeds. When If-None-Match (or, without it,
+# If-Modified-Since) matches, the route returns 304 before the object is
+# loaded or serialized. A sparse fieldset (?fields=) is a different
+# representation, so it is part of the tag. List endpoints get a weak ETag
+# from the page itself: the query string, the total it reports and each
+# listed row's ListSignature. A plain request reads the signature columns
+# with the page at no extra cost; only a request that carries validators
+# runs a probe, of just those columns for the same page.
+# ============================================
+
+def _digest(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=10).hexdigest()
+
+
+def _reference_versions(*kinds):
+    return tuple(reference.current_version(kind) for kind in kinds)
+
+
+def http_time(value):
+    # Stored timestamps are naive UTC; HTTP dates have whole-second precision
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def equipment_validators(equipment_id):
+    """(etag, last_modified) for one machine, or None if it does not exist."""
+    row = db.session.execute(
+        db.select(Equipment.version, Equipment.updated_at, Equipment.warranty_expiration)
+        .where(Equipment.equipment_id == equipment_id)
+    ).first()
+    if row is None:
+        return None
+    version, updated_at, warranty_expiration = row
+    # under_warranty is derived from today's date, so it is part of the tag
+    under_warranty = bool(warranty_expiration and warranty_expiration > datetime.utcnow().date())
+    etag = '%s-%s' % (version, _digest(updated_at, under_warranty, request.args.get('fields'),
+                                       _reference_versions('categories', 'locations')))
+    return etag, updated_at
+
+
+def work_order_validators(work_order_id):
+    """(etag, last_modified) for one work order, or None if it does not exist.
+    
+    Part lines change the order's stored costs, which advances its
+    updated_at (see app.services.costs), so they need no probe of their own.
+    """
+    row = db.session.execute(
+        db.select(WorkOrder.version, WorkOrder.updated_at, Equipment.updated_at)
+        .outerjoin(Equipment, Equipment.equipment_id == WorkOrder.equipment_id)
+        .where(WorkOrder.work_order_id == work_order_id)
+    ).first()
+    if row is None:
+        return None
+    version, updated_at, equipment_updated_at = row
+    etag = '%s-%s' % (version, _digest(updated_at, equipment_updated_at, request.args.get('fields'),
+                                       _reference_versions('locations', 'users', 'parts')))
+    return etag, max(filter(None, (updated_at, equipment_updated_at)), default=None)
+
+
+class ListSignature:
+    """The columns that identify the state of one listed row.
+    
+    columns are the row's primary key followed by the updated_at of every
+    table its JSON reads from; kinds are the reference sets it embeds.
+    """
+    
+    def __init__(self, columns, kinds=()):
+        self.columns = [column.label(f'_signature{i}') for i, column in enumerate(columns)]
+        self.kinds = kinds
+
+
+EQUIPMENT_LIST = ListSignature([Equipment.equipment_id, Equipment.updated_at], ('categories', 'locations'))
+
+# Listed orders embed their machine's name; a correlated lookup keeps the
+# signature independent of the joins a sparse fieldset adds
+WORK_ORDER_LIST = ListSignature([
+    WorkOrder.work_order_id,
+    WorkOrder.updated_at,
+    db.select(Equipment.updated_at).where(Equipment.equipment_id == WorkOrder.equipment_id)
+    .correlate(WorkOrder).scalar_subquery(),
+], ('locations', 'users'))
+
+
+def has_validators():
+    """Whether the request could be answered with a 304 at all."""
+    return bool(request.if_none_match or request.if_modified_since)
+
+
+def page_validators(rows, total, kinds=()):
+    """(weak etag, last_modified) for a list page from its signature rows."""
+    return list_etag(request.query_string, total, rows, _reference_versions(*kinds))
+
+
+def list_etag(query_string, total, rows, versions):
+    """(weak list tag, last_modified) from a page's signature rows, its total and reference versions."""
+    rows = [tuple(row) for row in rows]
+    latest = max((value for row in rows for value in row[1:] if value is not None), default=None)
+    return _digest(query_string, total, rows, tuple(versions)), latest
+
+
+def not_modified(etag, last_modified=None, weak=False):
+    """A 304 response if the request's validators match, else None."""
+    if not is_fresh(request.if_none_match, request.if_modified_since, etag, last_modified):
+        return None
+    return with_validators(make_response('', 304), etag, last_modified, weak)
+
+
+def is_fresh(if_none_match, if_modified_since, etag, last_modified=None):
+    """Whether parsed If-None-Match / If-Modified-Since values still match."""
+    if if_none_match:
+        # If-None-Match always uses the weak comparison
+        return if_none_match.contains_weak(etag)
+    if if_modified_since and last_modified is not None:
+        return http_time(last_modified) <= if_modified_since
+    return False
+
+
+def with_validators(response, etag, last_modified=None, weak=False):
+    """Attach ETag, Last-Modified and a revalidate-every-time Cache-Control."""
+    for name, value in validator_headers(etag, last_modified, weak):
+        response.headers[name] = value
+    return response
+
+
+def validator_headers(etag, last_modified=None, weak=False):
+    headers = [('ETag', quote_etag(etag, weak)), ('Cache-Control', 'private, no-cache')]
+    if last_modified is not None:
+        headers.append(('Last-Modified', http_date(http_time(last_modified))))
+    return headers
@@ -0,0 +1,80 @@
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import WorkOrder, WorkOrderPart
+
+
+# ============================================
+# Stored work order costs
+#
+# work_orders.parts_cost and total_cost are kept in step with
+# work_order_parts and labor_cost. Every flush that adds, changes or removes
+# a WorkOrderPart, or changes a work order's labor cost, recomputes the
+# affected rows with one set-based UPDATE. reconcile_work_order_costs()
+# recomputes every row, e.g. after bulk loads that bypass the ORM. Both
+# advance updated_at, which the work order ETags are derived from.
+# ============================================
+
+def _parts_total():
+    return (
+        db.select(db.func.coalesce(
+            db.func.sum(WorkOrderPart.quantity_used * db.func.coalesce(WorkOrderPart.unit_cost, 0)), 0
+        ))
+        .where(WorkOrderPart.work_order_id == WorkOrder.work_order_id)
+        .scalar_subquery()
+    )
+
+
+def cost_update(work_order_ids=None, drifted_only=False):
+    """UPDATE statement recomputing stored costs, for all rows or the given ids.
+    
+    With drifted_only, rows whose stored costs are already right are skipped.
+    """
+    parts_total = _parts_total()
+    costs = {
+        'parts_cost': parts_total,
+        'total_cost': db.func.coalesce(WorkOrder.labor_cost, 0) + parts_total,
+    }
+    stmt = db.update(WorkOrder).values(updated_at=datetime.utcnow(), **costs)
+    if work_order_ids is not None:
+        stmt = stmt.where(WorkOrder.work_order_id.in_(work_order_ids))
+    if drifted_only:
+        stmt = stmt.where(db.or_(*[getattr(WorkOrder, name) != value for name, value in costs.items()]))
+    return stmt.execution_options(synchronize_session=False)
+
+
+def reconcile_work_order_costs():
+    """Recompute stored costs for every work order; returns rows that changed."""
+    result = db.session.execute(cost_update(drifted_only=True))
+    db.session.commit()
+    return result.rowcount
+
+
+@event.listens_for(Session, 'after_flush')
+def _recompute_flushed_costs(session, flush_context):
+    ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, WorkOrderPart):
+            ids.add(obj.work_order_id)
+            # A part line moved to another work order changes both totals
+            ids.update(inspect(obj).attrs.work_order_id.history.deleted)
+        elif isinstance(obj, WorkOrder) and obj not in session.deleted:
+            if obj in session.new or inspect(obj).attrs.labor_cost.history.has_changes():
+                ids.add(obj.work_order_id)
+    ids.discard(None)
+    
+    if ids:
+        session.connection().execute(cost_update(ids))
+        session.info.setdefault('cost_refreshed', set()).update(ids)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_refreshed_costs(session, flush_context):
+    ids = session.info.pop('cost_refreshed', None)
+    if not ids:
+        return
+    for obj in session.identity_map.values():
+        if isinstance(obj, WorkOrder) and obj.work_order_id in ids:
+            session.expire(obj, ['parts_cost', 'total_cost', 'updated_at'])
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Equipment, WorkOrder, MaintenanceSchedule, PartsInventory
+from app.services import events
+
+
+# ============================================
+# Dashboard statistics
+#
+# Every counter shown on the dashboard is computed with one conditional
+# aggregate per table and kept in a process-wide snapshot for
+# DASHBOARD_STATS_TTL seconds. Commits that touch any of the counted tables
+# drop the snapshot so the next request recomputes it. The async API
+# (app.asgi) runs the same statements and shares the snapshot.
+# ============================================
+
+TRACKED_MODELS = (Equipment, WorkOrder, MaintenanceSchedule, PartsInventory)
+
+_lock = threading.Lock()
+_snapshot = None  # (expires_at, stats)
+
+
+def _count_if(condition):
+    return db.func.count(db.case((condition, 1)))
+
+
+def _statements(now):
+    today = datetime(now.year, now.month, now.day)
+    return [
+        db.select(
+            db.func.count(Equipment.equipment_id),
+            _count_if(Equipment.status == 'active'),
+            _count_if(Equipment.status == 'under_repair')
+        ),
+        db.select(
+            _count_if(WorkOrder.status == 'open'),
+            _count_if(WorkOrder.status == 'in_progress'),
+            _count_if(db.and_(
+                WorkOrder.status == 'completed',
+                WorkOrder.completed_at >= today,
+                WorkOrder.completed_at < today + timedelta(days=1)
+            ))
+        ),
+        # Open work orders per technician, so "my work orders" needs no query of its own
+        db.select(WorkOrder.assigned_to, db.func.count(WorkOrder.work_order_id))
+        .where(WorkOrder.status == 'open', WorkOrder.assigned_to.isnot(None))
+        .group_by(WorkOrder.assigned_to),
+        db.select(
+            _count_if(db.and_(MaintenanceSchedule.is_active == True, MaintenanceSchedule.next_due < now))
+        ),
+        db.select(
+            _count_if(PartsInventory.quantity_on_hand <= PartsInventory.reorder_point)
+        ),
+    ]
+
+
+def _assemble(equipment, work_orders, open_by_assignee, overdue_maintenance, low_stock):
+    equipment = equipment.one()
+    work_orders = work_orders.one()
+    overdue_maintenance = overdue_maintenance.scalar()
+    low_stock = low_stock.scalar()
+    return {
+        'total_equipment': equipment[0],
+        'active_equipment': equipment[1],
+        'under_repair': equipment[2],
+        'open': work_orders[0],
+        'in_progress': work_orders[1],
+        'completed_today': work_orders[2],
+        'open_work_orders': work_orders[0] + work_orders[1],
+        'overdue_maintenance': overdue_maintenance or 0,
+        'low_stock': low_stock or 0,
+        'open_by_assignee': dict(open_by_assignee.all())
+    }
+
+
+def _compute_stats():
+    return _assemble(*[db.session.execute(stmt) for stmt in _statements(datetime.utcnow())])
+
+
+def _cached_stats():
+    with _lock:
+        snapshot = _snapshot
+    if snapshot is None or snapshot[0] <= time.monotonic():
+        return None
+    return snapshot[1]
+
+
+def _store_stats(stats, ttl):
+    global _snapshot
+    with _lock:
+        _snapshot = (time.monotonic() + ttl, stats)
+
+
+def _for_user(stats, user_id):
+    result = {k: v for k, v in stats.items() if k != 'open_by_assignee'}
+    result['my_work_orders'] = stats['open_by_assignee'].get(user_id, 0)
+    return result
+
+
+def get_dashboard_stats(user_id=None):
+    """Return the shared dashboard counters, plus my_work_orders for user_id."""
+    stats = _cached_stats()
+    if stats is None:
+        stats = _compute_stats()
+        _store_stats(stats, current_app.config.get('DASHBOARD_STATS_TTL', 30))
+    return _for_user(stats, user_id)
+
+
+async def _compute_stats_async(sessions, ttl):
+    async with sessions() as session:
+        results = [await session.execute(stmt) for stmt in _statements(datetime.utcnow())]
+    stats = _assemble(*results)
+    _store_stats(stats, ttl)
+    return stats
+
+
+_pending = None  # in-flight async recompute, shared by every coroutine that missed
+
+
+async def get_dashboard_stats_async(sessions, ttl, user_id=None):
+    """get_dashboard_stats() for the async API; sessions is an async session factory.
+    
+    When the snapshot expires under many concurrent pollers, one recompute
+    runs and the rest wait for its result.
+    """
+    global _pending
+    stats = _cached_stats()
+    if stats is None:
+        if _pending is None or _pending.done():
+            _pending = asyncio.ensure_future(_compute_stats_async(sessions, ttl))
+        stats = await asyncio.shield(_pending)
+    return _for_user(stats, user_id)
+
+
+def stats_payload(stats):
+    """The /api/dashboard/stats response body for get_dashboard_stats() output."""
+    return {
+        'equipment': {
+            'total': stats['total_equipment'],
+            'active': stats['active_equipment'],
+            'under_repair': stats['under_repair']
+        },
+        'work_orders': {
+            'open': stats['open'],
+            'in_progress': stats['in_progress'],
+            'completed_today': stats['completed_today'],
+            'assigned_to_me': stats['my_work_orders']
+        },
+        'maintenance': {
+            'overdue': stats['overdue_maintenance']
+        },
+        'inventory': {
+            'low_stock': stats['low_stock']
+        }
+    }
+
+
+def invalidate_dashboard_stats(publish=True):
+    """Drop the snapshot; with publish, also tell other workers and open streams."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+    if publish:
+        events.publish(events.DASHBOARD)
+
+
+# Other workers' writes drop this worker's snapshot too
+events.broker.listen(events.DASHBOARD, lambda data: invalidate_dashboard_stats(publish=False))
+
+
+def mark_dashboard_stale(session):
+    """Drop the snapshot in every worker once session's transaction commits.
+    
+    However many flushes or bulk statements the transaction runs, it sends
+    one notification. Writes that bypass the ORM (Core UPDATEs) call this
+    themselves; ORM writes to the counted tables are caught below.
+    """
+    if not session.info.get('dashboard_stale'):
+        session.info['dashboard_stale'] = True
+        events.publish(events.DASHBOARD, session=session)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_dashboard_writes(session, flush_context):
+    if session.info.get('dashboard_stale'):
+        return
+    if any(isinstance(obj, TRACKED_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        mark_dashboard_stale(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('dashboard_stale', False):
+        invalidate_dashboard_stats(publish=False)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_after_rollback(session):
+    session.info.pop('dashboard_stale', None)
@@ -0,0 +1,345 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import WorkOrder
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# Change events
+#
+# Writes publish small events (work order status changes and assignments,
+# low-stock crossings, "dashboard counters changed") that /api/stream pushes
+# to open screens as server-sent events. Each worker has one in-process
+# broker. An event published inside a transaction is also sent with
+# pg_notify on the same connection, so PostgreSQL delivers it to every other
+# worker's LISTEN thread when, and only if, the transaction commits; this
+# worker fans it out itself after the commit. Events published outside a
+# transaction are sent at once.
+# ============================================
+
+CHANNEL = 'app_events'
+QUEUE_SIZE = 256
+
+WORK_ORDER_STATUS = 'work_order.status'
+WORK_ORDER_ASSIGNED = 'work_order.assigned'
+LOW_STOCK = 'inventory.low_stock'
+DASHBOARD = 'dashboard'
+
+
+def _origin():
+    # Evaluated per call: forked workers share the module but not the pid
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Broker:
+    """Fans events out to subscribers (open streams) and in-process listeners."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._listeners = defaultdict(list)
+    
+    def subscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+    
+    def listen(self, kind, callback):
+        """Call callback(data) for every event of kind, local or from other workers."""
+        self._listeners[kind].append(callback)
+    
+    def deliver(self, kind, data):
+        for callback in self._listeners.get(kind, ()):
+            try:
+                callback(data)
+            except Exception:
+                logger.exception('Event listener for %s failed', kind)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put((kind, data))
+
+
+class QueueSubscriber:
+    """A subscription read by a request thread."""
+    
+    def __init__(self):
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.overflowed = False
+    
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.overflowed = True
+    
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscriber:
+    """A subscription read by a coroutine on loop; put() may come from any thread."""
+    
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+    
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self._put, item)
+    
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflowed = True
+    
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+broker = Broker()
+
+
+def _notify(connection, kind, data):
+    if connection.dialect.name == 'postgresql':
+        payload = json.dumps({'origin': _origin(), 'kind': kind, 'data': data}, default=str)
+        connection.execute(db.text('SELECT pg_notify(:channel, :payload)'),
+                           {'channel': CHANNEL, 'payload': payload})
+
+
+def publish(kind, data=None, session=None):
+    """Publish an event; with session, only once that session's transaction commits."""
+    data = data or {}
+    if session is None:
+        with db.engine.begin() as connection:
+            _notify(connection, kind, data)
+        broker.deliver(kind, data)
+        return
+    _notify(session.connection(), kind, data)
+    session.info.setdefault('pending_events', []).append((kind, data))
+
+
+@event.listens_for(Session, 'after_commit')
+def _deliver_after_commit(session):
+    for kind, data in session.info.pop('pending_events', ()):
+        broker.deliver(kind, data)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_after_rollback(session):
+    session.info.pop('pending_events', None)
+
+
+# ============================================
+# Work order events
+# ============================================
+
+def _work_order_data(work_order, **extra):
+    # Read loaded values only: a lazy load is not allowed mid-flush
+    loaded = inspect(work_order).dict
+    return dict({
+        'work_order_id': work_order.work_order_id,
+        'work_order_number': loaded.get('work_order_number'),
+        'title': loaded.get('title'),
+        'equipment_id': loaded.get('equipment_id'),
+        'status': loaded.get('status'),
+        'assigned_to': loaded.get('assigned_to'),
+    }, **extra)
+
+
+@event.listens_for(Session, 'after_flush')
+def _publish_work_order_changes(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, WorkOrder):
+            publish(WORK_ORDER_STATUS, _work_order_data(obj, previous_status=None), session)
+            if obj.assigned_to is not None:
+                publish(WORK_ORDER_ASSIGNED, _work_order_data(obj, previous_assigned_to=None), session)
+    
+    for obj in session.dirty:
+        if not isinstance(obj, WorkOrder):
+            continue
+        attrs = inspect(obj).attrs
+        status = attrs.status.history
+        if status.has_changes():
+            previous = status.deleted[0] if status.deleted else None
+            publish(WORK_ORDER_STATUS, _work_order_data(obj, previous_status=previous), session)
+        assigned = attrs.assigned_to.history
+        if assigned.has_changes() and obj.assigned_to is not None:
+            previous = assigned.deleted[0] if assigned.deleted else None
+            publish(WORK_ORDER_ASSIGNED, _work_order_data(obj, previous_assigned_to=previous), session)
+
+
+# ============================================
+# Cross-worker bridge
+# ============================================
+
+_bridge = None
+_bridge_lock = threading.Lock()
+
+
+def _receive(payload):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    # This worker already delivered its own events after the commit
+    if message.get('origin') != _origin():
+        broker.deliver(message.get('kind'), message.get('data') or {})
+
+
+def _listen(dsn):
+    import psycopg2
+    while True:
+        connection = None
+        try:
+            connection = psycopg2.connect(dsn)
+            connection.autocommit = True
+            connection.cursor().execute(f'LISTEN {CHANNEL}')
+            while True:
+                if select.select([connection], [], [], 30) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    _receive(connection.notifies.pop(0).payload)
+        except Exception:
+            logger.exception('Event bridge lost its connection; reconnecting')
+            time.sleep(5)
+        finally:
+            if connection is not None:
+                connection.close()
+
+
+def start_bridge(url):
+    """Start this worker's LISTEN thread for database url, once; PostgreSQL only."""
+    global _bridge
+    if url.get_backend_name() != 'postgresql':
+        return
+    with _bridge_lock:
+        if _bridge is not None and _bridge.is_alive():
+            return
+        dsn = url.set(drivername='postgresql').render_as_string(hide_password=False)
+        _bridge = threading.Thread(target=_listen, args=(dsn,), name='event-bridge', daemon=True)
+        _bridge.start()
+
+
+# ============================================
+# Server-sent event streams
+#
+# dashboard is a callable returning the user's dashboard payload; a
+# "dashboard" event only marks it stale, and it is re-sent at most every
+# dashboard_interval seconds however many writes happen meanwhile. A
+# subscriber that falls QUEUE_SIZE events behind is disconnected; the
+# browser's EventSource reconnects and the client reloads what it shows.
+# ============================================
+
+_thread_streams = 0
+_thread_streams_lock = threading.Lock()
+
+
+def claim_thread_stream(limit):
+    """Count one more stream served from a request thread; False once limit are open."""
+    global _thread_streams
+    with _thread_streams_lock:
+        if _thread_streams >= limit:
+            return False
+        _thread_streams += 1
+        return True
+
+
+def release_thread_stream():
+    global _thread_streams
+    with _thread_streams_lock:
+        _thread_streams -= 1
+
+
+def format_event(kind, data):
+    return f'event: {kind}\ndata: {json.dumps(data, separators=(",", ":"), default=str)}\n\n'
+
+
+class _Framing:
+    """Heartbeats and dashboard throttling shared by stream() and stream_async().
+    
+    frames() turns one subscriber.get() result into the text to send, with
+    SEND_DASHBOARD where the caller must send a fresh dashboard payload.
+    """
+    SEND_DASHBOARD = object()
+    
+    def __init__(self, heartbeat, dashboard_interval):
+        self.heartbeat = heartbeat
+        self.dashboard_interval = dashboard_interval
+        self.sent_at = time.monotonic()
+        self.stale = False
+    
+    def timeout(self):
+        if not self.stale:
+            return self.heartbeat
+        return min(self.heartbeat, max(0.0, self.sent_at + self.dashboard_interval - time.monotonic()))
+    
+    def frames(self, item):
+        if item is not None:
+            kind, data = item
+            if kind == DASHBOARD:
+                self.stale = True
+            else:
+                yield format_event(kind, data)
+        if self.stale and time.monotonic() >= self.sent_at + self.dashboard_interval:
+            yield self.SEND_DASHBOARD
+            self.sent_at, self.stale = time.monotonic(), False
+        elif item is None:
+            yield ': keep-alive\n\n'
+
+
+@contextmanager
+def _subscribed(subscriber):
+    broker.subscribe(subscriber)
+    try:
+        yield subscriber
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def stream(dashboard, heartbeat, dashboard_interval, max_seconds):
+    """Generator of SSE text for one request thread."""
+    with _subscribed(QueueSubscriber()) as subscriber:
+        yield 'retry: 5000\n\n'
+        yield format_event(DASHBOARD, dashboard())
+        framing = _Framing(heartbeat, dashboard_interval)
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline and not subscriber.overflowed:
+            for frame in framing.frames(subscriber.get(framing.timeout())):
+                yield format_event(DASHBOARD, dashboard()) if frame is _Framing.SEND_DASHBOARD else frame
+
+
+async def stream_async(dashboard, heartbeat, dashboard_interval):
+    """stream() for the async API; dashboard is a coroutine function and the stream has no time limit."""
+    with _subscribed(AsyncSubscriber(asyncio.get_running_loop())) as subscriber:
+        yield 'retry: 5000\n\n'
+        yield format_event(DASHBOARD, await dashboard())
+        framing = _Framing(heartbeat, dashboard_interval)
+        while not subscriber.overflowed:
+            for frame in framing.frames(await subscriber.get(framing.timeout())):
+                yield format_event(DASHBOARD, await dashboard()) if frame is _Framing.SEND_DASHBOARD else frame
@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from app import db
+from app.models import (Equipment, InventoryTransaction, Location, Part, PartsInventory,
+                        User, WorkOrder)
+
+
+# ============================================
+# History export
+#
+# Each export is one set-based SELECT that joins in the related names, read
+# through a server-side cursor (yield_per) and encoded row by row, so memory
+# stays flat no matter how many rows are exported.
+# ============================================
+
+DATASETS = ['work-orders', 'inventory-transactions']
+FORMATS = ['ndjson', 'csv']
+BATCH_SIZE = 1000
+
+
+def _work_orders_query(start, end, location_id):
+    assignee = db.aliased(User)
+    creator = db.aliased(User)
+    stmt = db.select(
+        WorkOrder.work_order_id,
+        WorkOrder.work_order_number,
+        WorkOrder.equipment_id,
+        Equipment.name.label('equipment_name'),
+        Equipment.location_id,
+        Location.name.label('location_name'),
+        WorkOrder.schedule_id,
+        WorkOrder.title,
+        WorkOrder.type,
+        WorkOrder.status,
+        WorkOrder.priority,
+        WorkOrder.assigned_to,
+        db.func.concat(assignee.first_name, ' ', assignee.last_name).label('assigned_to_name'),
+        WorkOrder.created_by,
+        db.func.concat(creator.first_name, ' ', creator.last_name).label('created_by_name'),
+        WorkOrder.scheduled_date,
+        WorkOrder.started_at,
+        WorkOrder.completed_at,
+        WorkOrder.labor_hours,
+        WorkOrder.labor_cost,
+        WorkOrder.parts_cost,
+        WorkOrder.total_cost,
+        WorkOrder.created_at
+    ).join(Equipment, Equipment.equipment_id == WorkOrder.equipment_id) \
+     .outerjoin(Location, Location.location_id == Equipment.location_id) \
+     .outerjoin(assignee, assignee.user_id == WorkOrder.assigned_to) \
+     .outerjoin(creator, creator.user_id == WorkOrder.created_by)
+    
+    if start:
+        stmt = stmt.where(WorkOrder.created_at >= start)
+    if end:
+        stmt = stmt.where(WorkOrder.created_at < end)
+    if location_id:
+        stmt = stmt.where(Equipment.location_id == location_id)
+    return stmt.order_by(WorkOrder.created_at, WorkOrder.work_order_id)
+
+
+def _transactions_query(start, end, location_id):
+    stmt = db.select(
+        InventoryTransaction.transaction_id,
+        InventoryTransaction.created_at,
+        InventoryTransaction.transaction_type,
+        InventoryTransaction.inventory_id,
+        PartsInventory.part_id,
+        Part.part_number,
+        Part.name.label('part_name'),
+        PartsInventory.location_id,
+        Location.name.label('location_name'),
+        InventoryTransaction.quantity,
+        InventoryTransaction.unit_cost,
+        InventoryTransaction.work_order_id,
+        WorkOrder.work_order_number,
+        InventoryTransaction.reference_number,
+        InventoryTransaction.performed_by,
+        db.func.concat(User.first_name, ' ', User.last_name).label('performed_by_name'),
+        InventoryTransaction.notes
+    ).join(PartsInventory, PartsInventory.inventory_id == InventoryTransaction.inventory_id) \
+     .join(Part, Part.part_id == PartsInventory.part_id) \
+     .join(Location, Location.location_id == PartsInventory.location_id) \
+     .outerjoin(WorkOrder, WorkOrder.work_order_id == InventoryTransaction.work_order_id) \
+     .outerjoin(User, User.user_id == InventoryTransaction.performed_by)
+    
+    if start:
+        stmt = stmt.where(InventoryTransaction.created_at >= start)
+    if end:
+        stmt = stmt.where(InventoryTransaction.created_at < end)
+    if location_id:
+        stmt = stmt.where(PartsInventory.location_id == location_id)
+    return stmt.order_by(InventoryTransaction.created_at, InventoryTransaction.transaction_id)
+
+
+QUERIES = {
+    'work-orders': _work_orders_query,
+    'inventory-transactions': _transactions_query
+}
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def export_rows(dataset, start=None, end=None, location_id=None):
+    """Return (column names, iterator of row tuples) streamed from the database."""
+    stmt = QUERIES[dataset](start, end, location_id).execution_options(yield_per=BATCH_SIZE)
+    result = db.session.execute(stmt)
+    return list(result.keys()), iter(result)
+
+
+def encode(columns, rows, fmt):
+    """Yield the export as text chunks, one batch of rows at a time."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for i, row in enumerate(rows, start=1):
+            writer.writerow(['' if v is None else _plain(v) for v in row])
+            if i % BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        batch = []
+        for row in rows:
+            batch.append(json.dumps({c: _plain(v) for c, v in zip(columns, row)}))
+            if len(batch) == BATCH_SIZE:
+                yield '\n'.join(batch) + '\n'
+                batch = []
+        if batch:
+            yield '\n'.join(batch) + '\n'
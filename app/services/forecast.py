@@ -0,0 +1,174 @@
+import math
+import time as timer
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from app import db
+from app.models import InventoryTransaction, Location, Part, PartsInventory, ReorderForecast
+from app.services.dashboard import mark_dashboard_stale
+from app.services.sql import dialect_insert
+
+
+# ============================================
+# Reorder forecasting
+#
+# One INSERT ... SELECT recomputes the forecast for every PartsInventory
+# row. It aggregates issues over the last FORECAST_WINDOW_DAYS days into
+# daily totals, then into a mean daily rate and its standard deviation.
+# Days without issues count as zero. The window prunes the ledger's older
+# monthly partitions. From the rate it derives:
+#   days_until_stockout  = available / rate
+#   reorder point        = rate * lead time + safety factor * stddev * sqrt(lead time)
+#   reorder quantity     = rate * REORDER_COVER_DAYS (at least 1)
+# Recommendations are stored in reorder_forecasts. They replace the static
+# reorder_point / reorder_quantity only when applied, and only for rows
+# with issue history.
+# ============================================
+
+def _daily_usage(since, window_days):
+    day = db.func.date_trunc('day', InventoryTransaction.created_at)
+    daily = (
+        db.select(
+            InventoryTransaction.inventory_id,
+            db.func.sum(-InventoryTransaction.quantity).label('used')
+        )
+        .where(InventoryTransaction.transaction_type == 'issue',
+               InventoryTransaction.created_at >= since)
+        .group_by(InventoryTransaction.inventory_id, day)
+        .subquery()
+    )
+    total = db.cast(db.func.sum(daily.c.used), db.Numeric)
+    rate = total / window_days
+    mean_square = db.cast(db.func.sum(daily.c.used * daily.c.used), db.Numeric) / window_days
+    return (
+        db.select(
+            daily.c.inventory_id,
+            total.label('issued'),
+            rate.label('rate'),
+            db.func.sqrt(db.func.greatest(mean_square - rate * rate, 0)).label('stddev')
+        )
+        .group_by(daily.c.inventory_id)
+        .subquery()
+    )
+
+
+def run_forecast(apply=False, now=None):
+    """Recompute every forecast in one statement; optionally apply the recommendations.
+    
+    Returns a summary with the number of forecasts written and reorder
+    settings changed.
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    window_days = config.get('FORECAST_WINDOW_DAYS', 90)
+    lead_time = config.get('REORDER_LEAD_TIME_DAYS', 7)
+    safety = Decimal(str(round(config.get('REORDER_SAFETY_FACTOR', 1.65) * math.sqrt(lead_time), 4)))
+    cover_days = config.get('REORDER_COVER_DAYS', 30)
+    started = timer.perf_counter()
+    
+    usage = _daily_usage(now - timedelta(days=window_days), window_days)
+    rate = db.func.coalesce(usage.c.rate, 0)
+    stddev = db.func.coalesce(usage.c.stddev, 0)
+    available = db.func.greatest(
+        PartsInventory.quantity_on_hand - db.func.coalesce(PartsInventory.quantity_reserved, 0), 0
+    )
+    source = db.select(
+        PartsInventory.inventory_id,
+        db.literal(now),
+        db.literal(window_days),
+        db.func.coalesce(usage.c.issued, 0),
+        rate,
+        stddev,
+        db.case((rate > 0, db.func.round(available / rate, 1)), else_=None),
+        db.cast(db.func.ceil(rate * lead_time + stddev * safety), db.Integer),
+        db.cast(db.func.greatest(db.func.ceil(rate * cover_days), 1), db.Integer)
+    ).outerjoin(usage, usage.c.inventory_id == PartsInventory.inventory_id)
+    
+    table = ReorderForecast.__table__
+    columns = ['inventory_id', 'computed_at', 'window_days', 'issued', 'daily_rate', 'daily_stddev',
+               'days_until_stockout', 'recommended_reorder_point', 'recommended_reorder_quantity']
+    stmt = dialect_insert(table, db.session.get_bind().dialect.name).from_select(columns, source)
+    written = db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.inventory_id],
+        set_={c: stmt.excluded[c] for c in columns[1:]}
+    )).rowcount
+    
+    applied = 0
+    if apply:
+        applied = db.session.execute(
+            db.update(PartsInventory)
+            .where(
+                PartsInventory.inventory_id == ReorderForecast.inventory_id,
+                ReorderForecast.issued > 0,
+                db.or_(
+                    PartsInventory.reorder_point.is_distinct_from(ReorderForecast.recommended_reorder_point),
+                    PartsInventory.reorder_quantity.is_distinct_from(ReorderForecast.recommended_reorder_quantity)
+                )
+            )
+            .values(
+                reorder_point=ReorderForecast.recommended_reorder_point,
+                reorder_quantity=ReorderForecast.recommended_reorder_quantity,
+                version=PartsInventory.version + 1
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    
+    if applied:
+        mark_dashboard_stale(db.session)
+    db.session.commit()
+    return {
+        'forecasts': written,
+        'applied': applied,
+        'window_days': window_days,
+        'seconds': round(timer.perf_counter() - started, 3)
+    }
+
+
+def list_forecasts(location_id=None, within_days=None, limit=200):
+    """Stored forecasts, soonest stockout first."""
+    query = (
+        db.select(
+            ReorderForecast,
+            PartsInventory.part_id,
+            PartsInventory.location_id,
+            PartsInventory.quantity_on_hand,
+            PartsInventory.reorder_point,
+            PartsInventory.reorder_quantity,
+            Part.part_number,
+            Part.name.label('part_name'),
+            Location.name.label('location_name')
+        )
+        .join(PartsInventory, PartsInventory.inventory_id == ReorderForecast.inventory_id)
+        .join(Part, Part.part_id == PartsInventory.part_id)
+        .join(Location, Location.location_id == PartsInventory.location_id)
+        .order_by(ReorderForecast.days_until_stockout.asc().nulls_last(), ReorderForecast.inventory_id)
+        .limit(limit)
+    )
+    if location_id:
+        query = query.where(PartsInventory.location_id == location_id)
+    if within_days is not None:
+        query = query.where(ReorderForecast.days_until_stockout <= within_days)
+    
+    results = []
+    for row in db.session.execute(query):
+        forecast = row.ReorderForecast
+        results.append({
+            'inventory_id': forecast.inventory_id,
+            'part_id': row.part_id,
+            'part_number': row.part_number,
+            'part_name': row.part_name,
+            'location_id': row.location_id,
+            'location_name': row.location_name,
+            'quantity_on_hand': row.quantity_on_hand,
+            'reorder_point': row.reorder_point,
+            'reorder_quantity': row.reorder_quantity,
+            'issued': forecast.issued,
+            'daily_rate': float(forecast.daily_rate),
+            'daily_stddev': float(forecast.daily_stddev),
+            'days_until_stockout': float(forecast.days_until_stockout)
+            if forecast.days_until_stockout is not None else None,
+            'recommended_reorder_point': forecast.recommended_reorder_point,
+            'recommended_reorder_quantity': forecast.recommended_reorder_quantity,
+            'computed_at': forecast.computed_at.isoformat()
+        })
+    return results
@@ -0,0 +1,296 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from app import db
+from app.models import Equipment, EquipmentCategory, Location, Part, PartsInventory
+from app.services import reference
+from app.services.dashboard import invalidate_dashboard_stats
+from app.services.sql import dialect_insert
+
+
+# ============================================
+# Bulk import
+#
+# Records are streamed from CSV or NDJSON, validated a chunk at a time and
+# loaded with one multi-row INSERT ... ON CONFLICT DO NOTHING per chunk.
+# Category, location and part references are resolved by name through
+# in-memory maps. Rows the database rejects as duplicates (serial number,
+# part number, part/location pair) are reported individually; they never
+# abort the rest of the import.
+# ============================================
+
+ENTITIES = ['equipment', 'parts', 'inventory']
+FORMATS = ['csv', 'ndjson']
+EQUIPMENT_STATUSES = ['active', 'inactive', 'under_repair', 'retired']
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+    
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+    
+    def to_dict(self):
+        return {
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
+
+
+def iter_records(stream, fmt):
+    """Yield (line_number, dict) from a binary stream of CSV or NDJSON."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+
+
+# --------------------------------------------
+# Field parsing
+# --------------------------------------------
+
+def _text(record, field, required=False, max_length=None):
+    value = record.get(field)
+    value = str(value).strip() if value is not None else ''
+    if not value:
+        if required:
+            raise ValueError(f'{field} is required')
+        return None
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _number(record, field, cast=Decimal):
+    value = _text(record, field)
+    if value is None:
+        return None
+    try:
+        return cast(value)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{field} must be a number')
+
+
+def _date(record, field):
+    value = _text(record, field)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{field} must be an ISO date (YYYY-MM-DD)')
+
+
+def _lookup(record, field, mapping):
+    name = _text(record, field)
+    if name is None:
+        return None
+    key = name.lower()
+    if key not in mapping:
+        raise ValueError(f'Unknown {field} "{name}"')
+    return mapping[key]
+
+
+# --------------------------------------------
+# Row builders
+# --------------------------------------------
+
+class _Loader:
+    table = None
+    key_columns = []  # unique key reported on conflict
+    key_label = ''
+    reference_kinds = ()  # cached reference sets the inserted rows belong to
+    
+    def __init__(self, now):
+        self.now = now
+    
+    def prepare(self, chunk):
+        """Called once per chunk before rows are built (e.g. to resolve references)."""
+    
+    def build(self, record):
+        raise NotImplementedError
+    
+    def conflict_key(self, row):
+        key = tuple(row[c] for c in self.key_columns)
+        return None if None in key else key
+
+
+class _EquipmentLoader(_Loader):
+    table = Equipment.__table__
+    key_columns = ['serial_number']
+    key_label = 'serial number'
+    
+    def __init__(self, now):
+        super().__init__(now)
+        self.categories = {c.name.lower(): c.category_id for c in EquipmentCategory.query}
+        self.locations = {l.name.lower(): l.location_id for l in Location.query}
+    
+    def build(self, record):
+        status = _text(record, 'status') or 'active'
+        if status not in EQUIPMENT_STATUSES:
+            raise ValueError(f'Invalid status "{status}"')
+        return {
+            'name': _text(record, 'name', required=True, max_length=100),
+            'model': _text(record, 'model', max_length=100),
+            'serial_number': _text(record, 'serial_number', max_length=100),
+            'manufacturer': _text(record, 'manufacturer', max_length=100),
+            'category_id': _lookup(record, 'category', self.categories),
+            'location_id': _lookup(record, 'location', self.locations),
+            'purchase_date': _date(record, 'purchase_date'),
+            'purchase_price': _number(record, 'purchase_price'),
+            'warranty_expiration': _date(record, 'warranty_expiration'),
+            'status': status,
+            'usage_hours': _number(record, 'usage_hours') or 0,
+            'notes': _text(record, 'notes'),
+            'version': 1,
+            'created_at': self.now,
+            'updated_at': self.now
+        }
+
+
+class _PartLoader(_Loader):
+    table = Part.__table__
+    key_columns = ['part_number']
+    key_label = 'part number'
+    reference_kinds = ('parts',)
+    
+    def build(self, record):
+        return {
+            'part_number': _text(record, 'part_number', required=True, max_length=50),
+            'name': _text(record, 'name', required=True, max_length=100),
+            'description': _text(record, 'description'),
+            'category': _text(record, 'category', max_length=50),
+            'unit_cost': _number(record, 'unit_cost'),
+            'is_active': True,
+            'created_at': self.now,
+            'updated_at': self.now
+        }
+
+
+class _InventoryLoader(_Loader):
+    table = PartsInventory.__table__
+    key_columns = ['part_id', 'location_id']
+    key_label = 'part and location'
+    
+    def __init__(self, now):
+        super().__init__(now)
+        self.locations = {l.name.lower(): l.location_id for l in Location.query}
+        self.parts = {}
+    
+    def prepare(self, chunk):
+        # Resolve only the part numbers this chunk mentions
+        numbers = {str(r.get('part_number')).strip().lower() for _, r in chunk if r and r.get('part_number')}
+        numbers -= set(self.parts)
+        if numbers:
+            for part_id, part_number in db.session.query(Part.part_id, Part.part_number).filter(
+                    db.func.lower(Part.part_number).in_(numbers)):
+                self.parts[part_number.lower()] = part_id
+    
+    def build(self, record):
+        part_id = _lookup(record, 'part_number', self.parts)
+        location_id = _lookup(record, 'location', self.locations)
+        if part_id is None or location_id is None:
+            raise ValueError('part_number and location are required')
+        return {
+            'part_id': part_id,
+            'location_id': location_id,
+            'quantity_on_hand': _number(record, 'quantity_on_hand', int) or 0,
+            'quantity_reserved': 0,
+            'reorder_point': _number(record, 'reorder_point', int) or 0,
+            'reorder_quantity': _number(record, 'reorder_quantity', int) or 1,
+            'bin_location': _text(record, 'bin_location', max_length=50),
+            'version': 1,
+            'updated_at': self.now
+        }
+
+
+LOADERS = {
+    'equipment': _EquipmentLoader,
+    'parts': _PartLoader,
+    'inventory': _InventoryLoader
+}
+
+
+def _load_chunk(loader, chunk, report):
+    loader.prepare(chunk)
+    
+    rows, lines, seen = [], [], set()
+    for line, record in chunk:
+        report.processed += 1
+        if record is None:
+            report.error(line, 'Malformed record')
+            continue
+        try:
+            row = loader.build(record)
+        except ValueError as exc:
+            report.error(line, str(exc))
+            continue
+        
+        key = loader.conflict_key(row)
+        if key is not None and key in seen:
+            report.error(line, f'Duplicate {loader.key_label} in file')
+            continue
+        seen.add(key)
+        rows.append(row)
+        lines.append(line)
+    
+    if not rows:
+        return
+    
+    table = loader.table
+    stmt = dialect_insert(table, db.session.get_bind().dialect.name).values(rows).on_conflict_do_nothing()
+    stmt = stmt.returning(*[table.c[c] for c in loader.key_columns])
+    returned = {tuple(r) for r in db.session.execute(stmt)}
+    # Core inserts bypass the flush hook that keeps the reference cache current
+    if returned and loader.reference_kinds:
+        reference.mark_changed(db.session, loader.reference_kinds)
+    db.session.commit()
+    
+    for line, row in zip(lines, rows):
+        key = loader.conflict_key(row)
+        if key is None or key in returned:
+            report.inserted += 1
+        else:
+            report.error(line, f'Duplicate {loader.key_label} already exists')
+
+
+def import_records(entity, records, chunk_size=CHUNK_SIZE):
+    """Load (line, record) pairs for entity; returns an ImportReport."""
+    loader = LOADERS[entity](datetime.utcnow())
+    report = ImportReport()
+    
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            _load_chunk(loader, chunk, report)
+            chunk = []
+    if chunk:
+        _load_chunk(loader, chunk, report)
+    
+    if report.inserted:
+        invalidate_dashboard_stats()
+    return report
@@ -0,0 +1,163 @@
+from sqlalchemy import insert
+from app import db
+from app.models import InventoryTransaction, Part, PartsInventory, WorkOrder
+from app.services import events
+from app.services.dashboard import mark_dashboard_stale
+
+
+# ============================================
+# Atomic stock adjustments
+#
+# Stock is changed with a single conditional UPDATE ... RETURNING, so two
+# concurrent issues can neither oversell nor lose an update, and no prior
+# SELECT is needed to check availability.
+# ============================================
+
+TRANSACTION_TYPES = ['receipt', 'issue', 'adjustment', 'return']
+MAX_BATCH_SIZE = 1000
+REFERENCE_NUMBER_LENGTH = InventoryTransaction.reference_number.type.length
+
+
+def adjust_stock(inventory_id, delta, check_available=False):
+    """Add delta to on-hand stock unless that would take it below zero.
+    
+    With check_available, reserved units may not be consumed either.
+    Returns (inventory_id, part_id, quantity_on_hand) after the change, or
+    None if the row does not exist or has too little stock. The dashboard
+    is refreshed, and crossing the reorder point publishes a low-stock
+    event, when the transaction commits.
+    """
+    stmt = db.update(PartsInventory).where(PartsInventory.inventory_id == inventory_id)
+    if delta < 0:
+        on_hand = PartsInventory.quantity_on_hand
+        if check_available:
+            on_hand = on_hand - db.func.coalesce(PartsInventory.quantity_reserved, 0)
+        stmt = stmt.where(on_hand + delta >= 0)
+    stmt = stmt.values(
+        quantity_on_hand=PartsInventory.quantity_on_hand + delta,
+        version=PartsInventory.version + 1
+    ).returning(
+        PartsInventory.inventory_id, PartsInventory.part_id, PartsInventory.quantity_on_hand,
+        PartsInventory.location_id, PartsInventory.reorder_point
+    ).execution_options(synchronize_session='fetch')
+    # 'fetch' applies the change to a row already loaded in the session, so
+    # its next ORM write does not fail the version check
+    row = db.session.execute(stmt).first()
+    if row is None:
+        return None
+    
+    mark_dashboard_stale(db.session)
+    if row.reorder_point is not None:
+        was_low = row.quantity_on_hand - delta <= row.reorder_point
+        is_low = row.quantity_on_hand <= row.reorder_point
+        if was_low != is_low:
+            events.publish(events.LOW_STOCK, {
+                'inventory_id': row.inventory_id,
+                'part_id': row.part_id,
+                'location_id': row.location_id,
+                'quantity_on_hand': row.quantity_on_hand,
+                'reorder_point': row.reorder_point,
+                'is_low_stock': is_low
+            }, session=db.session)
+    return row
+
+
+def parse_adjustment(line, work_order_ids=None):
+    """Validate one adjustment; returns (inventory_id, delta, transaction_type).
+    
+    work_order_ids, when given, is the set of existing work orders a line
+    may reference.
+    """
+    inventory_id = line.get('inventory_id')
+    quantity = line.get('quantity')
+    transaction_type = line.get('type', 'adjustment')
+    work_order_id = line.get('work_order_id')
+    reference_number = line.get('reference_number')
+    notes = line.get('notes')
+    
+    # bool is an int subclass; JSON true/false is not a quantity or an id
+    if (not isinstance(inventory_id, int) or not isinstance(quantity, int) or quantity == 0
+            or isinstance(inventory_id, bool) or isinstance(quantity, bool)):
+        raise ValueError('inventory_id and a non-zero integer quantity are required')
+    if transaction_type not in TRANSACTION_TYPES:
+        raise ValueError('Invalid transaction type')
+    if work_order_id is not None:
+        if not isinstance(work_order_id, int) or isinstance(work_order_id, bool):
+            raise ValueError('work_order_id must be an integer')
+        if work_order_ids is not None and work_order_id not in work_order_ids:
+            raise ValueError('Work order not found')
+    if reference_number is not None:
+        if not isinstance(reference_number, str):
+            raise ValueError('reference_number must be a string')
+        if len(reference_number) > REFERENCE_NUMBER_LENGTH:
+            raise ValueError(f'reference_number is longer than {REFERENCE_NUMBER_LENGTH} characters')
+    if notes is not None and not isinstance(notes, str):
+        raise ValueError('notes must be a string')
+    
+    # Issues always remove stock
+    if transaction_type == 'issue':
+        quantity = -abs(quantity)
+    return inventory_id, quantity, transaction_type
+
+
+def adjust_batch(lines, user_id):
+    """Apply many adjustments in one transaction, reporting each line.
+    
+    Lines that fail validation or lack stock are reported and skipped; the
+    rest are committed together with one multi-row insert of transactions.
+    """
+    results = []
+    applied = []
+    
+    # Every referenced work order is checked up front, so a bad reference
+    # fails its own line instead of the final insert
+    referenced = {line.get('work_order_id') for line in lines if isinstance(line, dict)}
+    referenced = {i for i in referenced if isinstance(i, int)}
+    work_order_ids = {i for (i,) in db.session.query(WorkOrder.work_order_id)
+                      .filter(WorkOrder.work_order_id.in_(referenced))} if referenced else set()
+    
+    for index, line in enumerate(lines):
+        try:
+            inventory_id, delta, transaction_type = parse_adjustment(line, work_order_ids)
+        except (AttributeError, ValueError) as exc:
+            results.append({'line': index, 'status': 'error', 'error': str(exc)})
+            continue
+        
+        row = adjust_stock(inventory_id, delta, check_available=transaction_type == 'issue')
+        if row is None:
+            results.append({'line': index, 'inventory_id': inventory_id, 'status': 'error'})
+            continue
+        
+        applied.append((index, row, delta, transaction_type, line))
+        results.append({
+            'line': index,
+            'inventory_id': inventory_id,
+            'status': 'ok',
+            'quantity_on_hand': row.quantity_on_hand
+        })
+    
+    # Tell missing rows apart from insufficient stock, only for failed lines
+    failed_ids = {r['inventory_id'] for r in results if r['status'] == 'error' and 'inventory_id' in r}
+    if failed_ids:
+        existing = {i for (i,) in db.session.query(PartsInventory.inventory_id)
+                    .filter(PartsInventory.inventory_id.in_(failed_ids))}
+        for r in results:
+            if r['status'] == 'error' and 'inventory_id' in r:
+                r['error'] = 'Insufficient inventory' if r['inventory_id'] in existing else 'Inventory not found'
+    
+    if applied:
+        unit_costs = dict(db.session.query(Part.part_id, Part.unit_cost)
+                          .filter(Part.part_id.in_({row.part_id for _, row, _, _, _ in applied})))
+        db.session.execute(insert(InventoryTransaction), [{
+            'inventory_id': row.inventory_id,
+            'work_order_id': line.get('work_order_id'),
+            'transaction_type': transaction_type,
+            'quantity': delta,
+            'unit_cost': unit_costs.get(row.part_id),
+            'reference_number': line.get('reference_number'),
+            'notes': line.get('notes'),
+            'performed_by': user_id
+        } for _, row, delta, transaction_type, line in applied])
+    
+    db.session.commit()
+    return results
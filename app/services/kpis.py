@@ -0,0 +1,267 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import chain
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Equipment, MaintenanceKpi, UsageRollup, WorkOrder
+from app.services import reference
+from app.services.sql import dialect_insert
+
+
+# ============================================
+# Maintenance KPI rollups
+#
+# maintenance_kpis holds daily totals per equipment, category, location and
+# model. Every flush that completes, reopens, edits or deletes a completed
+# work order adds the difference to those rows in the same transaction, and
+# usage ingestion adds metered hours. Reads sum one row per key and day, so
+# their cost does not grow with work order history.
+#
+# MTTR is repair hours per failure (start of work, or the report if never
+# started, to completion). Downtime runs from the report to completion. MTBF
+# is metered usage hours per failure. Failures are completed corrective and
+# emergency work orders.
+# ============================================
+
+SCOPES = ('equipment', 'category', 'location', 'model')
+MEASURES = ('completed', 'failures', 'repair_hours', 'downtime_hours', 'labor_hours', 'usage_hours')
+FAILURE_TYPES = ('corrective', 'emergency')
+DEFAULT_DAYS = 30
+# Rows per INSERT ... ON CONFLICT statement (nine bind parameters each)
+WRITE_CHUNK = 1000
+
+# WorkOrder attributes a rollup depends on
+TRACKED_ATTRIBUTES = ('status', 'type', 'equipment_id', 'created_at', 'started_at',
+                      'completed_at', 'labor_hours')
+
+
+def _hours(start, end):
+    if not start or not end or end <= start:
+        return Decimal(0)
+    return Decimal(round((end - start).total_seconds() / 3600, 2)).quantize(Decimal('0.01'))
+
+
+def completion_measures(type, created_at, started_at, completed_at, labor_hours):
+    """What one completed work order contributes to its day's rollups."""
+    failure = type in FAILURE_TYPES
+    return {
+        'completed': 1,
+        'failures': 1 if failure else 0,
+        'repair_hours': _hours(started_at or created_at, completed_at) if failure else Decimal(0),
+        'downtime_hours': _hours(created_at, completed_at) if failure else Decimal(0),
+        'labor_hours': Decimal(labor_hours or 0),
+    }
+
+
+class KpiTotals:
+    """Pending increments keyed by (scope, day, scope_key)."""
+    
+    def __init__(self):
+        self.rows = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    
+    def add(self, equipment, day, measures, sign=1):
+        # equipment is (equipment_id, category_id, location_id, model)
+        for scope, key in zip(SCOPES, equipment):
+            if key is None or key == '':
+                continue
+            row = self.rows[(scope, day, str(key))]
+            for measure, value in measures.items():
+                row[measure] += sign * value
+    
+    def write(self, connection):
+        """Add the pending increments to maintenance_kpis and start over."""
+        table = MaintenanceKpi.__table__
+        rows = [dict(values, scope=scope, day=day, scope_key=key)
+                for (scope, day, key), values in self.rows.items()]
+        for i in range(0, len(rows), WRITE_CHUNK):
+            stmt = dialect_insert(table, connection.dialect.name).values(rows[i:i + WRITE_CHUNK])
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.scope, table.c.day, table.c.scope_key],
+                set_={m: table.c[m] + stmt.excluded[m] for m in MEASURES}
+            ))
+        self.rows.clear()
+
+
+def equipment_keys(connection, equipment_ids):
+    """{equipment_id: (equipment_id, category_id, location_id, model)}"""
+    if not equipment_ids:
+        return {}
+    rows = connection.execute(
+        db.select(Equipment.equipment_id, Equipment.category_id, Equipment.location_id, Equipment.model)
+        .where(Equipment.equipment_id.in_(equipment_ids))
+    )
+    return {row[0]: tuple(row) for row in rows}
+
+
+def _old_value(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+def _contribution(values):
+    if values['status'] != 'completed' or not values['completed_at']:
+        return None
+    return (values['equipment_id'], values['completed_at'].date(), completion_measures(
+        values['type'], values['created_at'], values['started_at'],
+        values['completed_at'], values['labor_hours']
+    ))
+
+
+@event.listens_for(Session, 'after_flush')
+def _roll_up_work_orders(session, flush_context):
+    changes = []
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, WorkOrder):
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not any(
+            state.attrs[key].history.has_changes() for key in TRACKED_ATTRIBUTES
+        ):
+            continue
+        if obj in session.new:
+            old = None
+        else:
+            old = _contribution({key: _old_value(state, key) for key in TRACKED_ATTRIBUTES})
+        if obj in session.deleted:
+            new = None
+        else:
+            new = _contribution({key: getattr(obj, key) for key in TRACKED_ATTRIBUTES})
+        if old or new:
+            changes.append((old, new))
+    
+    if not changes:
+        return
+    connection = session.connection()
+    ids = {c[0] for pair in changes for c in pair if c}
+    keys = equipment_keys(connection, ids)
+    totals = KpiTotals()
+    for old, new in changes:
+        if old and old[0] in keys:
+            totals.add(keys[old[0]], old[1], old[2], sign=-1)
+        if new and new[0] in keys:
+            totals.add(keys[new[0]], new[1], new[2])
+    totals.write(connection)
+
+
+def rebuild_kpis(batch_size=5000):
+    """Recompute every rollup row from work order and usage history; returns the row count.
+    
+    Pending totals are written whenever batch_size keys have built up.
+    Writes add to existing rows, so a key split across writes still sums
+    correctly, and memory stays bounded however long the history is.
+    """
+    db.session.execute(db.delete(MaintenanceKpi))
+    connection = db.session.connection()
+    keys = {row[0]: tuple(row) for row in db.session.execute(
+        db.select(Equipment.equipment_id, Equipment.category_id, Equipment.location_id, Equipment.model)
+    )}
+    totals = KpiTotals()
+    
+    completed = db.session.execute(
+        db.select(WorkOrder.equipment_id, WorkOrder.type, WorkOrder.created_at,
+                  WorkOrder.started_at, WorkOrder.completed_at, WorkOrder.labor_hours)
+        .where(WorkOrder.status == 'completed', WorkOrder.completed_at.isnot(None))
+        .execution_options(yield_per=batch_size)
+    )
+    for equipment_id, type, created_at, started_at, completed_at, labor_hours in completed:
+        if equipment_id in keys:
+            totals.add(keys[equipment_id], completed_at.date(), completion_measures(
+                type, created_at, started_at, completed_at, labor_hours))
+            if len(totals.rows) >= batch_size:
+                totals.write(connection)
+    
+    usage = db.session.execute(
+        db.select(UsageRollup.equipment_id, UsageRollup.period_start,
+                  UsageRollup.max_hours - UsageRollup.min_hours)
+        .where(UsageRollup.period == 'day')
+        .execution_options(yield_per=batch_size)
+    )
+    for equipment_id, period_start, hours in usage:
+        if equipment_id in keys and hours:
+            totals.add(keys[equipment_id], period_start.date(), {'usage_hours': hours})
+            if len(totals.rows) >= batch_size:
+                totals.write(connection)
+    
+    totals.write(connection)
+    count = db.session.execute(db.select(db.func.count()).select_from(MaintenanceKpi)).scalar()
+    db.session.commit()
+    return count
+
+
+def _window(start, end):
+    end = end or date.today() + timedelta(days=1)
+    return start or end - timedelta(days=DEFAULT_DAYS), end
+
+
+def _sums():
+    return [db.func.coalesce(db.func.sum(MaintenanceKpi.__table__.c[m]), 0).label(m) for m in MEASURES]
+
+
+def _ratios(values):
+    failures = values['failures']
+    usage = values['usage_hours']
+    values['mttr_hours'] = round(values['repair_hours'] / failures, 2) if failures else None
+    values['mean_downtime_hours'] = round(values['downtime_hours'] / failures, 2) if failures else None
+    values['mtbf_hours'] = round(usage / failures, 2) if failures and usage else None
+    values['failures_per_1000_hours'] = round(failures * 1000 / usage, 3) if usage else None
+    return values
+
+
+def _as_dict(row):
+    return {m: float(getattr(row, m)) if m.endswith('hours') else int(getattr(row, m)) for m in MEASURES}
+
+
+def _labels(scope, keys):
+    if scope == 'model':
+        return {k: k for k in keys}
+    if scope == 'location':
+        return {str(l['location_id']): l['name'] for l in reference.locations()}
+    if scope == 'category':
+        return {str(c['category_id']): c['name'] for c in reference.categories()}
+    ids = [int(k) for k in keys]
+    return {str(i): name for i, name in db.session.execute(
+        db.select(Equipment.equipment_id, Equipment.name).where(Equipment.equipment_id.in_(ids))
+    )}
+
+
+def kpi_summary(scope, start=None, end=None):
+    """Totals and ratios per key of scope for days in [start, end)."""
+    start, end = _window(start, end)
+    rows = db.session.execute(
+        db.select(MaintenanceKpi.scope_key, *_sums())
+        .where(MaintenanceKpi.scope == scope, MaintenanceKpi.day >= start, MaintenanceKpi.day < end)
+        .group_by(MaintenanceKpi.scope_key)
+    ).all()
+    labels = _labels(scope, [r.scope_key for r in rows])
+    return {
+        'scope': scope,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'results': [dict(_ratios(_as_dict(r)), key=r.scope_key, name=labels.get(r.scope_key))
+                    for r in rows]
+    }
+
+
+def kpi_daily(scope, key=None, start=None, end=None):
+    """Per-day totals and ratios for one key of scope, or summed over all keys."""
+    start, end = _window(start, end)
+    query = (
+        db.select(MaintenanceKpi.day, *_sums())
+        .where(MaintenanceKpi.scope == scope, MaintenanceKpi.day >= start, MaintenanceKpi.day < end)
+        .group_by(MaintenanceKpi.day)
+        .order_by(MaintenanceKpi.day)
+    )
+    if key is not None:
+        query = query.where(MaintenanceKpi.scope_key == str(key))
+    return {
+        'scope': scope,
+        'key': key,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': [dict(_ratios(_as_dict(r)), day=r.day.isoformat())
+                 for r in db.session.execute(query)]
+    }
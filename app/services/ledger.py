@@ -0,0 +1,287 @@
+import re
+from datetime import date, datetime, time
+from sqlalchemy import event
+from app import db
+from app.models import InventorySnapshot, InventoryTransaction, LedgerArchive, PartsInventory
+from app.services.sql import dialect_insert
+
+
+# ============================================
+# Inventory ledger storage
+#
+# On PostgreSQL inventory_transactions is range-partitioned by month
+# (inventory_transactions_YYYYMM) with a default partition as a safety net.
+# ensure_partitions() keeps MONTHS_AHEAD months ready. take_snapshots()
+# records every PartsInventory balance as of a point in time, so a balance
+# for any date reads the nearest snapshot and only the transactions between
+# the two. Once a later snapshot exists, the oldest month can be detached
+# and archived without touching the partitions in use; ledger_archives
+# records each detached month.
+# ============================================
+
+TABLE = InventoryTransaction.__table__.name
+DEFAULT_PARTITION = f'{TABLE}_default'
+MONTHS_AHEAD = 3
+PARTITION_NAME = re.compile(rf'^{TABLE}_(\d{{4}})(\d{{2}})$')
+
+
+def _month(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_{month:%Y%m}'
+
+
+def is_partitioned(connection):
+    return connection.dialect.name == 'postgresql' and connection.execute(db.text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:name)"
+    ), {'name': TABLE}).scalar() is True
+
+
+def attached_months(connection):
+    """Months with an attached partition, oldest first."""
+    names = connection.execute(db.text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(:name)'
+    ), {'name': TABLE}).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def ensure_partitions(connection, since=None, months_ahead=MONTHS_AHEAD):
+    """Create missing monthly partitions from since (default: this month) onwards.
+    
+    Rows that already landed in the default partition for a new month are
+    moved into it before it is attached. Returns the partitions created.
+    """
+    if not is_partitioned(connection):
+        return []
+    connection.execute(db.text(
+        f'CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT'
+    ))
+    
+    existing = set(attached_months(connection))
+    month = _month(since or datetime.utcnow())
+    last = _add_months(_month(datetime.utcnow()), months_ahead)
+    created = []
+    while month <= last:
+        if month not in existing:
+            name = partition_name(month)
+            bounds = {'start': month, 'end': _add_months(month, 1)}
+            connection.execute(db.text(
+                f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            ))
+            connection.execute(db.text(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+                f'WHERE created_at >= :start AND created_at < :end RETURNING *) '
+                f'INSERT INTO {name} SELECT * FROM moved'
+            ), bounds)
+            connection.execute(db.text(
+                f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+            ))
+            created.append(name)
+        month = _add_months(month, 1)
+    return created
+
+
+@event.listens_for(InventoryTransaction.__table__, 'after_create')
+def _create_partitions(target, connection, **kw):
+    ensure_partitions(connection)
+
+
+def partition_existing_table(connection):
+    """Move an unpartitioned inventory_transactions table into monthly partitions.
+    
+    Returns True if the table was converted.
+    """
+    if connection.dialect.name != 'postgresql' or is_partitioned(connection):
+        return False
+    table = InventoryTransaction.__table__
+    legacy = f'{TABLE}_legacy'
+    connection.execute(db.text(f'ALTER TABLE {TABLE} RENAME TO {legacy}'))
+    connection.execute(db.text(f'ALTER INDEX IF EXISTS {TABLE}_pkey RENAME TO {legacy}_pkey'))
+    for index in table.indexes:
+        connection.execute(db.text(f'DROP INDEX IF EXISTS {index.name}'))
+    
+    table.create(connection)
+    oldest = connection.execute(db.text(f'SELECT min(created_at) FROM {legacy}')).scalar()
+    ensure_partitions(connection, since=oldest)
+    
+    columns = ', '.join(c.name for c in table.columns if c.name != 'created_at')
+    connection.execute(db.text(
+        f'INSERT INTO {TABLE} ({columns}, created_at) '
+        f'SELECT {columns}, coalesce(created_at, now()) FROM {legacy}'
+    ))
+    connection.execute(db.text(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'transaction_id'), "
+        f"coalesce((SELECT max(transaction_id) FROM {TABLE}), 0) + 1, false)"
+    ))
+    connection.execute(db.text(f'DROP TABLE {legacy}'))
+    return True
+
+
+def record_detached_partitions(connection):
+    """Add ledger_archives rows for monthly tables detached before it existed.
+    
+    Returns the months recorded.
+    """
+    if not is_partitioned(connection):
+        return []
+    attached = set(attached_months(connection))
+    recorded = set(connection.execute(db.select(LedgerArchive.month)).scalars())
+    names = connection.execute(db.text(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE :pattern"
+    ), {'pattern': f'{TABLE}_%'}).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if month not in attached and month not in recorded:
+            connection.execute(db.insert(LedgerArchive).values(
+                month=month, table_name=name, detached_at=datetime.utcnow()
+            ))
+            months.append(month)
+    return sorted(months)
+
+
+def take_snapshots(as_of=None):
+    """Record every inventory balance as of as_of (default: start of today, UTC).
+    
+    The balance is derived from the current quantity minus later
+    transactions, so an as_of a little in the past is not affected by
+    adjustments still in flight. Returns the number of snapshots written.
+    """
+    as_of = as_of or datetime.combine(datetime.utcnow().date(), time())
+    later = (
+        db.select(db.func.coalesce(db.func.sum(InventoryTransaction.quantity), 0))
+        .where(InventoryTransaction.inventory_id == PartsInventory.inventory_id,
+               InventoryTransaction.created_at >= as_of)
+        .scalar_subquery()
+    )
+    source = db.select(
+        PartsInventory.inventory_id, db.literal(as_of), PartsInventory.quantity_on_hand - later
+    )
+    # Re-running for the same as_of keeps the snapshots already taken
+    dialect = db.session.get_bind().dialect.name
+    stmt = dialect_insert(InventorySnapshot.__table__, dialect).from_select(
+        ['inventory_id', 'taken_at', 'quantity_on_hand'], source
+    ).on_conflict_do_nothing()
+    written = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return written
+
+
+def retained_since():
+    """End of the latest detached month, or None if nothing was detached."""
+    month = db.session.execute(db.select(db.func.max(LedgerArchive.month))).scalar()
+    return datetime.combine(_add_months(month, 1), time()) if month else None
+
+
+def _transaction_total(inventory_id, start, end=None):
+    query = db.select(
+        db.func.coalesce(db.func.sum(InventoryTransaction.quantity), 0),
+        db.func.count()
+    ).where(InventoryTransaction.inventory_id == inventory_id,
+            InventoryTransaction.created_at >= start)
+    if end is not None:
+        query = query.where(InventoryTransaction.created_at < end)
+    return db.session.execute(query).one()
+
+
+def balance_as_of(inventory_id, as_of):
+    """quantity_on_hand of an inventory row at as_of.
+    
+    Starts from whichever is closer in time: the latest snapshot at or
+    before as_of (replaying later transactions forwards) or the next
+    snapshot, or the current balance, after it (replaying backwards).
+    Returns None for an unknown row; raises ValueError when the
+    transactions needed have been detached.
+    """
+    inventory = db.session.get(PartsInventory, inventory_id)
+    if inventory is None:
+        return None
+    
+    retained = retained_since()
+    if retained and as_of < retained:
+        raise ValueError(f'Transactions before {retained:%Y-%m-%d} have been archived')
+    
+    earlier_query = (
+        db.select(InventorySnapshot.taken_at, InventorySnapshot.quantity_on_hand)
+        .where(InventorySnapshot.inventory_id == inventory_id, InventorySnapshot.taken_at <= as_of)
+        .order_by(InventorySnapshot.taken_at.desc()).limit(1)
+    )
+    if retained:
+        earlier_query = earlier_query.where(InventorySnapshot.taken_at >= retained)
+    earlier = db.session.execute(earlier_query).first()
+    later = db.session.execute(
+        db.select(InventorySnapshot.taken_at, InventorySnapshot.quantity_on_hand)
+        .where(InventorySnapshot.inventory_id == inventory_id, InventorySnapshot.taken_at > as_of)
+        .order_by(InventorySnapshot.taken_at).limit(1)
+    ).first()
+    # With no later snapshot, the current balance serves as one taken now
+    now = datetime.utcnow()
+    later_at = later.taken_at if later else now
+    
+    if earlier and as_of - earlier.taken_at <= later_at - as_of:
+        total, replayed = _transaction_total(inventory_id, earlier.taken_at, as_of)
+        quantity, base, base_at = earlier.quantity_on_hand + total, 'snapshot', earlier.taken_at
+    elif later:
+        total, replayed = _transaction_total(inventory_id, as_of, later.taken_at)
+        quantity, base, base_at = later.quantity_on_hand - total, 'snapshot', later.taken_at
+    else:
+        total, replayed = _transaction_total(inventory_id, as_of)
+        quantity, base, base_at = inventory.quantity_on_hand - total, 'current', now
+    
+    return {
+        'inventory_id': inventory_id,
+        'as_of': as_of.isoformat(),
+        'quantity_on_hand': int(quantity),
+        'base': base,
+        'base_at': base_at.isoformat(),
+        'transactions_replayed': replayed
+    }
+
+
+def detach_oldest_partition(month):
+    """Detach the oldest monthly partition, leaving it as a standalone table.
+    
+    Only allowed for a finished month that is the oldest attached one and
+    once a snapshot at or after its end exists, so balances after it can
+    still be computed. Returns the detached table's name.
+    """
+    connection = db.session.connection()
+    if not is_partitioned(connection):
+        raise ValueError('inventory_transactions is not partitioned')
+    month = _month(month)
+    months = attached_months(connection)
+    if month not in months:
+        raise ValueError(f'No attached partition for {month:%Y-%m}')
+    if month != months[0]:
+        raise ValueError(f'Detach {months[0]:%Y-%m} first; partitions are detached oldest first')
+    end = datetime.combine(_add_months(month, 1), time())
+    if end > datetime.utcnow():
+        raise ValueError(f'{month:%Y-%m} has not finished yet')
+    covered = db.session.execute(
+        db.select(InventorySnapshot.taken_at).where(InventorySnapshot.taken_at >= end).limit(1)
+    ).first()
+    if covered is None:
+        raise ValueError(f'Take a snapshot after {end:%Y-%m-%d} before detaching {month:%Y-%m}')
+    
+    name = partition_name(month)
+    connection.execute(db.text(f'ALTER TABLE {TABLE} DETACH PARTITION {name}'))
+    db.session.add(LedgerArchive(month=month, table_name=name))
+    db.session.commit()
+    return name
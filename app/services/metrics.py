@@ -0,0 +1,219 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+# ============================================
+# Request and SQL metrics
+#
+# Engine hooks time every statement run while a request is being handled
+# and count it under a fingerprint (the statement with literals and bind
+# parameters blanked out). When the request ends, its query count, database
+# time and slowest statement are added to per-endpoint histograms. A
+# fingerprint repeated SQL_REPEAT_THRESHOLD times or more in one request is
+# logged as a likely N+1. render() produces the Prometheus text format.
+# Metrics are kept per process, like the other in-process caches.
+# ============================================
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|%s|\?'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?)'),
+    (re.compile(r'(?:\(\?\)\s*,\s*)+\(\?\)'), '(?)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def fingerprint(statement):
+    for pattern, replacement in _FINGERPRINT_RULES:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help, label_names, buckets):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}  # label values -> [count per bucket..., sum, count]
+    
+    def observe(self, labels, value):
+        series = self.series.setdefault(labels, [0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le=bound)} {count}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le="+Inf")} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {series[-1]}')
+        return lines
+
+
+class Metric:
+    """Counter or gauge keyed by label values."""
+    
+    def __init__(self, name, help, type, label_names):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.label_names = label_names
+        self.values = {}
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for labels, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value:g}')
+        return lines
+
+
+_lock = threading.Lock()
+_request_duration = Histogram('app_request_duration_seconds', 'Request handling time by endpoint.',
+                              ('endpoint',), DURATION_BUCKETS)
+_db_time = Histogram('app_db_time_seconds', 'Time spent in SQL statements per request by endpoint.',
+                     ('endpoint',), DURATION_BUCKETS)
+_db_queries = Histogram('app_db_queries', 'SQL statements per request by endpoint.',
+                        ('endpoint',), QUERY_BUCKETS)
+_requests = Metric('app_requests_total', 'Requests by endpoint, method and status.', 'counter',
+                   ('endpoint', 'method', 'status'))
+_repeats = Metric('app_db_repeated_statements_total',
+                  'Requests where one statement fingerprint reached SQL_REPEAT_THRESHOLD (likely N+1).',
+                  'counter', ('endpoint',))
+_slowest = Metric('app_db_slowest_statement_seconds', 'Slowest single statement seen by endpoint.', 'gauge',
+                  ('endpoint',))
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = (0.0, None)
+        self.fingerprints = Counter()
+        self.recorded = False
+
+
+def _stats():
+    return g.get('sql_stats') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start time lives on the execution context, so a statement that
+    # raises leaves nothing behind on the pooled connection
+    if context is not None and _stats() is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats()
+    started = getattr(context, 'metrics_started', None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.queries += 1
+    stats.db_time += elapsed
+    stats.fingerprints[fingerprint(statement)] += 1
+    if elapsed > stats.slowest[0]:
+        stats.slowest = (elapsed, statement)
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def start_request():
+    g.sql_stats = RequestStats()
+
+
+@contextmanager
+def collect():
+    """RequestStats for the statements run inside the block, outside request handling (e.g. in tests)."""
+    with current_app.test_request_context():
+        start_request()
+        try:
+            yield g.sql_stats
+        finally:
+            g.pop('sql_stats', None)
+
+
+def _record(status):
+    stats = _stats()
+    if stats is None or stats.recorded:
+        return
+    stats.recorded = True
+    endpoint = request.endpoint or 'unmatched'
+    duration = time.perf_counter() - stats.started
+    config = current_app.config
+    
+    threshold = config.get('SQL_REPEAT_THRESHOLD', 10)
+    repeated = [(count, text) for text, count in stats.fingerprints.items() if count >= threshold]
+    for count, text in sorted(repeated, reverse=True):
+        logger.warning('Possible N+1 in %s: %d executions of %s', endpoint, count, text[:300])
+    slow_ms = config.get('SQL_SLOW_STATEMENT_MS', 500)
+    if stats.slowest[0] * 1000 >= slow_ms:
+        logger.warning('Slow statement in %s (%.0f ms): %s', endpoint, stats.slowest[0] * 1000,
+                       fingerprint(stats.slowest[1])[:300])
+    
+    key = (endpoint,)
+    with _lock:
+        _request_duration.observe(key, duration)
+        _db_time.observe(key, stats.db_time)
+        _db_queries.observe(key, stats.queries)
+        request_key = (endpoint, request.method, str(status))
+        _requests.values[request_key] = _requests.values.get(request_key, 0) + 1
+        if repeated:
+            _repeats.values[key] = _repeats.values.get(key, 0) + 1
+        if stats.slowest[0] > _slowest.values.get(key, 0):
+            _slowest.values[key] = stats.slowest[0]
+
+
+def finish_request(response):
+    _record(response.status_code)
+    return response
+
+
+def teardown_request(error=None):
+    # Only reached unrecorded when the request failed with an unhandled error
+    _record(500)
+
+
+def render(extra=()):
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        lines = []
+        for metric in (_requests, _request_duration, _db_queries, _db_time, _slowest, _repeats):
+            lines.extend(metric.render())
+    for metric in extra:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
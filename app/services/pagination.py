@@ -0,0 +1,135 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from app import db
+from app.services.sql import explain
+
+
+# ============================================
+# Keyset (cursor) pagination
+#
+# Pages are addressed by the sort-key values of the last row already seen
+# rather than by OFFSET, so page N costs the same as page 1 and no COUNT(*)
+# is needed. The last key must be unique (normally the primary key) so the
+# ordering is total.
+# ============================================
+
+# Estimates below this are replaced by an exact COUNT(*), which is cheap there
+EXACT_COUNT_LIMIT = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, cursor=None, next_cursor=None, total=None, estimated=False):
+        self.items = items
+        self.per_page = per_page
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.total = total
+        self.estimated = estimated
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'n' in value:
+            return Decimal(value['n'])
+        raise InvalidCursor('Unknown cursor value')
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = [_decode_value(v) for v in json.loads(raw)]
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor('Invalid cursor') from exc
+    if len(values) != size:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def _after(keys, values):
+    """Predicate selecting rows that sort after the given key values."""
+    directions = {desc for _, desc in keys}
+    if len(directions) == 1:
+        # Uniform direction: a row-value comparison can be served by one index scan
+        lhs = db.tuple_(*[expr for expr, _ in keys])
+        rhs = db.tuple_(*[db.literal(v) for v in values])
+        return lhs < rhs if directions.pop() else lhs > rhs
+    
+    clauses = []
+    for i, ((expr, desc), value) in enumerate(zip(keys, values)):
+        equal = [k == v for (k, _), v in zip(keys[:i], values[:i])]
+        clauses.append(db.and_(*equal, expr < value if desc else expr > value))
+    return db.or_(*clauses)
+
+
+def estimate_count(query):
+    """(count, estimated): the planner's estimate for a large result on PostgreSQL, else exact."""
+    query = query.order_by(None)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        estimate = int(explain(query)['Plan Rows'])
+        if estimate > EXACT_COUNT_LIMIT:
+            return estimate, True
+    return query.count(), False
+
+
+def keyset_paginate(query, keys, per_page, cursor=None, total=None, columns=None):
+    """Return one KeysetPage of query ordered by keys.
+    
+    keys is a list of (expression, descending) pairs whose last entry is
+    unique. total may be None, 'exact' or 'estimate' (exact for small
+    results; page.estimated tells which). With columns, the page's items
+    are rows of just those columns instead of entities.
+    """
+    count, estimated = None, False
+    if total == 'exact':
+        count = query.order_by(None).count()
+    elif total == 'estimate':
+        count, estimated = estimate_count(query)
+    
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, len(keys))))
+    
+    width = 1
+    if columns is not None:
+        query, width = query.with_entities(*columns), len(columns)
+    query = query.add_columns(*[expr.label(f'_key{i}') for i, (expr, _) in enumerate(keys)])
+    query = query.order_by(None).order_by(*[expr.desc() if desc else expr.asc() for expr, desc in keys])
+    
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(list(rows[-1])[width:])
+    
+    items = [row[0] for row in rows] if columns is None else [row[:width] for row in rows]
+    return KeysetPage(items, per_page, cursor=cursor,
+                      next_cursor=next_cursor, total=count, estimated=estimated)
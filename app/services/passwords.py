@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import bcrypt
+
+
+# ============================================
+# Password hashing
+#
+# bcrypt is deliberately slow and releases the GIL while it runs. Checks are
+# handed to a small per-process pool so a burst of logins (shift changes)
+# can use at most PASSWORD_HASH_WORKERS cores, leaving CPU for the requests
+# that are not logging in. This bounds concurrency; it does not make login
+# non-blocking: the request thread still waits for its check, so under
+# gthread each login occupies a worker thread for the whole verification.
+# Once PASSWORD_HASH_QUEUE further logins are waiting, new ones give up
+# after PASSWORD_HASH_WAIT seconds instead of piling up.
+# ============================================
+
+class PasswordCheckBusy(RuntimeError):
+    """Raised when the hashing pool is saturated."""
+
+
+_lock = threading.Lock()
+_pool = None  # (executor, slots)
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            workers = current_app.config.get('PASSWORD_HASH_WORKERS', 2)
+            queue = current_app.config.get('PASSWORD_HASH_QUEUE', 8)
+            _pool = (ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt'),
+                     threading.BoundedSemaphore(workers + queue))
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the hashing pool; the next check starts one from the current config."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool[0].shutdown(wait=True)
+
+
+def _run(fn, *args):
+    """Run fn on the hashing pool and wait for it; the calling thread blocks meanwhile."""
+    executor, slots = _get_pool()
+    if not slots.acquire(timeout=current_app.config.get('PASSWORD_HASH_WAIT', 5)):
+        raise PasswordCheckBusy()
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_cost(password_hash):
+    """Log rounds encoded in a bcrypt hash ($2b$12$...), or None if unparseable."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def hash_password(password):
+    return _run(bcrypt.generate_password_hash, password).decode('utf-8')
+
+
+def verify_password(user, password):
+    """Check password against user's hash on the pool.
+
+    On success, a hash made with a different cost than BCRYPT_LOG_ROUNDS is
+    replaced in the session; the caller's commit persists it.
+    """
+    if not password or not user.password_hash:
+        return False
+    if not _run(bcrypt.check_password_hash, user.password_hash, password):
+        return False
+    if hash_cost(user.password_hash) != current_app.config.get('BCRYPT_LOG_ROUNDS', 12):
+        user.password_hash = hash_password(password)
+    return True
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from app import db
+from app.models import Equipment, MaintenanceSchedule, User, WorkOrder
+from app.services.dashboard import mark_dashboard_stale
+
+
+# ============================================
+# Preventive maintenance generator
+#
+# One pass finds every active schedule that is due by date (next_due has
+# passed) or by usage (the equipment has run frequency_hours since the task
+# was last done), creates a preventive work order for each with a single
+# INSERT ... SELECT ... RETURNING (numbers come from the column default),
+# and advances next_due and the usage baseline of the returned schedules
+# with a single UPDATE. Schedules that already have an unfinished work
+# order are skipped, so repeated runs never duplicate work.
+# ============================================
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ['open', 'in_progress', 'on_hold']
+# Serializes generator runs across gunicorn workers on PostgreSQL
+ADVISORY_LOCK_KEY = 52000901
+
+
+def _due_schedules(now):
+    open_work_order = db.exists().where(
+        WorkOrder.schedule_id == MaintenanceSchedule.schedule_id,
+        WorkOrder.status.in_(OPEN_STATUSES)
+    )
+    due_by_date = MaintenanceSchedule.next_due <= now
+    due_by_hours = db.and_(
+        MaintenanceSchedule.frequency_hours.isnot(None),
+        Equipment.usage_hours - db.func.coalesce(MaintenanceSchedule.last_usage_hours, 0)
+        >= MaintenanceSchedule.frequency_hours
+    )
+    return db.and_(
+        MaintenanceSchedule.is_active == True,
+        Equipment.status != 'retired',
+        db.or_(due_by_date, due_by_hours),
+        ~open_work_order
+    )
+
+
+def generate_preventive_work_orders(created_by, now=None):
+    """Create work orders for every due schedule; returns how many were created."""
+    now = now or datetime.utcnow()
+    
+    if db.session.get_bind().dialect.name == 'postgresql':
+        locked = db.session.execute(
+            db.select(db.func.pg_try_advisory_xact_lock(ADVISORY_LOCK_KEY))
+        ).scalar()
+        if not locked:
+            db.session.rollback()
+            return 0
+    
+    source = db.select(
+        MaintenanceSchedule.equipment_id,
+        MaintenanceSchedule.schedule_id,
+        db.func.concat(MaintenanceSchedule.task_name, ' - ', Equipment.name),
+        MaintenanceSchedule.description,
+        db.literal('preventive'),
+        db.literal('open'),
+        MaintenanceSchedule.priority,
+        db.literal(created_by),
+        db.cast(db.func.coalesce(MaintenanceSchedule.next_due, now), db.Date),
+        db.literal(0),
+        db.literal(0),
+        db.literal(1),
+        db.literal(now),
+        db.literal(now)
+    ).join(Equipment, Equipment.equipment_id == MaintenanceSchedule.equipment_id).where(_due_schedules(now))
+    
+    # The ids come back from the INSERT itself, so other rows that happen to
+    # share the timestamp or type are never mistaken for generated ones
+    generated = db.session.execute(db.insert(WorkOrder).from_select([
+        'equipment_id', 'schedule_id', 'title', 'description', 'type', 'status', 'priority',
+        'created_by', 'scheduled_date', 'parts_cost', 'total_cost', 'version',
+        'created_at', 'updated_at'
+    ], source).returning(WorkOrder.work_order_id, WorkOrder.schedule_id)).all()
+    created = len(generated)
+    
+    if created:
+        # Advance the schedules that were just served
+        usage = db.select(Equipment.usage_hours).where(
+            Equipment.equipment_id == MaintenanceSchedule.equipment_id
+        ).scalar_subquery()
+        db.session.execute(
+            db.update(MaintenanceSchedule)
+            .where(MaintenanceSchedule.schedule_id.in_({schedule_id for _, schedule_id in generated}))
+            .values(
+                next_due=db.case(
+                    (MaintenanceSchedule.frequency_days.isnot(None),
+                     now + db.func.make_interval(0, 0, 0, MaintenanceSchedule.frequency_days)),
+                    else_=MaintenanceSchedule.next_due
+                ),
+                last_usage_hours=db.func.coalesce(usage, 0),
+                usage_due_at=None,
+                version=MaintenanceSchedule.version + 1,
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    if created:
+        mark_dashboard_stale(db.session)
+    db.session.commit()
+    return created
+
+
+def record_completion(work_order, completed_at):
+    """Reset the linked schedule's due date and usage baseline after the work is done."""
+    schedule = work_order.schedule
+    if not schedule:
+        return
+    schedule.last_performed = completed_at
+    schedule.last_usage_hours = work_order.equipment.usage_hours or 0
+    schedule.usage_due_at = None
+    if schedule.frequency_days:
+        schedule.next_due = completed_at + timedelta(days=int(schedule.frequency_days))
+
+
+def _generator_user_id():
+    user = User.query.filter_by(role='admin', is_active=True).order_by(User.user_id).first()
+    return user.user_id if user else None
+
+
+def start_preventive_scheduler(app, interval):
+    """Run the generator every `interval` seconds in a background thread."""
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    user_id = _generator_user_id()
+                    if user_id:
+                        created = generate_preventive_work_orders(user_id)
+                        if created:
+                            logger.info('Generated %d preventive work orders', created)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Preventive work order generation failed')
+                finally:
+                    db.session.remove()
+    
+    thread = threading.Thread(target=run, name='preventive-generator', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,88 @@
+import threading
+import time
+from flask import current_app
+from flask_login import UserMixin
+from app.models import Location, User
+from app.services import reference
+
+
+# ============================================
+# Authenticated user cache
+#
+# Flask-Login calls the user loader on every request. Instead of loading the
+# User row (and then its location) each time, keep a small read-only
+# principal per user id. Entries expire after PRINCIPAL_CACHE_TTL seconds and
+# are tagged with the 'users' reference version, so a profile edit or a
+# deactivation in any worker drops them within
+# REFERENCE_CACHE_CHECK_INTERVAL seconds.
+# ============================================
+
+class Principal(UserMixin):
+    """Detached snapshot of the fields request handling needs from a User."""
+    
+    def __init__(self, user_id, username, email, first_name, last_name, role,
+                 location_id=None, location_name=None, is_active=True):
+        self.user_id = user_id
+        self.username = username
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+        self.location_id = location_id
+        self.location_name = location_name
+        self._active = bool(is_active)
+    
+    @classmethod
+    def from_user(cls, user):
+        location = Location.query.get(user.location_id) if user.location_id else None
+        return cls(user.user_id, user.username, user.email, user.first_name,
+                   user.last_name, user.role, user.location_id,
+                   location.name if location else None, user.is_active)
+    
+    @property
+    def is_active(self):
+        return self._active
+    
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+    
+    def get_id(self):
+        return str(self.user_id)
+    
+    def is_admin(self):
+        return self.role == 'admin'
+    
+    def is_manager(self):
+        return self.role in ['admin', 'manager']
+
+
+_lock = threading.Lock()
+_principals = {}  # user_id -> (expires_at, users version, principal)
+
+
+def load_principal(user_id):
+    """Return the cached principal for user_id, or None if missing or inactive."""
+    version = reference.current_version('users')
+    entry = _principals.get(user_id)
+    if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+        principal = entry[2]
+    else:
+        user = User.query.get(user_id)
+        principal = Principal.from_user(user) if user else None
+        ttl = current_app.config.get('PRINCIPAL_CACHE_TTL', 60)
+        with _lock:
+            _principals[user_id] = (time.monotonic() + ttl, version, principal)
+    
+    if principal is None or not principal.is_active:
+        return None
+    return principal
+
+
+def invalidate_principal(user_id=None):
+    """Drop one cached principal, or all of them when user_id is None."""
+    with _lock:
+        if user_id is None:
+            _principals.clear()
+        else:
+            _principals.pop(user_id, None)
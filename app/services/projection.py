@@ -0,0 +1,313 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from app import db
+from app.models import (Equipment, EquipmentCategory, Location, Part, PartsInventory, User,
+                        WorkOrder, WorkOrderPart)
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder produces the same JSON, only slower
+    orjson = None
+
+
+# ============================================
+# Sparse fieldsets
+#
+# ?fields=name,status on an API endpoint selects just those columns (and
+# just the joins they need) instead of loading entities and calling
+# to_dict(). The rows come back as plain tuples, so nothing enters the
+# identity map, and each field's encoder converts Numeric and dates the
+# same way to_dict() does. Field names are the to_dict() keys. Endpoints
+# served from the reference cache pick the requested keys from the cached
+# dicts rather than querying.
+# ============================================
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _float_or_none(value):
+    return float(value) if value else None
+
+
+def _float_or_zero(value):
+    return float(value or 0)
+
+
+def _under_warranty(warranty_expiration):
+    return bool(warranty_expiration and warranty_expiration > datetime.utcnow().date())
+
+
+def _full_name(user):
+    return db.case((user.user_id.is_(None), None), else_=user.first_name + ' ' + user.last_name)
+
+
+class Field:
+    def __init__(self, expression, encode=None, joins=()):
+        self.expression = expression
+        self.encode = encode
+        self.joins = joins
+
+
+class Projection:
+    """The selectable fields of one resource and the joins they rely on.
+    
+    joins maps a name to (model, relationship[, alias]) in the order they
+    must be applied; fields maps each field name to a Field. Joining along
+    the relationship names its left side, so a selection need not include
+    the base model's columns.
+    """
+    
+    def __init__(self, fields, joins=None):
+        self.fields = fields
+        self.joins = joins or {}
+    
+    def parse(self, value, extra=()):
+        """Selection for a comma-separated fields value.
+    
+        extra names are accepted but left to the caller, e.g. nested lists
+        that need a query of their own.
+        """
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields and name not in extra]
+        if not names or unknown:
+            raise InvalidFields('Unknown fields: %s' % ', '.join(unknown) if unknown else 'No fields given')
+        return Selection(self, names)
+    
+    def all(self):
+        return Selection(self, list(self.fields))
+
+
+class Selection:
+    def __init__(self, projection, names):
+        self.names = names
+        fields = [(name, projection.fields[name]) for name in names if name in projection.fields]
+        needed = {join for _, field in fields for join in field.joins}
+        self.joins = [target for key, target in projection.joins.items() if key in needed]
+        self.columns = [field.expression.label(name) for name, field in fields]
+        self._encoders = [(name, field.encode) for name, field in fields]
+    
+    def join(self, query):
+        """query with the outer joins the selected fields read from."""
+        for model, relationship, *alias in self.joins:
+            # Backrefs only exist once the mappers are configured, so resolve here
+            attribute = getattr(model, relationship)
+            query = query.outerjoin(attribute.of_type(*alias) if alias else attribute)
+        return query
+    
+    def rows(self, query):
+        """Run query for just the selected columns; returns encoded dicts."""
+        return self.encode(self.join(query).with_entities(*self.columns).all())
+    
+    def encode(self, rows):
+        encoders = self._encoders
+        return [{name: encode(value) if encode else value
+                 for (name, encode), value in zip(encoders, row)} for row in rows]
+    
+    def first(self, query):
+        """The single row of query as a dict, or None if there is none."""
+        if not self.columns:
+            return {}
+        row = self.join(query).with_entities(*self.columns).first()
+        return self.encode([row])[0] if row is not None else None
+    
+    def pick(self, items):
+        """Keep only the selected keys of already-serialized dicts."""
+        return [{name: item[name] for name in self.names} for item in items]
+
+
+def _default(value):
+    # The conversions Flask's default JSON provider makes
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps(payload, indent=None, sort_keys=True):
+    """Encode payload as compact, key-sorted UTF-8 JSON bytes.
+    
+    This is the app's only JSON encoder: jsonify() goes through
+    JSONProvider and the async API calls it directly, so both emit the
+    same bytes for the same data. indent may be None or 2 (orjson's only
+    indentation).
+    """
+    if orjson is not None:
+        option = _OPTIONS if sort_keys else _OPTIONS & ~orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(payload, default=_default, option=option)
+    return json.dumps(payload, default=_default, sort_keys=sort_keys, ensure_ascii=False,
+                      indent=2 if indent else None,
+                      separators=(',', ': ') if indent else (',', ':')).encode('utf-8')
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider on top of dumps()."""
+    
+    # json.dumps() arguments dumps() can honour; any other goes to Flask's provider
+    SUPPORTED = {'indent', 'sort_keys'}
+    
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - self.SUPPORTED or kwargs.get('indent') not in (None, 0, 2):
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, indent=kwargs.get('indent'), sort_keys=kwargs.get('sort_keys', True)).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Pretty-printed in debug mode unless compact is set, as Flask's provider does
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(dumps(obj, indent=2 if pretty else None), mimetype=self.mimetype)
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+# ============================================
+# Resource projections
+# ============================================
+
+_assignee = db.aliased(User, name='assignee')
+_creator = db.aliased(User, name='creator')
+
+EQUIPMENT = Projection(
+    joins={
+        'category': (Equipment, 'category'),
+        'location': (Equipment, 'location'),
+    },
+    fields={
+        'equipment_id': Field(Equipment.equipment_id),
+        'name': Field(Equipment.name),
+        'model': Field(Equipment.model),
+        'serial_number': Field(Equipment.serial_number),
+        'manufacturer': Field(Equipment.manufacturer),
+        'category_id': Field(Equipment.category_id),
+        'category_name': Field(EquipmentCategory.name, joins=('category',)),
+        'location_id': Field(Equipment.location_id),
+        'location_name': Field(Location.name, joins=('location',)),
+        'purchase_date': Field(Equipment.purchase_date, _iso),
+        'purchase_price': Field(Equipment.purchase_price, _float_or_none),
+        'warranty_expiration': Field(Equipment.warranty_expiration, _iso),
+        'under_warranty': Field(Equipment.warranty_expiration, _under_warranty),
+        'status': Field(Equipment.status),
+        'usage_hours': Field(Equipment.usage_hours, _float_or_zero),
+        'notes': Field(Equipment.notes),
+        'version': Field(Equipment.version),
+    }
+)
+
+WORK_ORDERS = Projection(
+    joins={
+        'equipment': (WorkOrder, 'equipment'),
+        'location': (Equipment, 'location'),
+        'assignee': (WorkOrder, 'assignee', _assignee),
+        'creator': (WorkOrder, 'creator', _creator),
+    },
+    fields={
+        'work_order_id': Field(WorkOrder.work_order_id),
+        'work_order_number': Field(WorkOrder.work_order_number),
+        'equipment_id': Field(WorkOrder.equipment_id),
+        'equipment_name': Field(Equipment.name, joins=('equipment',)),
+        'location_name': Field(Location.name, joins=('equipment', 'location')),
+        'schedule_id': Field(WorkOrder.schedule_id),
+        'title': Field(WorkOrder.title),
+        'description': Field(WorkOrder.description),
+        'type': Field(WorkOrder.type),
+        'status': Field(WorkOrder.status),
+        'priority': Field(WorkOrder.priority),
+        'assigned_to': Field(WorkOrder.assigned_to),
+        'assigned_to_name': Field(_full_name(_assignee), joins=('assignee',)),
+        'created_by': Field(WorkOrder.created_by),
+        'created_by_name': Field(_full_name(_creator), joins=('creator',)),
+        'scheduled_date': Field(WorkOrder.scheduled_date, _iso),
+        'started_at': Field(WorkOrder.started_at, _iso),
+        'completed_at': Field(WorkOrder.completed_at, _iso),
+        'labor_hours': Field(WorkOrder.labor_hours, _float_or_none),
+        'labor_cost': Field(WorkOrder.labor_cost, _float_or_none),
+        'parts_cost': Field(WorkOrder.parts_cost, _float_or_zero),
+        'total_cost': Field(WorkOrder.total_cost, _float_or_zero),
+        'notes': Field(WorkOrder.notes),
+        'version': Field(WorkOrder.version),
+    }
+)
+
+WORK_ORDER_PARTS = Projection(
+    joins={
+        'part': (WorkOrderPart, 'part'),
+    },
+    fields={
+        'part_id': Field(WorkOrderPart.part_id),
+        'part_number': Field(Part.part_number, joins=('part',)),
+        'part_name': Field(Part.name, joins=('part',)),
+        'quantity_used': Field(WorkOrderPart.quantity_used),
+        'unit_cost': Field(WorkOrderPart.unit_cost, _float_or_none),
+        'total_cost': Field(WorkOrderPart.quantity_used * db.func.coalesce(WorkOrderPart.unit_cost, 0),
+                            _float_or_zero),
+    }
+)
+
+INVENTORY = Projection(
+    joins={
+        'part': (PartsInventory, 'part'),
+        'location': (PartsInventory, 'location'),
+    },
+    fields={
+        'inventory_id': Field(PartsInventory.inventory_id),
+        'part_id': Field(PartsInventory.part_id),
+        'part_number': Field(Part.part_number, joins=('part',)),
+        'part_name': Field(Part.name, joins=('part',)),
+        'location_id': Field(PartsInventory.location_id),
+        'location_name': Field(Location.name, joins=('location',)),
+        'quantity_on_hand': Field(PartsInventory.quantity_on_hand),
+        'quantity_reserved': Field(PartsInventory.quantity_reserved),
+        'available': Field(PartsInventory.quantity_on_hand - PartsInventory.quantity_reserved),
+        'reorder_point': Field(PartsInventory.reorder_point),
+        'bin_location': Field(PartsInventory.bin_location),
+        'is_low_stock': Field(PartsInventory.quantity_on_hand <= PartsInventory.reorder_point),
+        'version': Field(PartsInventory.version),
+    }
+)
+
+# Served from the reference cache, so only pick() is used; the columns keep
+# the field names checked against the same to_dict() keys
+LOCATIONS = Projection(fields={
+    name: Field(getattr(Location, name))
+    for name in ('location_id', 'name', 'address', 'city', 'state', 'postal_code', 'phone', 'is_active')
+})
+
+CATEGORIES = Projection(fields={
+    name: Field(getattr(EquipmentCategory, name)) for name in ('category_id', 'name', 'description')
+})
+
+USERS = Projection(
+    joins={
+        'location': (User, 'location'),
+    },
+    fields=dict(
+        {name: Field(getattr(User, name))
+         for name in ('user_id', 'username', 'email', 'first_name', 'last_name', 'role',
+                      'location_id', 'is_active')},
+        full_name=Field(_full_name(User)),
+        location_name=Field(Location.name, joins=('location',)),
+    )
+)
@@ -0,0 +1,176 @@
+import threading
+import time
+from itertools import chain
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.models import CacheVersion, EquipmentCategory, Location, Part, User
+from app.services.sql import dialect_insert
+
+
+# ============================================
+# Reference data cache
+#
+# Locations, categories, users and active parts change rarely but are read
+# by almost every form and list. Each set is cached per process as plain
+# dicts (templates read them like the ORM objects) and tagged with a version
+# from the cache_versions table. Any flush that changes one of these tables
+# bumps its counter in the same transaction, so other workers see the new
+# version within REFERENCE_CACHE_CHECK_INTERVAL seconds and reload.
+# ============================================
+
+def _load_users():
+    # One query for all locations instead of one per user in to_dict()
+    locations = {l.location_id: l for l in Location.query}
+    users = User.query.order_by(User.first_name).all()
+    for u in users:
+        set_committed_value(u, 'location', locations.get(u.location_id))
+    return [u.to_dict() for u in users]
+
+
+LOADERS = {
+    'locations': lambda: [l.to_dict() for l in
+                          Location.query.filter_by(is_active=True).order_by(Location.name)],
+    'categories': lambda: [c.to_dict() for c in EquipmentCategory.query.order_by(EquipmentCategory.name)],
+    'users': _load_users,
+    'parts': lambda: [p.to_dict() for p in Part.query.filter_by(is_active=True).order_by(Part.name)],
+}
+
+# Which cached sets a change to each model invalidates
+MODEL_KINDS = {
+    Location: ('locations', 'users'),
+    EquipmentCategory: ('categories',),
+    User: ('users',),
+    Part: ('parts',),
+}
+
+# Bookkeeping columns that do not affect any cached value
+IGNORED_CHANGES = {'last_login', 'updated_at', 'created_at', 'password_hash'}
+
+_lock = threading.Lock()
+_entries = {}   # kind -> (version, value)
+_versions = {}  # kind -> latest version seen in cache_versions
+_checked_at = 0.0
+_stats = {kind: {'hits': 0, 'misses': 0} for kind in LOADERS}
+
+
+def _current_versions():
+    global _checked_at
+    interval = current_app.config.get('REFERENCE_CACHE_CHECK_INTERVAL', 5)
+    if time.monotonic() - _checked_at >= interval:
+        versions = dict(db.session.query(CacheVersion.name, CacheVersion.version))
+        with _lock:
+            _versions.clear()
+            _versions.update(versions)
+            _checked_at = time.monotonic()
+    return _versions
+
+
+def current_version(kind):
+    """Latest known version of kind, checked at most every check interval."""
+    return _current_versions().get(kind, 0)
+
+
+def get_reference(kind):
+    """Return the cached list for kind, reloading it if its version moved."""
+    version = current_version(kind)
+    entry = _entries.get(kind)
+    if entry is not None and entry[0] == version:
+        with _lock:
+            _stats[kind]['hits'] += 1
+        return entry[1]
+    
+    value = LOADERS[kind]()
+    with _lock:
+        _stats[kind]['misses'] += 1
+        _entries[kind] = (version, value)
+    return value
+
+
+def locations():
+    return get_reference('locations')
+
+
+def categories():
+    return get_reference('categories')
+
+
+def active_parts():
+    return get_reference('parts')
+
+
+def users(role=None, active_only=True):
+    result = get_reference('users')
+    if active_only:
+        result = [u for u in result if u['is_active']]
+    if role:
+        roles = [role] if isinstance(role, str) else role
+        result = [u for u in result if u['role'] in roles]
+    return result
+
+
+def technicians(active_only=True):
+    return users(['technician', 'manager'], active_only=active_only)
+
+
+def cache_stats():
+    with _lock:
+        return {kind: dict(counts, version=_entries.get(kind, (None,))[0])
+                for kind, counts in _stats.items()}
+
+
+def _changed_kinds(session):
+    kinds = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        model_kinds = MODEL_KINDS.get(type(obj))
+        if not model_kinds:
+            continue
+        if obj in session.dirty:
+            state = inspect(obj)
+            changed = {a.key for a in state.attrs if a.history.has_changes()}
+            if not changed - IGNORED_CHANGES:
+                continue
+        kinds.update(model_kinds)
+    return kinds
+
+
+def bump_versions(connection, kinds):
+    """Advance the shared version of each kind, e.g. after writes that bypass the ORM."""
+    table = CacheVersion.__table__
+    for kind in kinds:
+        stmt = dialect_insert(table, connection.dialect.name).values(name=kind, version=1)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={'version': table.c.version + 1}
+        ))
+
+
+def mark_changed(session, kinds):
+    """Bump kinds in session's transaction and drop them locally once it commits."""
+    bump_versions(session.connection(), kinds)
+    session.info.setdefault('reference_changed', set()).update(kinds)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions(session, flush_context):
+    kinds = _changed_kinds(session)
+    if kinds:
+        mark_changed(session, kinds)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    global _checked_at
+    kinds = session.info.pop('reference_changed', None)
+    if kinds:
+        with _lock:
+            for kind in kinds:
+                _entries.pop(kind, None)
+            _checked_at = 0.0
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_after_rollback(session):
+    session.info.pop('reference_changed', None)
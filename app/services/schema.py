@@ -0,0 +1,48 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+from app import db
+from app.models.models import create_database_objects, set_work_order_number_default
+from app.services.ledger import ensure_partitions, partition_existing_table, record_detached_partitions
+
+
+# ============================================
+# Schema upgrades
+#
+# db.create_all() only creates missing tables. upgrade_schema() brings an
+# existing database up to the models: it adds missing columns, creates the
+# database functions the models rely on and any missing indexes, and moves
+# an unpartitioned inventory ledger into monthly partitions.
+# ============================================
+
+def upgrade_schema():
+    """Apply additive schema changes; returns a list of what was done."""
+    changes = []
+    with db.engine.begin() as connection:
+        create_database_objects(db.metadata, connection)
+        db.metadata.create_all(connection)
+        
+        if partition_existing_table(connection):
+            changes.append('partitioned inventory_transactions by month')
+        for name in ensure_partitions(connection):
+            changes.append(f'created partition {name}')
+        for month in record_detached_partitions(connection):
+            changes.append(f'recorded detached ledger month {month:%Y-%m}')
+        
+        inspector = inspect(connection)
+        for table in db.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                    connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+                    changes.append(f'added column {table.name}.{column.name}')
+        
+        set_work_order_number_default(db.metadata, connection)
+        
+        for table in db.metadata.sorted_tables:
+            existing = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+                    changes.append(f'created index {index.name}')
+    return changes
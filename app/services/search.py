@@ -0,0 +1,25 @@
+from app import db
+
+
+# ============================================
+# Substring search
+#
+# Matches are the same ILIKE '%term%' predicates the list views have always
+# used; on PostgreSQL they are served by the pg_trgm GIN indexes declared on
+# the models. Results keep the caller's ordering unless it asks for
+# relevance, which ranks by trigram similarity.
+# ============================================
+
+def apply_search(query, columns, term, rank=False):
+    """Filter query to rows where any column contains term.
+    
+    With rank, best matches come first on PostgreSQL; call it before adding
+    any ordering of your own, which then only breaks ties.
+    """
+    query = query.filter(db.or_(*[column.ilike(f'%{term}%') for column in columns]))
+    
+    if rank and db.session.get_bind().dialect.name == 'postgresql':
+        similarity = db.func.greatest(*[db.func.similarity(column, term) for column in columns])
+        query = query.order_by(similarity.desc())
+    
+    return query
@@ -0,0 +1,61 @@
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import Equipment, EquipmentCategory, Location, Part, User
+
+
+# ============================================
+# Bulk serialization
+#
+# Each to_dict() lazily loads its related rows one object at a time. The
+# helpers below load every related row for a page up front, one query per
+# table, and set them on the objects as already-loaded relationships, so
+# to_dict() issues no SELECT per row. Work order costs are stored columns
+# (see app.services.costs), so they need no extra query.
+# ============================================
+
+def _load(model, pk_column, ids):
+    """{primary key: object} for the given ids, in one query."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    return {getattr(obj, pk_column.key): obj for obj in model.query.filter(pk_column.in_(ids))}
+
+
+def _attach(objects, attribute, foreign_key, related):
+    for obj in objects:
+        set_committed_value(obj, attribute, related.get(getattr(obj, foreign_key)))
+
+
+def serialize_equipment(equipment):
+    equipment = list(equipment)
+    _attach(equipment, 'category', 'category_id', _load(
+        EquipmentCategory, EquipmentCategory.category_id, (e.category_id for e in equipment)))
+    _attach(equipment, 'location', 'location_id', _load(
+        Location, Location.location_id, (e.location_id for e in equipment)))
+    return [e.to_dict() for e in equipment]
+
+
+def serialize_schedules(schedules):
+    schedules = list(schedules)
+    _attach(schedules, 'equipment', 'equipment_id', _load(
+        Equipment, Equipment.equipment_id, (s.equipment_id for s in schedules)))
+    return [s.to_dict() for s in schedules]
+
+
+def serialize_inventory(inventory):
+    inventory = list(inventory)
+    _attach(inventory, 'part', 'part_id', _load(Part, Part.part_id, (i.part_id for i in inventory)))
+    _attach(inventory, 'location', 'location_id', _load(
+        Location, Location.location_id, (i.location_id for i in inventory)))
+    return [i.to_dict() for i in inventory]
+
+
+def serialize_work_orders(work_orders):
+    work_orders = list(work_orders)
+    equipment = _load(Equipment, Equipment.equipment_id, (wo.equipment_id for wo in work_orders))
+    _attach(work_orders, 'equipment', 'equipment_id', equipment)
+    _attach(equipment.values(), 'location', 'location_id', _load(
+        Location, Location.location_id, (e.location_id for e in equipment.values())))
+    users = _load(User, User.user_id, [wo.assigned_to for wo in work_orders] + [wo.created_by for wo in work_orders])
+    _attach(work_orders, 'assignee', 'assigned_to', users)
+    _attach(work_orders, 'creator', 'created_by', users)
+    return [wo.to_dict() for wo in work_orders]
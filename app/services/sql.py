@@ -0,0 +1,25 @@
+import json
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+
+def dialect_insert(table, dialect):
+    """INSERT construct supporting ON CONFLICT for the given dialect name."""
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    raise RuntimeError(f'ON CONFLICT inserts are not supported on {dialect}')
+
+
+def explain(query):
+    """Return the root plan node of query's EXPLAIN (FORMAT JSON) output."""
+    bind = db.session.get_bind()
+    compiled = query.statement.compile(dialect=bind.dialect,
+                                       compile_kwargs={'render_postcompile': True})
+    plan = db.session.connection().exec_driver_sql(
+        f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
@@ -0,0 +1,208 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from app import db
+from app.models import Equipment, MaintenanceSchedule, UsageReading, UsageRollup
+from app.services.kpis import KpiTotals, equipment_keys
+from app.services.sql import dialect_insert
+
+
+# ============================================
+# Usage-hour ingestion
+#
+# Connected machines report cumulative hour-meter readings in batches. Each
+# batch is handled in one transaction with a fixed number of statements,
+# whatever its size:
+#   1. append the readings (resent ones are dropped by the primary key),
+#   2. raise each machine's usage_hours to its latest meter value,
+#   3. widen the hourly and daily rollup rows the readings fall into and
+#      add the new hours to the maintenance KPI rollups,
+#   4. flag active schedules whose frequency_hours has now been run.
+# ============================================
+
+MAX_BATCH_SIZE = 5000
+PERIODS = ('hour', 'day')
+
+
+def parse_reading(item, now):
+    """Validate one reading; returns (equipment_id, read_at, meter_hours)."""
+    equipment_id = item.get('equipment_id')
+    if not isinstance(equipment_id, int):
+        raise ValueError('equipment_id must be an integer')
+    
+    try:
+        meter_hours = Decimal(str(item.get('meter_hours'))).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError('meter_hours must be a number')
+    if not meter_hours.is_finite() or meter_hours < 0:
+        raise ValueError('meter_hours must be a non-negative number')
+    
+    read_at = item.get('read_at')
+    if read_at is None:
+        read_at = now
+    else:
+        try:
+            read_at = datetime.fromisoformat(str(read_at).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError('read_at must be an ISO 8601 timestamp')
+        if read_at.tzinfo is not None:
+            read_at = read_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if read_at > now:
+            raise ValueError('read_at is in the future')
+    return equipment_id, read_at, meter_hours
+
+
+def _period_start(read_at, period):
+    if period == 'hour':
+        return read_at.replace(minute=0, second=0, microsecond=0)
+    return read_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_rows(readings):
+    ranges = {}
+    for equipment_id, read_at, meter_hours in readings:
+        for period in PERIODS:
+            key = (equipment_id, period, _period_start(read_at, period))
+            count, low, high = ranges.get(key, (0, meter_hours, meter_hours))
+            ranges[key] = (count + 1, min(low, meter_hours), max(high, meter_hours))
+    return [{'equipment_id': e, 'period': p, 'period_start': start,
+             'readings': count, 'min_hours': low, 'max_hours': high}
+            for (e, p, start), (count, low, high) in ranges.items()]
+
+
+def ingest_readings(items, now=None):
+    """Store a batch of meter readings and apply them; returns a summary dict."""
+    now = now or datetime.utcnow()
+    dialect = db.session.get_bind().dialect.name
+    rejected = []
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Each reading must be an object')
+            parsed.append((index, parse_reading(item, now)))
+        except ValueError as e:
+            rejected.append({'index': index, 'error': str(e)})
+    
+    # Lock the machines' rows so concurrent batches add their usage in turn
+    known = {}
+    ids = {reading[0] for _, reading in parsed}
+    if ids:
+        query = db.select(Equipment.equipment_id, Equipment.usage_hours).where(Equipment.equipment_id.in_(ids))
+        if dialect == 'postgresql':
+            query = query.with_for_update()
+        known = dict(db.session.execute(query).all())
+    readings = []
+    for index, reading in parsed:
+        if reading[0] in known:
+            readings.append(reading)
+        else:
+            rejected.append({'index': index, 'error': 'Equipment not found'})
+    
+    # A batch may repeat a reading; keep one per key
+    valid = len(readings)
+    readings = list({(e, t): (e, t, h) for e, t, h in readings}.values())
+    stored = []
+    if readings:
+        table = UsageReading.__table__
+        stored = db.session.execute(
+            dialect_insert(table, dialect)
+            .values([{'equipment_id': e, 'read_at': t, 'meter_hours': h} for e, t, h in readings])
+            .on_conflict_do_nothing()
+            .returning(table.c.equipment_id, table.c.read_at, table.c.meter_hours)
+        ).all()
+    
+    flagged = []
+    if stored:
+        latest = defaultdict(Decimal)
+        latest_at = {}
+        for equipment_id, read_at, meter_hours in stored:
+            if meter_hours >= latest[equipment_id]:
+                latest[equipment_id] = meter_hours
+                latest_at[equipment_id] = read_at
+        
+        # Meters only count up, so a late or out-of-order reading never lowers
+        # the total. Rows that move get a new version, so an edit form opened
+        # before the reading cannot write the old usage_hours back.
+        meters = db.values(
+            db.column('equipment_id', db.Integer), db.column('meter_hours', db.Numeric(10, 2)),
+            name='meters'
+        ).data(list(latest.items()))
+        db.session.execute(
+            db.update(Equipment)
+            .where(Equipment.equipment_id == meters.c.equipment_id,
+                   meters.c.meter_hours > db.func.coalesce(Equipment.usage_hours, 0))
+            .values(usage_hours=meters.c.meter_hours,
+                    version=Equipment.version + 1,
+                    updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        
+        rollups = UsageRollup.__table__
+        stmt = dialect_insert(rollups, dialect).values(_rollup_rows(stored))
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[rollups.c.equipment_id, rollups.c.period, rollups.c.period_start],
+            set_={
+                'readings': rollups.c.readings + stmt.excluded.readings,
+                'min_hours': db.func.least(rollups.c.min_hours, stmt.excluded.min_hours),
+                'max_hours': db.func.greatest(rollups.c.max_hours, stmt.excluded.max_hours),
+            }
+        ))
+        
+        # Metered hours count towards MTBF on the day of the latest reading
+        connection = db.session.connection()
+        keys = equipment_keys(connection, list(latest))
+        totals = KpiTotals()
+        for equipment_id, meter_hours in latest.items():
+            added = meter_hours - (known[equipment_id] or 0)
+            if added > 0:
+                totals.add(keys[equipment_id], latest_at[equipment_id].date(), {'usage_hours': added})
+        totals.write(connection)
+        
+        usage = db.select(Equipment.usage_hours).where(
+            Equipment.equipment_id == MaintenanceSchedule.equipment_id
+        ).scalar_subquery()
+        flagged = db.session.execute(
+            db.update(MaintenanceSchedule)
+            .where(
+                MaintenanceSchedule.equipment_id.in_(list(latest)),
+                MaintenanceSchedule.is_active == True,
+                MaintenanceSchedule.usage_due_at.is_(None),
+                MaintenanceSchedule.frequency_hours.isnot(None),
+                usage - db.func.coalesce(MaintenanceSchedule.last_usage_hours, 0)
+                >= MaintenanceSchedule.frequency_hours
+            )
+            .values(usage_due_at=now)
+            .returning(MaintenanceSchedule.schedule_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+    
+    db.session.commit()
+    rejected.sort(key=lambda r: r['index'])
+    return {
+        'received': len(items),
+        'stored': len(stored),
+        'repeated_in_batch': valid - len(readings),
+        'already_stored': len(readings) - len(stored),
+        'rejected': rejected,
+        'flagged_schedules': flagged
+    }
+
+
+def usage_rollups(equipment_id, period='day', start=None, end=None):
+    """Rollup rows for one machine, oldest first."""
+    query = UsageRollup.query.filter_by(equipment_id=equipment_id, period=period)
+    if start:
+        query = query.filter(UsageRollup.period_start >= start)
+    if end:
+        query = query.filter(UsageRollup.period_start < end)
+    return query.order_by(UsageRollup.period_start).all()
+
+
+def prune_readings(before):
+    """Delete raw readings older than before; rollups are kept. Returns the row count."""
+    deleted = db.session.execute(
+        db.delete(UsageReading).where(UsageReading.read_at < before)
+    ).rowcount
+    db.session.commit()
+    return deleted
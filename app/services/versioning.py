@@ -0,0 +1,20 @@
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+# ============================================
+# Optimistic locking
+#
+# Versioned models declare version as their version_id_col, so every ORM
+# UPDATE is issued as UPDATE ... WHERE id = ? AND version = ? and raises
+# StaleDataError when another writer got there first. The error handlers in
+# app/__init__.py and the API blueprint turn that into a flash or a 409.
+# ============================================
+
+CONFLICT_MESSAGE = 'This record was modified by another user. Please review and try again.'
+
+
+def expect_version(obj, version):
+    """Make the next UPDATE of obj conditional on the version the client saw."""
+    if version is not None:
+        set_committed_value(obj, 'version', version)
+
@@ -0,0 +1,6 @@
+import os
+from app import create_app
+from app.asgi import create_asgi_app
+
+# uvicorn asgi:app - polled API reads run async, everything else in Flask
+app = create_asgi_app(create_app(os.environ.get('FLASK_ENV', 'production')))
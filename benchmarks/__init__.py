@@ -0,0 +1,16 @@
+import os
+
+
+# ============================================
+# Benchmarks
+#
+# Run from the repository root, e.g. python -m benchmarks.search. They add
+# synthetic rows and scratch accounts, so they only run against the database
+# in BENCH_DATABASE_URL, never the one the application uses.
+# ============================================
+
+def create_bench_app():
+    if not os.environ.get('BENCH_DATABASE_URL'):
+        raise SystemExit('Set BENCH_DATABASE_URL to a scratch database to run benchmarks.')
+    from app import create_app
+    return create_app('benchmark')
@@ -0,0 +1,363 @@
+import csv
+import io
+import random
+import re
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+import click
+
+from app import bcrypt, db
+from app.models import (Equipment, EquipmentCategory, InventoryTransaction, Location,
+                        MaintenanceSchedule, Part, PartsInventory, User, WorkOrder)
+from app.services import kpis, ledger, reference
+from app.services.dashboard import invalidate_dashboard_stats
+from benchmarks import create_bench_app
+
+
+# ============================================
+# Synthetic data
+#
+# generate() loads a referentially consistent data set of any size:
+# locations with staff, a parts catalogue stocked per location, equipment
+# with maintenance schedules, years of work orders and inventory
+# transactions. Rows are produced lazily and written with COPY on
+# PostgreSQL (multi-row INSERTs elsewhere), so memory stays bounded by the
+# id lists of the parent tables. Every generated key carries a prefix, so a
+# second run with another prefix adds to the first.
+# ============================================
+
+CATEGORIES = [
+    ('Cardio', 'Treadmills, ellipticals, bikes'),
+    ('Strength Machines', 'Cable machines, leg press'),
+    ('Free Weights', 'Dumbbells, barbells, plates'),
+    ('Benches & Racks', 'Benches, power racks'),
+    ('Functional Training', 'Kettlebells, battle ropes'),
+    ('Stretching & Recovery', 'Foam rollers, mats'),
+]
+
+# (category, name, model, manufacturer, price, hours per year or None)
+EQUIPMENT_MODELS = [
+    ('Cardio', 'Treadmill Pro 5000', 'TP-5000', 'Life Fitness', 4500, 2500),
+    ('Cardio', 'Elliptical E700', 'E700', 'Precor', 3800, 2000),
+    ('Cardio', 'Upright Bike U3', 'U3', 'Matrix', 2100, 1800),
+    ('Cardio', 'Rowing Machine RX', 'RX-1', 'Concept2', 1100, 1200),
+    ('Strength Machines', 'Cable Crossover Machine', 'CCM-200', 'Hammer Strength', 6500, None),
+    ('Strength Machines', 'Leg Press', 'LP-450', 'Cybex', 5200, None),
+    ('Strength Machines', 'Lat Pulldown', 'LPD-90', 'Life Fitness', 3900, None),
+    ('Free Weights', 'Dumbbell Set 5-100lb', 'PRO-DB', 'Rogue Fitness', 3200, None),
+    ('Benches & Racks', 'Power Rack', 'PR-4000', 'Rogue Fitness', 1800, None),
+    ('Benches & Racks', 'Adjustable Bench', 'AB-300', 'Rep Fitness', 450, None),
+    ('Functional Training', 'Kettlebell Rack', 'KR-12', 'Rogue Fitness', 900, None),
+    ('Stretching & Recovery', 'Stretch Station', 'SS-2', 'Precor', 1300, None),
+]
+
+PART_KINDS = [
+    ('Belts', 'Drive Belt', 45), ('Motors', 'Drive Motor', 350), ('Cables', 'Cable Assembly', 65),
+    ('Hardware', 'Pulley Wheel', 28), ('Pads', 'Seat Pad', 55), ('Supplies', 'Lubricant', 15),
+    ('Electronics', 'Console Board', 220), ('Hardware', 'Bearing Kit', 35), ('Pads', 'Grip Set', 22),
+]
+
+TASKS = ['Belt Inspection', 'Lubrication', 'Cable Inspection', 'Safety Check', 'Motor Service',
+         'Upholstery Check', 'Calibration', 'Deep Clean']
+FAULTS = ['Making Noise', 'Console Not Responding', 'Cable Frayed', 'Belt Slipping',
+          'Seat Pad Torn', 'Wobbling', 'Resistance Stuck', 'Display Flickering']
+CITIES = [('Boston', 'MA'), ('Cambridge', 'MA'), ('Providence', 'RI'), ('Hartford', 'CT'),
+          ('Portland', 'ME'), ('Albany', 'NY'), ('Burlington', 'VT'), ('Manchester', 'NH')]
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+LAST_NAMES = ['Smith', 'Lee', 'Garcia', 'Brown', 'Nguyen', 'Patel', 'Kim', 'Lopez', 'Clark', 'Walker']
+
+DEFAULT_SCALE = {
+    'locations': 20,
+    'staff_per_location': 4,
+    'parts': 500,
+    'parts_per_location': 50,
+    'equipment': 2000,
+    'work_orders': 50000,
+    'transactions': 100000,
+    'years': 3,
+}
+
+LABOR_RATE = 45
+CHUNK_SIZE = 10000
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_load(connection, table, columns, rows, chunk_size=CHUNK_SIZE):
+    """Write an iterable of row tuples; returns the number of rows written."""
+    count = 0
+    if connection.dialect.name == 'postgresql':
+        cursor = connection.connection.cursor()
+        copy = f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+        for chunk in _chunks(rows, chunk_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(chunk)
+            buffer.seek(0)
+            cursor.copy_expert(copy, buffer)
+            count += len(chunk)
+        cursor.close()
+    else:
+        for chunk in _chunks(rows, chunk_size):
+            connection.execute(table.insert(), [dict(zip(columns, row)) for row in chunk])
+            count += len(chunk)
+    return count
+
+
+class _Generator:
+    def __init__(self, scale, prefix, password, seed, log):
+        self.scale = scale
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.start = self.now - timedelta(days=365 * scale['years'])
+        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.connection = db.session.connection()
+        self.log = log
+    
+    def _load(self, model, columns, rows):
+        count = bulk_load(self.connection, model.__table__, columns, rows)
+        self.log(f'{model.__tablename__}: {count} rows')
+        return count
+    
+    def _moment(self, start=None):
+        start = start or self.start
+        return start + timedelta(seconds=self.rng.uniform(0, (self.now - start).total_seconds()))
+    
+    def categories(self):
+        existing = dict(db.session.execute(db.select(EquipmentCategory.name, EquipmentCategory.category_id)))
+        missing = [(name, description) for name, description in CATEGORIES if name not in existing]
+        if missing:
+            self._load(EquipmentCategory, ['name', 'description'], missing)
+            existing = dict(db.session.execute(db.select(EquipmentCategory.name, EquipmentCategory.category_id)))
+        self.category_ids = existing
+    
+    def locations(self):
+        rng = self.rng
+        
+        def rows():
+            for n in range(1, self.scale['locations'] + 1):
+                city, state = rng.choice(CITIES)
+                yield (f'{self.prefix} {city} #{n}', f'{rng.randint(1, 9999)} Main St', city, state,
+                       f'{rng.randint(1000, 99999):05d}', f'555-{rng.randint(0, 9999):04d}', True,
+                       self.start, self.start)
+        
+        self._load(Location, ['name', 'address', 'city', 'state', 'postal_code', 'phone', 'is_active',
+                              'created_at', 'updated_at'], rows())
+        self.location_ids = list(db.session.execute(
+            db.select(Location.location_id).where(Location.name.startswith(f'{self.prefix} ', autoescape=True))
+            .order_by(Location.location_id)
+        ).scalars())
+    
+    def users(self):
+        rng = self.rng
+        per_location = max(self.scale['staff_per_location'], 1)
+        
+        def rows():
+            for location_id in self.location_ids:
+                for n in range(per_location):
+                    username = f'{self.prefix.lower()}_{location_id}_{n}'
+                    role = 'manager' if n == 0 else 'technician'
+                    yield (username, f'{username}@example.invalid', self.password_hash,
+                           rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), role, location_id, True,
+                           self.start, self.start)
+        
+        self._load(User, ['username', 'email', 'password_hash', 'first_name', 'last_name', 'role',
+                          'location_id', 'is_active', 'created_at', 'updated_at'], rows())
+        self.staff = {}
+        for user_id, location_id, role in db.session.execute(
+            db.select(User.user_id, User.location_id, User.role)
+            .where(User.username.startswith(f'{self.prefix.lower()}_', autoescape=True))
+        ):
+            managers, technicians = self.staff.setdefault(location_id, ([], []))
+            (managers if role == 'manager' else technicians).append(user_id)
+    
+    def parts(self):
+        rng = self.rng
+        
+        def rows():
+            for n in range(1, self.scale['parts'] + 1):
+                category, kind, cost = rng.choice(PART_KINDS)
+                _, name, model, _, _, _ = rng.choice(EQUIPMENT_MODELS)
+                yield (f'{self.prefix}-P{n:07d}', f'{kind} for {model}', f'{kind} for {name}', category,
+                       round(cost * rng.uniform(0.7, 1.3), 2), True, self.start, self.start)
+        
+        self._load(Part, ['part_number', 'name', 'description', 'category', 'unit_cost', 'is_active',
+                          'created_at', 'updated_at'], rows())
+        self.part_costs = dict(db.session.execute(
+            db.select(Part.part_id, Part.unit_cost).where(Part.part_number.startswith(f'{self.prefix}-P'))
+        ).all())
+    
+    def inventory(self):
+        rng = self.rng
+        part_ids = list(self.part_costs)
+        per_location = min(self.scale['parts_per_location'], len(part_ids))
+        
+        def rows():
+            for location_id in self.location_ids:
+                for part_id in rng.sample(part_ids, per_location):
+                    reorder_point = rng.randint(1, 6)
+                    yield (part_id, location_id, rng.randint(0, 40), 0, reorder_point,
+                           reorder_point * 2, f'{rng.choice("ABCD")}-{rng.randint(1, 9)}-{rng.randint(1, 9)}',
+                           1, self.now)
+        
+        self._load(PartsInventory, ['part_id', 'location_id', 'quantity_on_hand', 'quantity_reserved',
+                                    'reorder_point', 'reorder_quantity', 'bin_location', 'version',
+                                    'updated_at'], rows())
+        self.inventory_rows = db.session.execute(
+            db.select(PartsInventory.inventory_id, PartsInventory.part_id, PartsInventory.location_id)
+            .where(PartsInventory.location_id.in_(self.location_ids))
+        ).all()
+    
+    def equipment(self):
+        rng = self.rng
+        
+        def rows():
+            for n in range(1, self.scale['equipment'] + 1):
+                category, name, model, manufacturer, price, hours_per_year = rng.choice(EQUIPMENT_MODELS)
+                purchased = self._moment(self.start - timedelta(days=365 * 2))
+                age_years = (self.now - purchased).days / 365
+                status = rng.choices(['active', 'under_repair', 'inactive', 'retired'], [90, 4, 3, 3])[0]
+                usage = round(hours_per_year * age_years * rng.uniform(0.6, 1.2), 2) if hours_per_year else 0
+                yield (name, model, f'{self.prefix}-SN{n:09d}', manufacturer, self.category_ids[category],
+                       rng.choice(self.location_ids), purchased.date(), round(price * rng.uniform(0.9, 1.1), 2),
+                       (purchased + timedelta(days=365 * 3)).date(), status, usage, 1, purchased, purchased)
+        
+        self._load(Equipment, ['name', 'model', 'serial_number', 'manufacturer', 'category_id', 'location_id',
+                               'purchase_date', 'purchase_price', 'warranty_expiration', 'status',
+                               'usage_hours', 'version', 'created_at', 'updated_at'], rows())
+        self.equipment_rows = db.session.execute(
+            db.select(Equipment.equipment_id, Equipment.location_id, Equipment.name, Equipment.usage_hours)
+            .where(Equipment.serial_number.startswith(f'{self.prefix}-SN'))
+        ).all()
+    
+    def schedules(self):
+        rng = self.rng
+        
+        def rows():
+            for equipment_id, _, _, usage in self.equipment_rows:
+                for task in rng.sample(TASKS, rng.randint(1, 2)):
+                    frequency = rng.choice([7, 14, 30, 60, 90, 180])
+                    hours = rng.choice([None, 250, 500]) if usage else None
+                    last = self.now - timedelta(days=rng.randint(0, frequency))
+                    yield (equipment_id, task, f'{task} per manufacturer guidance', frequency, hours,
+                           rng.choice(['low', 'medium', 'high']), True, last,
+                           round(max(float(usage or 0) - rng.uniform(0, hours or 0), 0), 2),
+                           last + timedelta(days=frequency), 1, self.start, last)
+        
+        self._load(MaintenanceSchedule, ['equipment_id', 'task_name', 'description', 'frequency_days',
+                                         'frequency_hours', 'priority', 'is_active', 'last_performed',
+                                         'last_usage_hours', 'next_due', 'version', 'created_at',
+                                         'updated_at'], rows())
+    
+    def work_orders(self):
+        rng = self.rng
+        recent = self.now - timedelta(days=30)
+        
+        def rows():
+            for n in range(1, self.scale['work_orders'] + 1):
+                equipment_id, location_id, name, _ = rng.choice(self.equipment_rows)
+                managers, technicians = self.staff[location_id]
+                created = self._moment()
+                type = rng.choices(['preventive', 'corrective', 'emergency'], [60, 32, 8])[0]
+                if created < recent:
+                    status = rng.choices(['completed', 'cancelled', 'open'], [93, 5, 2])[0]
+                else:
+                    status = rng.choices(['completed', 'in_progress', 'open', 'on_hold'], [50, 20, 25, 5])[0]
+                title = f'{rng.choice(TASKS)} - {name}' if type == 'preventive' else f'{name} {rng.choice(FAULTS)}'
+                started = completed = labor_hours = labor_cost = None
+                if status in ('in_progress', 'completed', 'on_hold'):
+                    started = min(created + timedelta(hours=rng.uniform(0.5, 72)), self.now)
+                if status == 'completed':
+                    completed = min(started + timedelta(hours=rng.uniform(0.25, 8)), self.now)
+                    labor_hours = round(rng.uniform(0.25, 6), 2)
+                    labor_cost = round(labor_hours * LABOR_RATE, 2)
+                yield (equipment_id, f'{self.prefix}-{n:010d}', title, None, type, status,
+                       rng.choice(['low', 'medium', 'medium', 'high', 'critical']),
+                       rng.choice(technicians) if technicians and status != 'open' else None,
+                       rng.choice(managers), created.date() if type == 'preventive' else None,
+                       started, completed, labor_hours, labor_cost, 0, labor_cost or 0, 1,
+                       created, completed or started or created)
+        
+        self._load(WorkOrder, ['equipment_id', 'work_order_number', 'title', 'description', 'type', 'status',
+                               'priority', 'assigned_to', 'created_by', 'scheduled_date', 'started_at',
+                               'completed_at', 'labor_hours', 'labor_cost', 'parts_cost', 'total_cost',
+                               'version', 'created_at', 'updated_at'], rows())
+    
+    def transactions(self):
+        rng = self.rng
+        if not self.inventory_rows:
+            return
+        ledger.ensure_partitions(self.connection, since=self.start)
+        
+        def rows():
+            for _ in range(self.scale['transactions']):
+                inventory_id, part_id, location_id = rng.choice(self.inventory_rows)
+                _, technicians = self.staff[location_id]
+                if rng.random() < 0.8:
+                    type, quantity = 'issue', -rng.randint(1, 3)
+                else:
+                    type, quantity = 'receipt', rng.randint(5, 20)
+                yield (inventory_id, type, quantity, self.part_costs[part_id],
+                       rng.choice(technicians) if technicians else None, self._moment())
+        
+        self._load(InventoryTransaction, ['inventory_id', 'transaction_type', 'quantity', 'unit_cost',
+                                          'performed_by', 'created_at'], rows())
+
+
+def generate(scale=None, prefix='GEN', password='password123', seed=None, log=print):
+    """Load a synthetic data set; scale overrides keys of DEFAULT_SCALE."""
+    if not re.fullmatch(r'[A-Za-z][A-Za-z0-9]{0,5}', prefix):
+        raise ValueError('prefix must be 1-6 letters or digits, starting with a letter')
+    if db.session.execute(db.select(Part.part_id).where(Part.part_number.startswith(f'{prefix}-P')).limit(1)).first():
+        raise ValueError(f'Data with prefix {prefix} already exists; choose another prefix')
+    
+    generator = _Generator(dict(DEFAULT_SCALE, **(scale or {})), prefix, password, seed, log)
+    for step in ('categories', 'locations', 'users', 'parts', 'inventory', 'equipment', 'schedules',
+                 'work_orders', 'transactions'):
+        getattr(generator, step)()
+    
+    # COPY bypasses the session hooks that keep caches in step
+    reference.mark_changed(db.session, ['locations', 'categories', 'users', 'parts'])
+    db.session.commit()
+    invalidate_dashboard_stats()
+    log(f'maintenance_kpis: {kpis.rebuild_kpis()} rows')
+    
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(db.text('ANALYZE'))
+
+
+@click.command()
+@click.option('--locations', default=20, help='Locations to create.')
+@click.option('--staff-per-location', default=4, help='Users per location (one manager, the rest technicians).')
+@click.option('--parts', default=500, help='Parts in the catalogue.')
+@click.option('--parts-per-location', default=50, help='Parts stocked at each location.')
+@click.option('--equipment', default=2000, help='Pieces of equipment.')
+@click.option('--work-orders', default=50000, help='Work orders.')
+@click.option('--transactions', default=100000, help='Inventory transactions.')
+@click.option('--years', default=3, help='Years of history to spread work orders and transactions over.')
+@click.option('--prefix', default='GEN', help='Prefix for generated keys; use a new one for each run.')
+@click.option('--password', default='password123', help='Password for every generated user.')
+@click.option('--seed', type=int, default=None, help='Random seed for a repeatable data set.')
+def main(prefix, password, seed, **scale):
+    """Bulk-load a synthetic, referentially consistent data set of any size."""
+    started = time.perf_counter()
+    with create_bench_app().app_context():
+        try:
+            generate(scale, prefix=prefix, password=password, seed=seed)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    print(f'Done in {time.perf_counter() - started:.1f}s. Users log in as {prefix.lower()}_<location id>_<n> / {password}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+
+import click
+
+from app import db
+from app.models import Equipment, MaintenanceSchedule, Part, PartsInventory, WorkOrder
+from benchmarks import create_bench_app
+
+
+# ============================================
+# Route load test
+#
+# Concurrent authenticated clients request every GET route of every
+# blueprint, and with writes=True a few representative API writes, for a
+# fixed duration. Clients either run in-process through the Flask test
+# client or go over HTTP to a running server (base_url). Path arguments are
+# filled from ids sampled from the database. The report gives requests,
+# errors, throughput and p50/p95/p99 latency per route.
+# ============================================
+
+# The event stream never finishes; it would hold a client for STREAM_MAX_SECONDS
+SKIPPED_ENDPOINTS = {'static', 'auth.login', 'auth.logout', 'api.export_history', 'api.stream_events'}
+
+# Path arguments and the columns their sample ids come from
+ARGUMENT_SOURCES = {
+    'equipment_id': Equipment.equipment_id,
+    'work_order_id': WorkOrder.work_order_id,
+    'schedule_id': MaintenanceSchedule.schedule_id,
+    'inventory_id': PartsInventory.inventory_id,
+    'part_id': Part.part_id,
+}
+SAMPLE_SIZE = 200
+
+# Query strings for routes that require one
+QUERY_STRINGS = {
+    'api.get_inventory_balance': lambda rng: f'as_of={(datetime.utcnow() - timedelta(days=rng.randint(1, 60))):%Y-%m-%d}',
+}
+
+
+def _write_targets(samples):
+    def usage(rng):
+        equipment_id = rng.choice(samples['equipment_id'])
+        return {'readings': [{'equipment_id': equipment_id, 'meter_hours': rng.uniform(0, 50000)}]}
+    
+    def adjust(rng):
+        return {'adjustments': [{'inventory_id': rng.choice(samples['inventory_id']),
+                                 'quantity': 1, 'type': 'receipt'}]}
+    
+    def create(rng):
+        return {'equipment_id': rng.choice(samples['equipment_id']), 'title': 'Load test',
+                'type': 'corrective', 'priority': 'low'}
+    
+    return [
+        ('POST /api/usage/readings', 'POST', '/api/usage/readings', usage),
+        ('POST /api/inventory/adjust-batch', 'POST', '/api/inventory/adjust-batch', adjust),
+        ('POST /api/work-orders', 'POST', '/api/work-orders', create),
+    ]
+
+
+class _InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+    
+    def request(self, method, path, payload=None, form=None):
+        response = self.client.open(path, method=method, json=payload, data=form)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+    
+    def request(self, method, path, payload=None, form=None):
+        headers = {}
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def _samples():
+    samples = {}
+    for name, column in ARGUMENT_SOURCES.items():
+        samples[name] = list(db.session.execute(
+            db.select(column).order_by(column.desc()).limit(SAMPLE_SIZE)
+        ).scalars())
+    return samples
+
+
+def _read_targets(app, samples):
+    targets = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint in SKIPPED_ENDPOINTS:
+            continue
+        if any(not samples.get(argument) for argument in rule.arguments):
+            continue
+        targets.append((f'GET {rule.rule}', rule.endpoint, sorted(rule.arguments)))
+    return sorted(targets)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)]
+
+
+def run_load_test(app, username, password, concurrency=8, duration=30, base_url=None,
+                  writes=False, seed=None):
+    """Drive the routes concurrently; returns (elapsed seconds, {label: stats})."""
+    samples = _samples()
+    reads = _read_targets(app, samples)
+    write_targets = _write_targets(samples) if writes and samples['equipment_id'] and samples['inventory_id'] else []
+    adapter = app.url_map.bind('localhost')
+    results = [[] for _ in range(concurrency)]
+    failures = []
+    
+    def worker(index):
+        rng = random.Random(None if seed is None else seed + index)
+        client = _HttpClient(base_url) if base_url else _InProcessClient(app)
+        status = client.request('POST', '/login', form={'username': username, 'password': password})
+        if status != 302:
+            failures.append(f'login as {username} failed with status {status}')
+            return
+        
+        jobs = [('read', target) for target in reads] + [('write', target) for target in write_targets]
+        records = results[index]
+        while time.monotonic() < deadline:
+            rng.shuffle(jobs)
+            for kind, target in jobs:
+                if time.monotonic() >= deadline:
+                    break
+                if kind == 'read':
+                    label, endpoint, arguments = target
+                    path = adapter.build(endpoint, {a: rng.choice(samples[a]) for a in arguments})
+                    if endpoint in QUERY_STRINGS:
+                        path = f'{path}?{QUERY_STRINGS[endpoint](rng)}'
+                    method, payload = 'GET', None
+                else:
+                    label, method, path, build_payload = target
+                    payload = build_payload(rng)
+                started = time.perf_counter()
+                status = client.request(method, path, payload)
+                records.append((label, (time.perf_counter() - started) * 1000, status))
+    
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    deadline = started + duration
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    if failures:
+        raise RuntimeError(failures[0])
+    
+    by_label = {}
+    for records in results:
+        for label, ms, status in records:
+            by_label.setdefault(label, ([], []))
+            by_label[label][0].append(ms)
+            if status >= 400:
+                by_label[label][1].append(status)
+    
+    stats = {}
+    for label, (latencies, errors) in by_label.items():
+        latencies.sort()
+        stats[label] = {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'error_statuses': sorted(set(errors)),
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        }
+    return elapsed, stats
+
+
+@click.command()
+@click.option('--user', 'username', default='admin', help='Account the clients log in as.')
+@click.option('--password', default='admin123')
+@click.option('--concurrency', default=8, help='Concurrent clients.')
+@click.option('--duration', default=30, help='Seconds to run.')
+@click.option('--base-url', default=None,
+              help='Test a running server (e.g. http://localhost:8000) on the benchmark database instead of in-process.')
+@click.option('--writes', is_flag=True, help='Also send usage readings, stock receipts and new work orders.')
+@click.option('--seed', type=int, default=None)
+def main(username, password, concurrency, duration, base_url, writes, seed):
+    """Drive every route with concurrent authenticated clients and report latency per route."""
+    app = create_bench_app()
+    with app.app_context():
+        try:
+            elapsed, stats = run_load_test(app, username, password, concurrency, duration,
+                                           base_url=base_url, writes=writes, seed=seed)
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+    
+    print(f'{concurrency} clients for {elapsed:.1f}s against {base_url or "the in-process app"}')
+    print(f'{"route":<48}{"reqs":>7}{"errs":>6}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for label, s in sorted(stats.items(), key=lambda item: -item[1]['p95']):
+        errors = f'{s["errors"]}' + ('*' if s['error_statuses'] else '')
+        print(f'{label:<48}{s["requests"]:>7}{errors:>6}{s["rps"]:>8.1f}'
+              f'{s["p50"]:>9.1f}{s["p95"]:>9.1f}{s["p99"]:>9.1f}')
+    total = sum(s['requests'] for s in stats.values())
+    print(f'{"total":<48}{total:>7}{sum(s["errors"] for s in stats.values()):>6}{total / elapsed:>8.1f}')
+    for label, s in stats.items():
+        if s['error_statuses']:
+            print(f'* {label}: status {", ".join(map(str, s["error_statuses"]))}')
+
+
+if __name__ == '__main__':
+    main()
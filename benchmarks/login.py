@@ -0,0 +1,83 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from app import db
+from app.models import User
+from app.services import passwords
+from benchmarks import create_bench_app
+
+
+USERNAME, PASSWORD = 'bench-login', 'bench-login-password'
+
+
+def login(client):
+    return client.post('/login', data={'username': USERNAME, 'password': PASSWORD}).status_code
+
+
+def probe(app, stop, seconds=None):
+    """Dashboard request latencies (ms) until stop is set, or for seconds."""
+    client = app.test_client()
+    login(client)
+    samples = []
+    deadline = time.perf_counter() + (seconds or 0)
+    while not (stop.is_set() if seconds is None else time.perf_counter() > deadline):
+        start = time.perf_counter()
+        client.get('/api/dashboard/stats')
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def burst(app, workers, logins, concurrency):
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    passwords.shutdown_pool()
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as pool:
+        probe_future = pool.submit(probe, app, stop)
+        start = time.perf_counter()
+        codes = list(pool.map(lambda _: login(app.test_client()), range(logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        return probe_future.result(), elapsed, codes
+
+
+def report(label, logins, samples, elapsed=None, codes=()):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if samples else float('nan')
+    rate = f'{logins / elapsed:>8.1f}' if elapsed else f'{"-":>8}'
+    busy = sum(1 for c in codes if c == 503)
+    print(f'{label:<20}{rate}{busy:>6}{statistics.median(samples):>10.1f}{p95:>10.1f}')
+
+
+@click.command()
+@click.option('--logins', default=64, help='Logins in the burst.')
+@click.option('--concurrency', default=16, help='Logins in flight at once.')
+def main(logins, concurrency):
+    """Time dashboard requests while a burst of logins runs, with and without the hashing pool limit."""
+    app = create_bench_app()
+    with app.app_context():
+        user = User(username=USERNAME, email='bench-login@example.invalid',
+                    first_name='Bench', last_name='Login', role='technician')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        
+        configured = app.config['PASSWORD_HASH_WORKERS']
+        try:
+            print(f'{logins} logins, {concurrency} concurrent, bcrypt cost {app.config["BCRYPT_LOG_ROUNDS"]}')
+            print(f'{"run":<20}{"login/s":>8}{"503s":>6}{"p50 ms":>10}{"p95 ms":>10}')
+            report('idle', logins, probe(app, None, seconds=2))
+            report(f'pool={configured}', logins, *burst(app, configured, logins, concurrency))
+            report(f'unbounded={concurrency}', logins, *burst(app, concurrency, logins, concurrency))
+        finally:
+            app.config['PASSWORD_HASH_WORKERS'] = configured
+            passwords.shutdown_pool()
+            db.session.delete(db.session.merge(user))
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import random
+import time
+
+import click
+from sqlalchemy import insert
+
+from app import db
+from app.models import Part
+from app.services.search import apply_search
+from benchmarks import create_bench_app
+
+
+WORDS = ['Belt', 'Motor', 'Cable', 'Pulley', 'Pad', 'Bearing', 'Console', 'Deck',
+         'Roller', 'Spring', 'Sensor', 'Handle', 'Pedal', 'Seat', 'Grip', 'Flywheel']
+CATEGORIES = ['Belts', 'Motors', 'Cables', 'Hardware', 'Pads', 'Electronics', 'Supplies']
+TERMS = ['belt', 'mot', 'BENCH-0004', 'sensor 12', 'flywheel pad', 'zzz']
+
+
+def timed(term):
+    start = time.perf_counter()
+    found = apply_search(Part.query, [Part.name, Part.part_number, Part.category], term) \
+        .order_by(Part.name).limit(20).all()
+    return len(found), (time.perf_counter() - start) * 1000
+
+
+@click.command()
+@click.option('--parts', default=100000, help='Size of the synthetic parts catalogue.')
+def main(parts):
+    """Time part search against a synthetic catalogue, with and without the trigram indexes."""
+    rows = [{
+        'part_number': f'BENCH-{i:07d}',
+        'name': f'{random.choice(WORDS)} {random.choice(WORDS)} {i % 997}',
+        'category': random.choice(CATEGORIES),
+        'unit_cost': round(random.uniform(1, 500), 2)
+    } for i in range(parts)]
+    
+    with create_bench_app().app_context():
+        is_postgres = db.engine.dialect.name == 'postgresql'
+        # The catalogue lives only in this transaction, so reruns start clean
+        try:
+            db.session.execute(insert(Part), rows)
+            if is_postgres:
+                db.session.execute(db.text('ANALYZE parts'))
+            
+            print(f'{parts} synthetic parts')
+            print(f'{"term":<16}{"rows":>6}{"indexed ms":>12}{"seq scan ms":>13}')
+            for term in TERMS:
+                count, indexed_ms = timed(term)
+                seq_ms = float('nan')
+                if is_postgres:
+                    db.session.execute(db.text('SET LOCAL enable_bitmapscan = off'))
+                    db.session.execute(db.text('SET LOCAL enable_indexscan = off'))
+                    seq_ms = timed(term)[1]
+                    db.session.execute(db.text('SET LOCAL enable_bitmapscan = on'))
+                    db.session.execute(db.text('SET LOCAL enable_indexscan = on'))
+                print(f'{term:<16}{count:>6}{indexed_ms:>12.1f}{seq_ms:>13.1f}')
+        finally:
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
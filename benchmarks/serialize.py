@@ -0,0 +1,54 @@
+import statistics
+import time
+
+import click
+
+from app import db
+from app.models import Equipment, WorkOrder
+from app.services import projection
+from app.services.serializers import serialize_equipment, serialize_work_orders
+from benchmarks import create_bench_app
+
+
+def timed(build, repeat):
+    """Median milliseconds of build() over repeat runs, and the size of its output."""
+    samples = []
+    for _ in range(repeat):
+        # Every request starts with an empty identity map
+        db.session.expunge_all()
+        start = time.perf_counter()
+        body = build()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(body)
+
+
+@click.command()
+@click.option('--rows', default=100, help='Rows per page.')
+@click.option('--repeat', default=50, help='Pages timed per path.')
+def main(rows, repeat):
+    """Time API page serialization: to_dict() on entities versus projected columns (?fields=)."""
+    app = create_bench_app()
+    with app.app_context():
+        resources = [
+            ('equipment', Equipment.query.order_by(Equipment.equipment_id), serialize_equipment,
+             projection.EQUIPMENT, 'equipment_id,name,status,location_name,usage_hours'),
+            ('work orders', WorkOrder.query.order_by(WorkOrder.created_at.desc()), serialize_work_orders,
+             projection.WORK_ORDERS, 'work_order_id,title,status,equipment_name,total_cost'),
+        ]
+        
+        print(f'{rows} rows per page, median of {repeat} pages, JSON encoder: '
+              f'{"orjson" if projection.orjson else "json"}')
+        print(f'{"resource":<14}{"path":<22}{"ms":>9}{"bytes":>10}{"speedup":>9}')
+        for label, query, serialize, resource, five in resources:
+            page = query.limit(rows)
+            baseline, size = timed(lambda: app.json.dumps(serialize(page.all())).encode(), repeat)
+            print(f'{label:<14}{"to_dict()":<22}{baseline:>9.2f}{size:>10}{"1.0x":>9}')
+            for path, selection in [('fields=<all>', resource.all()),
+                                    ('fields=<five>', resource.parse(five))]:
+                projected = selection.join(query).with_entities(*selection.columns).limit(rows)
+                ms, size = timed(lambda: projection.dumps(selection.encode(projected.all())), repeat)
+                print(f'{"":<14}{path:<22}{ms:>9.2f}{size:>10}{baseline / ms:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,53 @@ class Config:
     
     # Pagination
     ITEMS_PER_PAGE = 20
+    
+    # Dashboard counters are shared across requests for this many seconds
+    DASHBOARD_STATS_TTL = int(os.environ.get('DASHBOARD_STATS_TTL', 30))
+    
+    # How often each worker checks the shared reference data versions
+    REFERENCE_CACHE_CHECK_INTERVAL = int(os.environ.get('REFERENCE_CACHE_CHECK_INTERVAL', 5))
+    
+    # bcrypt cost for new hashes; existing ones are upgraded on the next login
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Concurrent password checks per process, how many more may wait, and for how long
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 5))
+    
+    # Reorder forecasting: issue history considered, supplier lead time,
+    # safety stock in standard deviations of daily use, and days of use per order
+    FORECAST_WINDOW_DAYS = int(os.environ.get('FORECAST_WINDOW_DAYS', 90))
+    REORDER_LEAD_TIME_DAYS = int(os.environ.get('REORDER_LEAD_TIME_DAYS', 7))
+    REORDER_SAFETY_FACTOR = float(os.environ.get('REORDER_SAFETY_FACTOR', 1.65))
+    REORDER_COVER_DAYS = int(os.environ.get('REORDER_COVER_DAYS', 30))
+    
+    # Log a likely N+1 when one statement runs this often in a request, and
+    # statements slower than this many milliseconds
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 10))
+    SQL_SLOW_STATEMENT_MS = int(os.environ.get('SQL_SLOW_STATEMENT_MS', 500))
+    
+    # Upper bound on how long a logged-in user is served from the principal cache
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+    
+    # ASGI mode (asgi.py): async engine pool for the polled API reads, and
+    # threads running the Flask app for every other request
+    ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 10))
+    ASYNC_DB_MAX_OVERFLOW = int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 20))
+    ASYNC_FLASK_THREADS = int(os.environ.get('ASYNC_FLASK_THREADS', 8))
+    
+    # /api/stream: keep-alive comment interval, least seconds between dashboard
+    # updates, and how long one stream may hold a gunicorn thread (the browser
+    # reconnects; streams served by asgi.py have no limit)
+    STREAM_HEARTBEAT_SECONDS = int(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15))
+    STREAM_DASHBOARD_INTERVAL = int(os.environ.get('STREAM_DASHBOARD_INTERVAL', 5))
+    STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS', 300))
+    # Streams one gunicorn worker may serve from its threads at once (0 turns
+    # /api/stream off under gunicorn); further ones get 503 with Retry-After
+    STREAM_THREAD_LIMIT = int(os.environ.get('STREAM_THREAD_LIMIT', 1))
+    
+    # Seconds between in-process preventive work order runs (0 disables)
+    PREVENTIVE_GENERATOR_INTERVAL = int(os.environ.get('PREVENTIVE_GENERATOR_INTERVAL', 0))
 
 
 class DevelopmentConfig(Config):
@@ -31,8 +78,25 @@ class ProductionConfig(Config):
     DEBUG = False
 
 
+class TestingConfig(Config):
+    TESTING = True
+    # In-memory SQLite by default; set TEST_DATABASE_URL to run against PostgreSQL
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    BCRYPT_LOG_ROUNDS = 4
+    REFERENCE_CACHE_CHECK_INTERVAL = 0
+    PREVENTIVE_GENERATOR_INTERVAL = 0
+
+
+class BenchmarkConfig(ProductionConfig):
+    # Benchmarks write synthetic rows, so they get their own database
+    SQLALCHEMY_DATABASE_URI = os.environ.get('BENCH_DATABASE_URL')
+
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
+    'benchmark': BenchmarkConfig,
     'default': DevelopmentConfig
 }
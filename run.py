@@ -1,4 +1,5 @@
 import os
+import click
 from app import create_app, db
 from app.models import User, Location, EquipmentCategory
 
@@ -12,6 +13,120 @@ def init_db():
     print('Database tables created.')
 
 
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    """Add columns, indexes and database functions missing from an existing database."""
+    from app.services.schema import upgrade_schema
+    for change in upgrade_schema():
+        print(change)
+    print('Database schema is up to date.')
+
+
+@app.cli.command('reconcile-costs')
+def reconcile_costs():
+    """Recompute stored work order parts and total costs in bulk."""
+    from app.services.costs import reconcile_work_order_costs
+    changed = reconcile_work_order_costs()
+    print(f'{changed} work orders updated.')
+
+
+@app.cli.command('rebuild-kpis')
+def rebuild_kpis():
+    """Recompute the maintenance KPI rollups from work order and usage history."""
+    from app.services.kpis import rebuild_kpis as rebuild
+    print(f'{rebuild()} KPI rows written.')
+
+
+@app.cli.command('generate-preventive')
+@click.option('--user', 'username', default='admin', help='User recorded as the work order creator.')
+def generate_preventive(username):
+    """Create preventive work orders for every due maintenance schedule."""
+    from app.services.preventive import generate_preventive_work_orders
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        print(f'Unknown user: {username}')
+        raise SystemExit(1)
+    created = generate_preventive_work_orders(user.user_id)
+    print(f'{created} preventive work orders created.')
+
+
+@app.cli.command('import')
+@click.argument('entity', type=click.Choice(['equipment', 'parts', 'inventory']))
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Input format (default: from the file extension).')
+def import_data(entity, source, fmt):
+    """Bulk-load equipment, parts or inventory from a CSV or NDJSON file."""
+    from app.services.importer import import_records, iter_records
+    fmt = fmt or ('ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+    report = import_records(entity, iter_records(source, fmt))
+    for error in report.errors:
+        print(f'line {error["line"]}: {error["error"]}')
+    if report.failed > len(report.errors):
+        print(f'... {report.failed - len(report.errors)} more errors')
+    print(f'{report.inserted} of {report.processed} rows imported, {report.failed} rejected.')
+
+
+@app.cli.command('export')
+@click.argument('dataset', type=click.Choice(['work-orders', 'inventory-transactions']))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First day to include.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Day after the last to include.')
+@click.option('--location', 'location_id', type=int, help='Only this location.')
+@click.option('--output', type=click.File('w'), default='-', help='Output file (default: stdout).')
+def export_data(dataset, fmt, start, end, location_id, output):
+    """Stream work order or inventory transaction history as NDJSON or CSV."""
+    from app.services.exporter import encode, export_rows
+    columns, rows = export_rows(dataset, start, end, location_id)
+    for chunk in encode(columns, rows, fmt):
+        output.write(chunk)
+
+
+@app.cli.command('forecast-reorders')
+@click.option('--apply', is_flag=True, help='Also replace reorder points and quantities with the recommendations.')
+def forecast_reorders(apply):
+    """Recompute consumption-based reorder forecasts for every part and location."""
+    from app.services.forecast import run_forecast
+    result = run_forecast(apply=apply)
+    print(f'{result["forecasts"]} forecasts from {result["window_days"]} days of issues '
+          f'in {result["seconds"]}s; {result["applied"]} reorder settings updated.')
+
+
+@app.cli.command('maintain-ledger')
+@click.option('--as-of', type=click.DateTime(), default=None,
+              help='Snapshot time (default: start of today, UTC).')
+def maintain_ledger(as_of):
+    """Create upcoming transaction partitions and snapshot inventory balances."""
+    from app.services.ledger import ensure_partitions, take_snapshots
+    with db.engine.begin() as connection:
+        for name in ensure_partitions(connection):
+            print(f'created partition {name}')
+    print(f'{take_snapshots(as_of)} balance snapshots taken.')
+
+
+@app.cli.command('detach-ledger-partition')
+@click.argument('month', type=click.DateTime(['%Y-%m']))
+def detach_ledger_partition(month):
+    """Detach the oldest month of inventory transactions for archival."""
+    from app.services.ledger import detach_oldest_partition
+    try:
+        name = detach_oldest_partition(month)
+    except ValueError as e:
+        print(e)
+        raise SystemExit(1)
+    print(f'Detached {name}; archive it (e.g. pg_dump -t {name}) and drop it when done.')
+
+
+@app.cli.command('prune-usage-readings')
+@click.option('--days', default=90, help='Keep raw readings from the last N days.')
+def prune_usage_readings(days):
+    """Delete old raw meter readings; hourly and daily rollups are kept."""
+    from datetime import datetime, timedelta
+    from app.services.usage import prune_readings
+    deleted = prune_readings(datetime.utcnow() - timedelta(days=days))
+    print(f'{deleted} readings deleted.')
+
+
 @app.cli.command('seed-demo')
 def seed_demo():
     """Seed the database with demo data for grading."""
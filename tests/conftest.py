@@ -0,0 +1,55 @@
+import pytest
+
+from app import create_app, db
+from app.models import Location, User
+from app.services import dashboard, principals, reference
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        _reset_caches()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    _reset_caches()
+
+
+def _reset_caches():
+    # Per-process caches outlive the app; each test starts from an empty database
+    reference._entries.clear()
+    reference._versions.clear()
+    reference._checked_at = 0.0
+    principals.invalidate_principal()
+    dashboard.invalidate_dashboard_stats(publish=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def location(app):
+    location = Location(name='Main Plant', city='Springfield')
+    db.session.add(location)
+    db.session.commit()
+    return location
+
+
+@pytest.fixture
+def user(app, location):
+    user = User(username='admin', email='admin@example.com', first_name='Ada', last_name='Admin',
+                role='admin', location_id=location.location_id)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def logged_in(client, user):
+    response = client.post('/login', data={'username': 'admin', 'password': 'password'})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import Equipment, Part, WorkOrder, WorkOrderPart
+from app.services.costs import reconcile_work_order_costs
+
+
+@pytest.fixture
+def work_order(app, user):
+    work_order = WorkOrder(equipment=Equipment(name='Bike'), title='Replace pedals', type='corrective',
+                           created_by=user.user_id, labor_cost=Decimal('40.00'))
+    belt = Part(part_number='BLT-1', name='Belt')
+    pedal = Part(part_number='PDL-1', name='Pedal')
+    work_order.parts_used.append(WorkOrderPart(part=belt, quantity_used=1, unit_cost=Decimal('25.00')))
+    work_order.parts_used.append(WorkOrderPart(part=pedal, quantity_used=2, unit_cost=Decimal('7.50')))
+    db.session.add(work_order)
+    db.session.commit()
+    return work_order
+
+
+def test_stored_costs_follow_part_lines_and_labor(work_order):
+    assert (work_order.parts_cost, work_order.total_cost) == (Decimal('40.00'), Decimal('80.00'))
+    
+    work_order.labor_cost = Decimal('10.00')
+    work_order.parts_used.filter_by(quantity_used=2).one().quantity_used = 4
+    db.session.commit()
+    assert (work_order.parts_cost, work_order.total_cost) == (Decimal('55.00'), Decimal('65.00'))
+
+
+def test_reconcile_only_rewrites_drifted_rows(work_order):
+    assert reconcile_work_order_costs() == 0
+    
+    # A write that bypasses the ORM hooks leaves the stored totals stale
+    db.session.execute(db.update(WorkOrder).values(parts_cost=0, total_cost=0))
+    db.session.commit()
+    assert reconcile_work_order_costs() == 1
+    db.session.expire_all()
+    assert (work_order.parts_cost, work_order.total_cost) == (Decimal('40.00'), Decimal('80.00'))
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from app import db
+from app.models import Equipment, Part, PartsInventory
+from app.services import events
+from app.services.inventory import adjust_stock
+
+
+@pytest.fixture
+def received(app):
+    subscriber = events.broker.subscribe(events.QueueSubscriber())
+    kinds = []
+    
+    def drain():
+        while (item := subscriber.get(0)) is not None:
+            kinds.append(item[0])
+        return kinds
+    
+    yield drain
+    events.broker.unsubscribe(subscriber)
+
+
+def test_dashboard_is_notified_once_per_commit(received, location):
+    inventory = PartsInventory(part=Part(part_number='P-1', name='Belt'), location_id=location.location_id,
+                               quantity_on_hand=5)
+    db.session.add(inventory)
+    db.session.commit()
+    received().clear()
+    
+    db.session.add(Equipment(name='Rower'))
+    db.session.flush()
+    db.session.add(Equipment(name='Bike'))
+    db.session.flush()
+    adjust_stock(inventory.inventory_id, 3)
+    adjust_stock(inventory.inventory_id, -1)
+    assert received() == []
+    db.session.commit()
+    assert received() == [events.DASHBOARD]
+
+
+def test_rolled_back_writes_notify_nothing(received):
+    db.session.add(Equipment(name='Rower'))
+    db.session.flush()
+    db.session.rollback()
+    assert received() == []
+
+
+def test_stream_frames_events_heartbeats_and_dashboard(app):
+    dashboards = iter(range(100))
+    stream = events.stream(lambda: {'n': next(dashboards)}, heartbeat=0.01, dashboard_interval=0,
+                           max_seconds=60)
+    assert next(stream) == 'retry: 5000\n\n'
+    assert next(stream) == 'event: dashboard\ndata: {"n":0}\n\n'
+    
+    events.broker.deliver(events.LOW_STOCK, {'inventory_id': 7})
+    assert next(stream) == 'event: inventory.low_stock\ndata: {"inventory_id":7}\n\n'
+    assert next(stream) == ': keep-alive\n\n'
+    
+    events.broker.deliver(events.DASHBOARD, {})
+    frame = next(stream)
+    assert frame.startswith('event: dashboard\n')
+    assert json.loads(frame.split('data: ', 1)[1]) == {'n': 1}
+    
+    stream.close()
+    assert not events.broker._subscribers
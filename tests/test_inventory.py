@@ -0,0 +1,76 @@
+import pytest
+
+from app import db
+from app.models import InventoryTransaction, Part, PartsInventory
+from app.services.inventory import adjust_batch, adjust_stock, parse_adjustment
+
+
+@pytest.fixture
+def stock(app, location):
+    part = Part(part_number='BLT-100', name='Drive Belt', unit_cost=12.5)
+    inventory = PartsInventory(part=part, location_id=location.location_id, quantity_on_hand=10,
+                               quantity_reserved=2, reorder_point=3)
+    db.session.add(inventory)
+    db.session.commit()
+    return inventory
+
+
+@pytest.mark.parametrize('line', [
+    {'inventory_id': 1, 'quantity': True},
+    {'inventory_id': True, 'quantity': 5},
+    {'inventory_id': 1, 'quantity': 0},
+    {'inventory_id': 1, 'quantity': '5'},
+    {'inventory_id': 1, 'quantity': 5, 'work_order_id': False},
+    {'inventory_id': 1, 'quantity': 5, 'type': 'theft'},
+    {'inventory_id': 1, 'quantity': 5, 'reference_number': 'x' * 1000},
+])
+def test_parse_adjustment_rejects_invalid_lines(app, line):
+    with pytest.raises(ValueError):
+        parse_adjustment(line)
+
+
+def test_parse_adjustment_issues_always_remove_stock(app):
+    assert parse_adjustment({'inventory_id': 1, 'quantity': 4, 'type': 'issue'}) == (1, -4, 'issue')
+
+
+def test_adjust_stock_keeps_loaded_row_in_step(stock):
+    version = stock.version
+    row = adjust_stock(stock.inventory_id, 5)
+    assert row.quantity_on_hand == 15
+    assert (stock.quantity_on_hand, stock.version) == (15, version + 1)
+    
+    # The next ORM write of the same row must not see a stale version
+    stock.bin_location = 'A-1'
+    db.session.commit()
+    db.session.expire_all()
+    assert (stock.quantity_on_hand, stock.version, stock.bin_location) == (15, version + 2, 'A-1')
+
+
+def test_adjust_stock_refuses_to_consume_reserved_units(stock):
+    assert adjust_stock(stock.inventory_id, -9, check_available=True) is None
+    assert adjust_stock(stock.inventory_id, -8, check_available=True).quantity_on_hand == 2
+
+
+def test_adjust_batch_reports_each_line(stock, user):
+    results = adjust_batch([
+        {'inventory_id': stock.inventory_id, 'quantity': 5, 'type': 'issue'},
+        {'inventory_id': stock.inventory_id, 'quantity': 5, 'type': 'issue'},
+        {'inventory_id': 999, 'quantity': 1},
+        {'inventory_id': stock.inventory_id, 'quantity': True},
+    ], user.user_id)
+    
+    assert [r['status'] for r in results] == ['ok', 'error', 'error', 'error']
+    assert results[0]['quantity_on_hand'] == 5
+    assert results[1]['error'] == 'Insufficient inventory'
+    assert results[2]['error'] == 'Inventory not found'
+    assert db.session.get(PartsInventory, stock.inventory_id).quantity_on_hand == 5
+    assert InventoryTransaction.query.count() == 1
+
+
+def test_issue_form_reports_available_stock(logged_in, stock):
+    response = logged_in.post('/inventory/issue', data={'inventory_id': stock.inventory_id, 'quantity': 9})
+    assert response.status_code == 302
+    with logged_in.session_transaction() as session:
+        assert ('danger', 'Insufficient inventory. Available: 8') in session['_flashes']
+    db.session.expire_all()
+    assert db.session.get(PartsInventory, stock.inventory_id).quantity_on_hand == 10
@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask import jsonify
+
+from app.services import projection
+
+
+PAYLOAD = {'b': Decimal('1.50'), 'a': datetime(2024, 1, 2, 3, 4, 5)}
+
+
+def test_jsonify_and_async_encoder_emit_the_same_bytes(app):
+    with app.test_request_context():
+        assert jsonify(PAYLOAD).get_data() == projection.dumps(PAYLOAD)
+    assert projection.dumps(PAYLOAD) == b'{"a":"Tue, 02 Jan 2024 03:04:05 GMT","b":"1.50"}'
+
+
+def test_dumps_honours_indent_and_sort_keys(app):
+    assert app.json.dumps({'b': 1, 'a': 2}, indent=2) == '{\n  "a": 2,\n  "b": 1\n}'
+    assert app.json.dumps({'b': 1, 'a': 2}, sort_keys=False) == '{"b":1,"a":2}'
+
+
+def test_other_arguments_fall_back_to_flasks_provider(app):
+    text = app.json.dumps({'b': 1, 'a': 2}, separators=(', ', ' = '))
+    assert text == '{"a" = 2, "b" = 1}'
+    assert json.loads(app.json.dumps(PAYLOAD, indent=4)) == json.loads(projection.dumps(PAYLOAD))
+
+
+def test_pretty_printed_responses_follow_compact(app):
+    app.json.compact = False
+    with app.test_request_context():
+        assert jsonify({'a': 1}).get_data() == b'{\n  "a": 1\n}'
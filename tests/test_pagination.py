@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.models import WORK_ORDER_LIST_ORDER, Equipment, WorkOrder
+from app.services.pagination import InvalidCursor, keyset_paginate
+
+
+@pytest.fixture
+def work_orders(app, user):
+    equipment = Equipment(name='Rower')
+    today = date.today()
+    orders = [
+        ('undated critical', 'critical', None),
+        ('late low', 'low', today + timedelta(days=9)),
+        ('early high', 'high', today + timedelta(days=1)),
+        ('critical', 'critical', today + timedelta(days=5)),
+        ('undated medium', 'medium', None),
+        ('early medium', 'medium', today),
+        ('late high', 'high', today + timedelta(days=3)),
+    ]
+    db.session.add_all(
+        WorkOrder(equipment=equipment, title=title, type='corrective', priority=priority,
+                  scheduled_date=scheduled, created_by=user.user_id)
+        for title, priority, scheduled in orders
+    )
+    db.session.commit()
+
+
+def _walk(per_page):
+    keys = [(expr, False) for expr in WORK_ORDER_LIST_ORDER]
+    titles, cursor = [], None
+    while True:
+        page = keyset_paginate(WorkOrder.query, keys, per_page, cursor=cursor, total='estimate')
+        titles += [wo.title for wo in page.items]
+        if not page.has_next:
+            return titles, page
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize('per_page', [1, 2, 3, 7, 20])
+def test_work_order_list_pages_in_priority_then_date_order(work_orders, per_page):
+    titles, last = _walk(per_page)
+    assert titles == ['critical', 'undated critical', 'early high', 'late high',
+                      'early medium', 'undated medium', 'late low']
+    assert (last.total, last.estimated) == (7, False)
+
+
+def test_tampered_cursor_is_rejected(work_orders):
+    keys = [(expr, False) for expr in WORK_ORDER_LIST_ORDER]
+    with pytest.raises(InvalidCursor):
+        keyset_paginate(WorkOrder.query, keys, 2, cursor='not-a-cursor')
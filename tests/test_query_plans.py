@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import (Equipment, InventoryTransaction, MaintenanceSchedule, Part,
+                        PartsInventory, WorkOrder)
+from app.services.search import apply_search
+from app.services.sql import explain
+
+
+# The hot route queries must each be able to use a declared index. The test
+# database is near-empty, where the planner rightly prefers sequential scans,
+# so sequential scans are disabled: one that still appears means no index
+# can serve the query.
+
+# Lookup tables small enough that a sequential scan is the right plan
+SMALL_TABLES = {'locations', 'equipment_categories', 'users', 'vendors'}
+
+
+def _samples():
+    def sample(column):
+        return db.session.query(db.func.min(column)).scalar() or 1
+    now = datetime.utcnow()
+    return {
+        'now': now,
+        'today': datetime(now.year, now.month, now.day),
+        'user': sample(WorkOrder.assigned_to),
+        'schedule': sample(WorkOrder.schedule_id),
+        'inventory': sample(PartsInventory.inventory_id),
+        'equipment': sample(Equipment.equipment_id),
+        'location': sample(Equipment.location_id),
+    }
+
+
+HOT_QUERIES = {
+    'work orders by status': lambda s:
+        WorkOrder.query.filter_by(status='open').order_by(WorkOrder.created_at.desc()).limit(20),
+    'my open work orders': lambda s:
+        WorkOrder.query.filter_by(assigned_to=s['user'], status='open').limit(20),
+    'recent work orders': lambda s:
+        WorkOrder.query.order_by(WorkOrder.created_at.desc(), WorkOrder.work_order_id.desc()).limit(20),
+    'work orders completed today': lambda s:
+        WorkOrder.query.filter(WorkOrder.status == 'completed', WorkOrder.completed_at >= s['today']),
+    'equipment work orders': lambda s:
+        WorkOrder.query.filter_by(equipment_id=s['equipment']).order_by(WorkOrder.created_at.desc()),
+    'schedule work orders': lambda s:
+        WorkOrder.query.filter_by(schedule_id=s['schedule']).order_by(WorkOrder.created_at.desc()).limit(10),
+    'overdue maintenance': lambda s:
+        MaintenanceSchedule.query.filter(MaintenanceSchedule.is_active == True,
+                                         MaintenanceSchedule.next_due < s['now'])
+        .order_by(MaintenanceSchedule.next_due),
+    'upcoming maintenance': lambda s:
+        MaintenanceSchedule.query.filter(MaintenanceSchedule.is_active == True,
+                                         MaintenanceSchedule.next_due <= s['now'] + timedelta(days=7))
+        .order_by(MaintenanceSchedule.next_due).limit(5),
+    'equipment schedules': lambda s:
+        MaintenanceSchedule.query.filter_by(equipment_id=s['equipment']),
+    'low stock': lambda s:
+        PartsInventory.query.filter(PartsInventory.quantity_on_hand <= PartsInventory.reorder_point),
+    'inventory by location': lambda s:
+        PartsInventory.query.filter_by(location_id=s['location']),
+    'transaction ledger page': lambda s:
+        InventoryTransaction.query.order_by(InventoryTransaction.created_at.desc(),
+                                            InventoryTransaction.transaction_id.desc()).limit(50),
+    'transactions for inventory row': lambda s:
+        InventoryTransaction.query.filter_by(inventory_id=s['inventory'])
+        .order_by(InventoryTransaction.created_at.desc()),
+    'equipment by status': lambda s:
+        Equipment.query.filter_by(status='under_repair').order_by(Equipment.name).limit(20),
+    'equipment by location': lambda s:
+        Equipment.query.filter_by(location_id=s['location'], status='active').limit(20),
+    'equipment search': lambda s:
+        apply_search(Equipment.query, [Equipment.name, Equipment.serial_number, Equipment.manufacturer], 'tread')
+        .order_by(Equipment.name).limit(20),
+    'parts search': lambda s:
+        apply_search(Part.query, [Part.name, Part.part_number, Part.category], 'belt')
+        .order_by(Part.name).limit(20),
+}
+
+
+def _seq_scans(node):
+    if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') not in SMALL_TABLES:
+        yield node['Relation Name']
+    for child in node.get('Plans', []):
+        yield from _seq_scans(child)
+
+
+@pytest.fixture
+def postgres(app):
+    if db.engine.dialect.name != 'postgresql':
+        pytest.skip('query plans need PostgreSQL (set TEST_DATABASE_URL)')
+    db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+    yield
+    db.session.rollback()
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_query_uses_an_index(postgres, name):
+    plan = explain(HOT_QUERIES[name](_samples()))
+    assert sorted(set(_seq_scans(plan))) == []
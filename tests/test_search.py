@@ -0,0 +1,26 @@
+import pytest
+
+from app import db
+from app.models import Part
+from app.services.search import apply_search
+
+
+@pytest.fixture
+def parts(app):
+    db.session.add_all([
+        Part(part_number='BLT-200', name='Treadmill Belt', category='Belts'),
+        Part(part_number='BLT-100', name='Belt', category='Belts'),
+        Part(part_number='CBL-100', name='Lat Cable', category='Cables'),
+        Part(part_number='PAD-BELT', name='Seat Pad', category='Pads'),
+    ])
+    db.session.commit()
+
+
+def test_matches_substrings_of_any_column_case_insensitively(parts):
+    found = apply_search(Part.query, [Part.name, Part.part_number], 'belt').all()
+    assert sorted(p.part_number for p in found) == ['BLT-100', 'BLT-200', 'PAD-BELT']
+
+
+def test_keeps_the_callers_ordering(parts):
+    found = apply_search(Part.query, [Part.name, Part.part_number], 'belt').order_by(Part.name).all()
+    assert [p.name for p in found] == ['Belt', 'Seat Pad', 'Treadmill Belt']
@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.models import (
+    Equipment, EquipmentCategory, Location, MaintenanceSchedule, Part, PartsInventory, User, WorkOrder
+)
+from app.services import metrics, serializers
+
+
+ROWS = 25
+
+
+@pytest.fixture
+def data(app, user):
+    locations = [Location(name=f'Site {i}') for i in range(3)]
+    categories = [EquipmentCategory(name=f'Category {i}') for i in range(3)]
+    technicians = [
+        User(username=f'tech{i}', email=f'tech{i}@example.com', first_name='Tech', last_name=str(i),
+             password_hash='x', location=locations[i % 3])
+        for i in range(3)
+    ]
+    equipment = [
+        Equipment(name=f'Pump {i}', serial_number=f'SN-{i}', category=categories[i % 3], location=locations[i % 3])
+        for i in range(ROWS)
+    ]
+    parts = [Part(part_number=f'P-{i}', name=f'Part {i}') for i in range(ROWS)]
+    db.session.add_all(locations + categories + technicians + equipment + parts)
+    db.session.add_all(
+        MaintenanceSchedule(equipment=e, task_name='Inspect', frequency_days=30) for e in equipment
+    )
+    db.session.add_all(
+        PartsInventory(part=p, location=locations[i % 3], quantity_on_hand=10) for i, p in enumerate(parts)
+    )
+    db.session.add_all(
+        WorkOrder(equipment=e, title=f'Repair {i}', type='corrective', created_by=user.user_id,
+                  assignee=technicians[i % 3], scheduled_date=date.today() + timedelta(days=i))
+        for i, e in enumerate(equipment)
+    )
+    db.session.commit()
+
+
+def _serialized_queries(serialize, query, size):
+    db.session.expunge_all()
+    rows = query.limit(size).all()
+    assert len(rows) == size
+    with metrics.collect() as stats:
+        payload = serialize(rows)
+    assert len(payload) == size
+    return stats.queries
+
+
+@pytest.mark.parametrize('serialize, model, queries', [
+    (serializers.serialize_equipment, Equipment, 2),            # categories, locations
+    (serializers.serialize_schedules, MaintenanceSchedule, 1),  # equipment
+    (serializers.serialize_inventory, PartsInventory, 2),       # parts, locations
+    (serializers.serialize_work_orders, WorkOrder, 3),          # equipment, locations, users
+])
+def test_query_count_does_not_grow_with_page_size(data, serialize, model, queries):
+    assert _serialized_queries(serialize, model.query, 5) == queries
+    assert _serialized_queries(serialize, model.query, ROWS) == queries
+
+
+def test_work_order_payload_includes_related_names(data):
+    db.session.expunge_all()
+    work_order = WorkOrder.query.filter_by(title='Repair 4').one()
+    payload, = serializers.serialize_work_orders([work_order])
+    assert payload['equipment_name'] == 'Pump 4'
+    assert payload['location_name'] == 'Site 1'
+    assert payload['assigned_to_name'] == 'Tech 1'
+    assert payload['created_by_name'] == 'Ada Admin'
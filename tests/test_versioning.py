@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.models import Equipment
+from app.services.versioning import CONFLICT_MESSAGE, expect_version
+
+
+@pytest.fixture
+def equipment(app):
+    equipment = Equipment(name='Treadmill', notes='original')
+    db.session.add(equipment)
+    db.session.commit()
+    return equipment
+
+
+def _stored(equipment_id):
+    db.session.expire_all()
+    return db.session.get(Equipment, equipment_id)
+
+
+def test_second_writer_at_same_version_is_rejected(equipment):
+    with Session(db.engine) as first, Session(db.engine) as second:
+        a = first.get(Equipment, equipment.equipment_id)
+        b = second.get(Equipment, equipment.equipment_id)
+        a.notes, b.notes = 'first writer', 'second writer'
+        first.commit()
+        with pytest.raises(StaleDataError):
+            second.commit()
+    assert _stored(equipment.equipment_id).notes == 'first writer'
+
+
+def test_expect_version_rejects_stale_client_version(equipment):
+    stale = equipment.version
+    equipment.notes = 'newer'
+    db.session.commit()
+    
+    expect_version(equipment, stale)
+    equipment.notes = 'lost update'
+    with pytest.raises(StaleDataError):
+        db.session.commit()
+    db.session.rollback()
+    assert _stored(equipment.equipment_id).notes == 'newer'
+
+
+def test_api_put_with_stale_version_returns_409(logged_in, equipment):
+    url = f'/api/equipment/{equipment.equipment_id}'
+    version = logged_in.get(url).get_json()['version']
+    
+    response = logged_in.put(url, json={'version': version, 'notes': 'first'})
+    assert response.status_code == 200
+    assert response.get_json()['version'] == version + 1
+    
+    response = logged_in.put(url, json={'version': version, 'notes': 'second'})
+    assert response.status_code == 409
+    assert response.get_json() == {'error': 'Concurrent modification detected'}
+    assert _stored(equipment.equipment_id).notes == 'first'
+
+
+def test_edit_form_with_stale_version_flashes_and_redirects(logged_in, equipment):
+    url = f'/equipment/{equipment.equipment_id}/edit'
+    stale = equipment.version
+    equipment.notes = 'edited elsewhere'
+    db.session.commit()
+    
+    response = logged_in.post(url, data={'version': stale, 'name': 'Treadmill', 'status': 'active',
+                                         'notes': 'lost update'},
+                              headers={'Referer': f'http://localhost{url}'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(url)
+    with logged_in.session_transaction() as session:
+        assert ('warning', CONFLICT_MESSAGE) in session['_flashes']
+    assert _stored(equipment.equipment_id).notes == 'edited elsewhere'